@@ -1,8 +1,12 @@
 import os
+import hmac
+import json
 import logging
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
+from functools import wraps
+from utils.index_manager import IndexManager
 from utils.nlp_processor import NLPProcessor
-from utils.data_loader import load_assessments
+from utils.query_cache import QueryCache
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -12,34 +16,118 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "default_secret_key")
 
-# Load assessment data
-try:
-    assessments = load_assessments()
-    logger.info(f"Loaded {len(assessments)} assessments")
-except Exception as e:
-    logger.error(f"Error loading assessments: {e}")
-    assessments = []
-
-# Initialize NLP processor
-try:
-    nlp_processor = NLPProcessor(assessments)
-    logger.info("NLP processor initialized successfully")
-except Exception as e:
-    logger.error(f"Error initializing NLP processor: {e}")
-    nlp_processor = None
+# Cache of per-query score vectors, shared by all recommendation endpoints
+query_cache = QueryCache(
+    max_bytes=int(os.environ.get("RECOMMEND_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    ttl=float(os.environ.get("RECOMMEND_CACHE_TTL", 600))
+)
+
+# Maximum number of queries accepted by the batch endpoint
+MAX_BATCH_SIZE = int(os.environ.get("RECOMMEND_BATCH_MAX_SIZE", 1000))
+
+# Number of streamed queries scored together
+STREAM_BATCH_SIZE = int(os.environ.get("RECOMMEND_STREAM_BATCH_SIZE", 64))
+
+# Directory of persisted indexes; a matching index is loaded instead of refitting
+INDEX_DIR = os.environ.get("RECOMMEND_INDEX_DIR", "data/index")
+
+# Artifacts kept in INDEX_DIR after a build, the served one included; 0 keeps all
+KEEP_INDEXES = int(os.environ.get("RECOMMEND_INDEX_KEEP", 2))
+
+# Seconds clients are told to wait while the index is not ready
+RETRY_AFTER = int(os.environ.get("RECOMMEND_RETRY_AFTER", 5))
+
+# Vectorizer mode: 'tfidf' (fitted vocabulary) or 'hashing' (no vocabulary,
+# RECOMMEND_HASH_FEATURES columns, sized to the catalog's tokens when unset),
+# and its index build options as JSON,
+# e.g. {"dtype": "float32", "min_df": 2}
+VECTORIZER = os.environ.get("RECOMMEND_VECTORIZER", "tfidf")
+VECTORIZER_OPTIONS = json.loads(os.environ.get("RECOMMEND_VECTORIZER_OPTIONS", "{}"))
+if VECTORIZER == "hashing" and os.environ.get("RECOMMEND_HASH_FEATURES"):
+    VECTORIZER_OPTIONS["n_features"] = int(os.environ["RECOMMEND_HASH_FEATURES"])
+
+# Also build the dense LSA index with this many dimensions, which enables
+# the 'lsa' ranking; 0 builds none
+if int(os.environ.get("RECOMMEND_LSA_DIMENSIONS", 0)):
+    VECTORIZER_OPTIONS["lsa_dimensions"] = int(os.environ["RECOMMEND_LSA_DIMENSIONS"])
+    # Cluster it into this many IVF lists and score RECOMMEND_NPROBE of them per query
+    if int(os.environ.get("RECOMMEND_IVF_LISTS", 0)):
+        VECTORIZER_OPTIONS["ivf_lists"] = int(os.environ["RECOMMEND_IVF_LISTS"])
+    # Score it on int8 vectors, rescoring the best candidates exactly
+    if os.environ.get("RECOMMEND_LSA_QUANTIZATION"):
+        VECTORIZER_OPTIONS["lsa_quantization"] = os.environ["RECOMMEND_LSA_QUANTIZATION"]
+NPROBE = int(os.environ.get("RECOMMEND_NPROBE", 0)) or None
+
+# Default lexical scoring, 'cosine', 'bm25' or 'lsa'; requests can pass "ranking"
+RANKING = os.environ.get("RECOMMEND_RANKING", "cosine")
+
+# Apply the rule boosts only to this many lexical candidates (plus rule
+# matches) per query; 0 boosts the whole catalog
+CANDIDATE_DEPTH = int(os.environ.get("RECOMMEND_CANDIDATE_DEPTH", 0)) or None
+
+# Find those lexical candidates with MaxScore over the inverted index
+# instead of scoring the whole catalog
+DYNAMIC_PRUNING = os.environ.get("RECOMMEND_DYNAMIC_PRUNING", "0") == "1"
+
+# Load the catalog and the NLP processor in the background so the process
+# answers liveness checks while it starts; set to 0 to load before serving
+index_manager = IndexManager(
+    catalog_path=os.environ.get("RECOMMEND_CATALOG_PATH", "data/shl_assessments.json"),
+    index_dir=INDEX_DIR,
+    keep_indexes=KEEP_INDEXES,
+    cache=query_cache,
+    refit_drift=float(os.environ.get("RECOMMEND_REFIT_DRIFT", 0.25)),
+    vectorizer=VECTORIZER,
+    vectorizer_options=VECTORIZER_OPTIONS,
+    ranking=RANKING,
+    candidate_depth=CANDIDATE_DEPTH,
+    dynamic_pruning=DYNAMIC_PRUNING,
+    nprobe=NPROBE
+)
+if os.environ.get("RECOMMEND_BACKGROUND_BUILD", "1") == "1":
+    index_manager.start()
+else:
+    index_manager.build()
+
+# Reload the catalog when its file changes; 0 disables the watcher
+CATALOG_WATCH_INTERVAL = float(os.environ.get("RECOMMEND_CATALOG_WATCH_INTERVAL", 30))
+if CATALOG_WATCH_INTERVAL > 0:
+    index_manager.watch(CATALOG_WATCH_INTERVAL)
+
+# Token required by the admin endpoints; they are disabled when it is not set
+ADMIN_TOKEN = os.environ.get("RECOMMEND_ADMIN_TOKEN")
+
+def _not_ready():
+    """Fast 503 returned while the index is loading or after a failed build."""
+    status = index_manager.status()
+    message = ("Index build failed" if status["state"] == IndexManager.FAILED
+               else "Index is loading")
+    response = jsonify({"error": "Service unavailable", "message": message,
+                        "state": status["state"]})
+    response.headers["Retry-After"] = str(RETRY_AFTER)
+    return response, 503
+
+def requires_index(view):
+    """Answer 503 with Retry-After instead of calling the view until the index is ready."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not index_manager.ready:
+            return _not_ready()
+        # Pick up catalog changes written by other workers
+        index_manager.check_catalog()
+        return view(*args, **kwargs)
+    return wrapper
 
 @app.route('/')
 def index():
     """Render the main page."""
-    # Get unique assessment types for filtering
-    assessment_types = list(set([a.get('type', 'Unknown') for a in assessments]))
-    return render_template('index.html', assessment_types=assessment_types)
+    return render_template('index.html', assessment_types=index_manager.assessment_types)
 
 @app.route('/api/recommend', methods=['POST'])
+@requires_index
 def recommend():
     """API endpoint to get assessment recommendations based on job description."""
-    if not nlp_processor:
-        return jsonify({"error": "NLP processor not initialized"}), 500
+    nlp_processor = index_manager.processor
     
     try:
         data = request.get_json()
@@ -48,23 +136,39 @@ def recommend():
         if not job_description:
             return jsonify({"error": "Job description is required"}), 400
             
+        ranking = data.get('ranking')
+        if ranking is not None and ranking not in nlp_processor.rankings:
+            return jsonify({"error": f"ranking must be one of {', '.join(nlp_processor.rankings)}"}), 400
+            
         # Get filters if provided
         filters = data.get('filters', {})
         test_type = filters.get('test_type')
         remote_available = filters.get('remote_available')
         adaptive_testing = filters.get('adaptive_testing')
+        duration = filters.get('duration')
         
         # Get recommendations
         recommendations = nlp_processor.get_recommendations(
             job_description, 
             test_type=test_type,
             remote_available=remote_available,
-            adaptive_testing=adaptive_testing
+            adaptive_testing=adaptive_testing,
+            duration=duration,
+            ranking=ranking
+        )
+        
+        # Count how many assessments each filter value would leave
+        facets = nlp_processor.get_facet_counts(
+            test_type=test_type,
+            remote_available=remote_available,
+            adaptive_testing=adaptive_testing,
+            duration=duration
         )
         
         return jsonify({
             "recommendations": recommendations,
-            "count": len(recommendations)
+            "count": len(recommendations),
+            "facets": facets
         })
     
     except Exception as e:
@@ -74,21 +178,92 @@ def recommend():
 # Health check endpoint for assignment requirement
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint to verify API is running."""
+    """Liveness endpoint: the process is up, whether or not the index is ready."""
     return jsonify({
         "status": "ok",
         "message": "API is operational"
     }), 200
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint: 200 once the index can serve requests, 503 before."""
+    status = index_manager.status()
+    status["cache"] = query_cache.stats()
+    return jsonify(status), 200 if status["ready"] else 503
+
+def requires_admin(view):
+    """Reject requests without the admin token; admin endpoints are hidden when no token is set."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({"error": "Not found"}), 404
+        if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+            return jsonify({"error": "Forbidden", "message": "Invalid admin token"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route('/admin/reload', methods=['POST'])
+@requires_admin
+def admin_reload():
+    """Start a background catalog reload; the current index keeps serving until it is swapped."""
+    started = index_manager.reload()
+    status = index_manager.status()
+    status["started"] = started
+    return jsonify(status), 202 if started else 409
+
+@app.route('/admin/assessments', methods=['POST'])
+@requires_admin
+@requires_index
+def admin_update_assessments():
+    """
+    Incrementally upsert or retire assessments without refitting.
+    Accepts {"upsert": [assessment, ...], "delete": [id, ...]}; upserts are matched on 'id'.
+    A full refit starts in the background once the IDF drift passes RECOMMEND_REFIT_DRIFT.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Bad request", "message": "A JSON object is required"}), 400
+    
+    upserts = data.get('upsert') or []
+    deletes = data.get('delete') or []
+    if not isinstance(upserts, list) or not isinstance(deletes, list) or not (upserts or deletes):
+        return jsonify({
+            "error": "Bad request",
+            "message": "Non-empty 'upsert' and/or 'delete' lists are required"
+        }), 400
+    
+    try:
+        status = index_manager.update(upserts, deletes)
+    except (ValueError, KeyError, TypeError) as e:
+        message = e.args[0] if isinstance(e, KeyError) and e.args else str(e)
+        return jsonify({"error": "Bad request", "message": message}), 400
+    except Exception as e:
+        logger.error(f"Error updating assessments: {str(e)}")
+        return jsonify({"error": "Internal server error", "message": str(e)}), 500
+    
+    return jsonify(status), 200
+
+def _format_assessment(rec):
+    """Format a recommendation according to the assignment response format."""
+    return {
+        "name": rec.get('name', ''),
+        "type": rec.get('type', ''),
+        "description": rec.get('description', ''),
+        "match_score": rec.get('similarity', 0),
+        "skills": rec.get('skills', []),
+        "remote_available": rec.get('remote_available', False),
+        "duration_minutes": rec.get('duration_minutes', 0)
+    }
+
 # Assignment-specific endpoint for recommendations
 @app.route('/v1/recommend', methods=['POST'])
+@requires_index
 def assignment_recommend():
     """
     Assignment-specific recommendation endpoint that follows required format.
     Accepts job description or natural language query and returns up to 10 relevant assessments.
     """
-    if not nlp_processor:
-        return jsonify({"error": "Service unavailable", "message": "NLP processor not initialized"}), 503
+    nlp_processor = index_manager.processor
     
     try:
         data = request.get_json()
@@ -101,9 +276,16 @@ def assignment_recommend():
                 "error": "Bad request", 
                 "message": "Job description or query is required"
             }), 400
+        
+        ranking = data.get('ranking')
+        if ranking is not None and ranking not in nlp_processor.rankings:
+            return jsonify({
+                "error": "Bad request",
+                "message": f"ranking must be one of {', '.join(nlp_processor.rankings)}"
+            }), 400
                 
         # Get top 10 recommendations (minimum 1)
-        recommendations = nlp_processor.get_recommendations(query, top_k=10)
+        recommendations = nlp_processor.get_recommendations(query, top_k=10, ranking=ranking)
         
         # Ensure we return at least 1 recommendation
         if not recommendations:
@@ -113,17 +295,7 @@ def assignment_recommend():
             }), 404
             
         # Format the response according to assignment requirements
-        response = []
-        for rec in recommendations:
-            response.append({
-                "name": rec.get('name', ''),
-                "type": rec.get('type', ''),
-                "description": rec.get('description', ''),
-                "match_score": rec.get('similarity', 0),
-                "skills": rec.get('skills', []),
-                "remote_available": rec.get('remote_available', False),
-                "duration_minutes": rec.get('duration_minutes', 0)
-            })
+        response = [_format_assessment(rec) for rec in recommendations]
             
         return jsonify({
             "success": True,
@@ -140,5 +312,171 @@ def assignment_recommend():
             "message": str(e)
         }), 500
 
+def _parse_batch_item(item, rankings=NLPProcessor.RANKINGS):
+    """
+    Parse one item of a batch request into get_recommendations arguments.
+    
+    Items are either a query string or an object with 'query' (or
+    'job_description'), an optional 'top_k', optional 'filters' and an
+    optional 'ranking', one of ``rankings``.
+    Raises ValueError with a client-facing message when the item is invalid.
+    """
+    if isinstance(item, str):
+        item = {"query": item}
+    if not isinstance(item, dict):
+        raise ValueError("Each item must be a query string or an object")
+    
+    query = item.get('job_description', item.get('query', ''))
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("Job description or query is required")
+    
+    top_k = item.get('top_k', 10)
+    if isinstance(top_k, bool) or not isinstance(top_k, int) or top_k < 1:
+        raise ValueError("top_k must be a positive integer")
+    
+    filters = item.get('filters') or {}
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be an object")
+    
+    ranking = item.get('ranking')
+    if ranking is not None and ranking not in rankings:
+        raise ValueError(f"ranking must be one of {', '.join(rankings)}")
+    
+    return {
+        "job_description": query,
+        "top_k": top_k,
+        "test_type": filters.get('test_type'),
+        "remote_available": filters.get('remote_available'),
+        "adaptive_testing": filters.get('adaptive_testing'),
+        "duration": filters.get('duration'),
+        "ranking": ranking
+    }
+
+def _try_parse_batch_item(item, rankings=NLPProcessor.RANKINGS):
+    """Parse a batch item, returning the ValueError instead of raising it."""
+    try:
+        return _parse_batch_item(item, rankings)
+    except ValueError as e:
+        return e
+
+def _recommend_parsed_items(nlp_processor, parsed_items, first_index=0):
+    """
+    Score parsed batch items together and format one result per item.
+    
+    Args:
+        nlp_processor (NLPProcessor): Processor to score with
+        parsed_items (list): get_recommendations arguments, or the ValueError
+            explaining why an item was rejected
+        first_index (int): Index of the first item in the whole request
+        
+    Returns:
+        list: Result objects in input order
+    """
+    results = [None] * len(parsed_items)
+    queries, positions = [], []
+    for i, parsed in enumerate(parsed_items):
+        if isinstance(parsed, ValueError):
+            results[i] = {"index": first_index + i, "success": False,
+                          "error": "Bad request", "message": str(parsed)}
+        else:
+            queries.append(parsed)
+            positions.append(i)
+    
+    for i, result in zip(positions, nlp_processor.get_recommendations_batch(queries)):
+        if "error" in result:
+            results[i] = {"index": first_index + i, "success": False,
+                          "error": "Internal server error", "message": result["error"]}
+        else:
+            assessments = [_format_assessment(rec) for rec in result["recommendations"]]
+            results[i] = {"index": first_index + i, "success": True,
+                          "assessments": assessments, "count": len(assessments)}
+    return results
+
+# Batch endpoint scoring many job descriptions in one pass
+@app.route('/v1/recommend/batch', methods=['POST'])
+@requires_index
+def assignment_recommend_batch():
+    """
+    Batch recommendation endpoint.
+    Accepts {"queries": [...]} and returns one result per query, in input order.
+    Invalid or failing items are reported individually without failing the batch.
+    """
+    nlp_processor = index_manager.processor
+    
+    try:
+        data = request.get_json(silent=True)
+        items = data.get('queries') if isinstance(data, dict) else None
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({
+                "error": "Bad request",
+                "message": "A non-empty 'queries' list is required"
+            }), 400
+        
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({
+                "error": "Payload too large",
+                "message": f"At most {MAX_BATCH_SIZE} queries are accepted per batch"
+            }), 413
+        
+        # Validate every item, then score the valid ones together
+        results = _recommend_parsed_items(
+            nlp_processor, [_try_parse_batch_item(item, nlp_processor.rankings) for item in items])
+        
+        return jsonify({
+            "success": True,
+            "data": {
+                "results": results,
+                "count": len(results),
+                "failed": sum(1 for result in results if not result["success"])
+            }
+        }), 200
+    
+    except Exception as e:
+        logger.error(f"Error processing batch recommendation: {str(e)}")
+        return jsonify({
+            "error": "Internal server error",
+            "message": str(e)
+        }), 500
+
+# Streaming endpoint for very large request sets
+@app.route('/v1/recommend/stream', methods=['POST'])
+@requires_index
+def assignment_recommend_stream():
+    """
+    Streaming batch recommendation endpoint.
+    Reads newline-delimited JSON queries (same item format as the batch
+    endpoint) from the request body and streams one NDJSON result per query,
+    in input order. Queries are scored in micro-batches as they arrive, so
+    memory stays bounded regardless of the request size.
+    """
+    nlp_processor = index_manager.processor
+    
+    def generate():
+        pending = []
+        first_index = 0
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                pending.append(ValueError(f"Invalid JSON: {e}"))
+            else:
+                pending.append(_try_parse_batch_item(item, nlp_processor.rankings))
+            
+            if len(pending) >= STREAM_BATCH_SIZE:
+                for result in _recommend_parsed_items(nlp_processor, pending, first_index):
+                    yield json.dumps(result) + "\n"
+                first_index += len(pending)
+                pending = []
+        
+        if pending:
+            for result in _recommend_parsed_items(nlp_processor, pending, first_index):
+                yield json.dumps(result) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -71,6 +71,11 @@ document.addEventListener('DOMContentLoaded', function() {
             
             // Update count badge
             resultCountBadge.textContent = `${data.count} results`;
+            
+            // Show how many assessments each test type would leave
+            if (data.facets) {
+                updateFacetCounts(data.facets);
+            }
         })
         .catch(error => {
             console.error('Error fetching recommendations:', error);
@@ -79,6 +84,22 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // Function to show facet counts next to the test type options
+    function updateFacetCounts(facets) {
+        const typeCounts = {};
+        (facets.type || []).forEach(facet => {
+            typeCounts[facet.value] = facet.count;
+        });
+        
+        Array.from(testTypeSelect.options).forEach(option => {
+            if (!option.value) {
+                return;
+            }
+            const count = typeCounts[option.value] || 0;
+            option.textContent = `${option.value} (${count})`;
+        });
+    }
+    
     // Function to display recommendations
     function displayRecommendations(recommendations) {
         // Clear previous recommendations
@@ -0,0 +1,167 @@
+"""
+Recall@k versus latency of the IVF index of the dense (LSA) retrieval mode.
+
+For every ``nprobe`` the approximate top k of each query is compared with
+the exact (brute-force) top k, on a synthetic catalog of clustered random
+unit vectors and on the real catalog's LSA vectors. On the real catalog the
+top 10 recommendations, after boosts and filters, are compared as well.
+
+Usage (from test_data/):
+    python benchmark_ivf.py
+    python benchmark_ivf.py --rows 1000000 --lists 1024 --nprobe 1 --nprobe 8 --nprobe 64
+    python benchmark_ivf.py --scale 50 --json
+"""
+import argparse
+import json
+import logging
+import sys
+import os
+import time
+import numpy as np
+import scipy.sparse as sp
+
+# Add parent directory to path so we can import our modules
+sys.path.insert(0, os.path.abspath('..'))
+
+from utils.data_loader import load_assessments
+from utils.dense_index import IVFIndex, LSAIndex
+from utils.nlp_processor import NLPProcessor
+from benchmark_vectorizers import catalog_queries, scale_catalog, top_k_names, ranking_overlap
+
+DEFAULT_NPROBE = [1, 2, 4, 8, 16, 32]
+
+
+def synthetic_vectors(rows, dimensions, clusters, seed=0):
+    """
+    Unit vectors scattered around random cluster centres.
+
+    Returns:
+        numpy.ndarray: (rows, dimensions) float32
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    vectors = centres[rng.integers(clusters, size=rows)]
+    vectors += 0.3 * rng.standard_normal((rows, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def recall_curve(lsa_index, query_vectors, nprobes, k):
+    """
+    Recall@k and single-query latency of every nprobe against brute force.
+
+    Args:
+        lsa_index (LSAIndex): Index with an IVF clustering
+        query_vectors (scipy.sparse.csr_matrix): Query rows in the index's input space
+        nprobes (list): nprobe values to measure
+        k (int): Neighbours compared
+
+    Returns:
+        list: One dict per nprobe (None is brute force)
+    """
+    def timed(nprobe):
+        # k best scores per query; scored rows get their exact similarity
+        results, start = [], time.perf_counter()
+        for i in range(query_vectors.shape[0]):
+            scores = lsa_index.similarity(query_vectors[i], nprobe=nprobe)[0]
+            results.append(scores[np.argpartition(-scores, k - 1)[:k]])
+        return results, (time.perf_counter() - start) * 1000 / query_vectors.shape[0]
+
+    exact, exact_ms = timed(None)
+    # Tie-aware: a neighbour counts when it scores at least the exact k-th score
+    thresholds = [scores.min() - 1e-6 for scores in exact]
+    curve = [{'nprobe': None, 'recall': 1.0, 'ms': round(exact_ms, 3), 'scanned': 1.0}]
+    sizes = np.diff(lsa_index.ivf.offsets)
+    for nprobe in nprobes:
+        if nprobe >= lsa_index.ivf.n_lists:
+            continue
+        approximate, ms = timed(nprobe)
+        recall = np.mean([np.count_nonzero(a >= t) / k for a, t in zip(approximate, thresholds)])
+        # Expected share of rows scored: nprobe lists of average size
+        scanned = nprobe * sizes.mean() / sizes.sum()
+        curve.append({'nprobe': nprobe, 'recall': round(float(recall), 4), 'ms': round(ms, 3),
+                      'scanned': round(float(scanned), 4)})
+    return curve
+
+
+def synthetic_curve(args):
+    """
+    Recall curve on clustered random vectors, through the LSA index with an identity projection.
+    """
+    vectors = synthetic_vectors(args.rows, args.dimensions, args.clusters)
+    start = time.perf_counter()
+    ivf = IVFIndex.fit(vectors, args.lists)
+    build_seconds = time.perf_counter() - start
+    lsa_index = LSAIndex(np.eye(args.dimensions, dtype=np.float32), vectors, ivf)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+    curve = recall_curve(lsa_index, sp.csr_matrix(queries), args.nprobe, args.k)
+    return {'catalog': f"synthetic {args.rows}x{args.dimensions}", 'lists': ivf.n_lists,
+            'build_s': round(build_seconds, 2), 'curve': curve}
+
+
+def catalog_curve(args):
+    """
+    Recall curve and recommendation overlap on the real catalog's LSA vectors.
+    """
+    catalog = load_assessments('../data/shl_assessments.json')
+    assessments = scale_catalog(catalog, args.scale)
+    lists = args.catalog_lists or max(1, int(np.sqrt(len(assessments))))
+    start = time.perf_counter()
+    processor = NLPProcessor(assessments, ranking='lsa', vectorizer_options={
+        'lsa_dimensions': args.dimensions, 'ivf_lists': lists})
+    build_seconds = time.perf_counter() - start
+    queries = catalog_queries(catalog)[:args.queries]
+    processed = [processor._preprocess_text(processor.normalize_query(q)) for q in queries]
+    query_vectors = processor.query_vectorizer.transform(processed)
+    curve = recall_curve(processor.lsa_index, query_vectors, args.nprobe, args.k)
+
+    # Top 10 after boosts and filters, against the exhaustive dense ranking
+    exact = top_k_names(processor, queries)
+    for point in curve[1:]:
+        processor.nprobe = point['nprobe']
+        point['top10_overlap'] = ranking_overlap(exact, top_k_names(processor, queries))
+    processor.nprobe = None
+    return {'catalog': f"shl x{args.scale} ({len(assessments)} rows)", 'lists': lists,
+            'build_s': round(build_seconds, 2), 'curve': curve}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recall@k versus latency of the IVF index.")
+    parser.add_argument('--rows', type=int, default=200000, help="Synthetic catalog size")
+    parser.add_argument('--dimensions', type=int, default=64, help="Vector dimensions")
+    parser.add_argument('--clusters', type=int, default=1000, help="Clusters in the synthetic data")
+    parser.add_argument('--lists', type=int, default=512, help="IVF lists of the synthetic index")
+    parser.add_argument('--scale', type=int, default=20, help="Copies of the real catalog")
+    parser.add_argument('--catalog-lists', type=int, default=None,
+                        help="IVF lists of the real catalog index (default sqrt of its size)")
+    parser.add_argument('--nprobe', type=int, action='append', default=None,
+                        help="nprobe to measure (repeatable)")
+    parser.add_argument('--queries', type=int, default=100, help="Queries per catalog")
+    parser.add_argument('--k', type=int, default=10, help="Neighbours compared for recall")
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+    args = parser.parse_args(argv)
+    args.nprobe = args.nprobe or DEFAULT_NPROBE
+
+    logging.disable(logging.INFO)
+    # Import scikit-learn up front so it does not count as build time
+    import sklearn.decomposition  # noqa: F401
+
+    results = [synthetic_curve(args), catalog_curve(args)]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for result in results:
+        print(f"\n{result['catalog']}, {result['lists']} lists, built in {result['build_s']} s")
+        print(f"{'nprobe':>8}{'scanned':>10}{f'recall@{args.k}':>11}{'ms/query':>10}{'top10':>8}")
+        for point in result['curve']:
+            nprobe = point['nprobe'] if point['nprobe'] is not None else 'all'
+            overlap = f"{point['top10_overlap']:.4f}" if 'top10_overlap' in point else '-'
+            print(f"{nprobe:>8}{point['scanned']:>10.4f}{point['recall']:>11.4f}{point['ms']:>10.3f}{overlap:>8}")
+    print("\nscanned is the share of vectors scored; top10 is the share of the exhaustive "
+          "top 10 recommendations (after boosts) kept")
+
+
+if __name__ == "__main__":
+    main()
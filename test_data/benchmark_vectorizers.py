@@ -0,0 +1,279 @@
+"""
+Compare index variants of the recommendation engine on quality, latency and memory.
+
+Every variant is fitted on the same catalog and evaluated on the SHL test
+cases. The labelled cases are few, so latency and the agreement of the
+rankings with the first (reference) variant are measured on them plus one
+query per assessment built from its name and skills.
+
+Usage (from test_data/):
+    python benchmark_vectorizers.py
+    python benchmark_vectorizers.py --repeat 20 --json
+    python benchmark_vectorizers.py --scale 100 --variant tfidf --variant "rerank top 50"
+
+``--scale`` replicates the catalog to measure latency at a larger size; the
+copies crowd each other in the top 10, so quality figures are then only
+meaningful relative to the reference.
+"""
+import argparse
+import json
+import logging
+import sys
+import os
+import time
+import numpy as np
+
+# Add parent directory to path so we can import our modules
+sys.path.insert(0, os.path.abspath('..'))
+
+from utils.data_loader import load_assessments
+from utils.nlp_processor import NLPProcessor
+from test_recommendations import evaluate_recommendations, load_test_data
+
+TEST_FILES = ['shl_manual_test_data.json', 'parsed_test_cases.json']
+
+# (label, NLPProcessor keyword arguments); the first one is the reference
+VARIANTS = [
+    ('tfidf', {}),
+    ('tfidf float32', {'vectorizer_options': {'dtype': 'float32'}}),
+    ('tfidf pruned', {'vectorizer_options': {'dtype': 'float32', 'min_df': 2, 'max_df': 0.5}}),
+    ('tfidf sublinear', {'vectorizer_options': {'sublinear_tf': True}}),
+    ('bm25f', {'ranking': 'bm25'}),
+    ('rerank top 50', {'candidate_depth': 50}),
+    ('rerank top 20', {'candidate_depth': 20}),
+    ('rerank top 5', {'candidate_depth': 5}),
+    ('maxscore top 50', {'candidate_depth': 50, 'dynamic_pruning': True}),
+    ('bm25f maxscore 50', {'ranking': 'bm25', 'candidate_depth': 50, 'dynamic_pruning': True}),
+    ('lsa 128', {'ranking': 'lsa', 'vectorizer_options': {'lsa_dimensions': 128}}),
+    ('lsa 64', {'ranking': 'lsa', 'vectorizer_options': {'lsa_dimensions': 64}}),
+    ('lsa 32', {'ranking': 'lsa', 'vectorizer_options': {'lsa_dimensions': 32}}),
+    ('lsa 128 int8', {'ranking': 'lsa', 'vectorizer_options': {'lsa_dimensions': 128, 'lsa_quantization': 'int8'}}),
+    ('lsa 64 int8', {'ranking': 'lsa', 'vectorizer_options': {'lsa_dimensions': 64, 'lsa_quantization': 'int8'}}),
+    ('lsa 64 ivf 4/16', {'ranking': 'lsa', 'nprobe': 4,
+                         'vectorizer_options': {'lsa_dimensions': 64, 'ivf_lists': 16}}),
+    ('hashing auto', {'vectorizer': 'hashing'}),
+    ('hashing 2^16', {'vectorizer': 'hashing', 'vectorizer_options': {'n_features': 2 ** 16}}),
+    ('hashing 2^12', {'vectorizer': 'hashing', 'vectorizer_options': {'n_features': 2 ** 12}}),
+    ('hashing 2^9', {'vectorizer': 'hashing', 'vectorizer_options': {'n_features': 2 ** 9}}),
+]
+
+
+def _sparse_bytes(matrix):
+    """Bytes held by the arrays of a sparse matrix."""
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+def column_bytes(query_vectorizer):
+    """
+    Approximate memory of the term -> column mapping and its weights.
+
+    Counts the vocabulary dict with its keys (a hashing vectorizer has
+    none), plus the IDF array.
+    """
+    total = query_vectorizer.idf.nbytes
+    vocabulary = query_vectorizer.vocabulary
+    if vocabulary is not None:
+        total += sys.getsizeof(vocabulary) + sum(sys.getsizeof(term) for term in vocabulary)
+    return total
+
+
+def query_latency(processor, queries, repeat):
+    """
+    Time uncached scoring of single queries.
+
+    Returns:
+        dict: Median and 95th percentile in milliseconds
+    """
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            processor.score_queries([query])
+            timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1000
+    return {'p50_ms': round(float(np.percentile(timings, 50)), 3),
+            'p95_ms': round(float(np.percentile(timings, 95)), 3)}
+
+
+def postings_read(processor, queries):
+    """
+    Mean share of the query-term postings the pruned first stage reads.
+
+    Returns:
+        float: Share in [0, 1], None for variants without dynamic pruning
+    """
+    if not (processor.dynamic_pruning and processor.candidate_depth):
+        return None
+    shares = []
+    for query in queries:
+        job_description = processor.normalize_query(query)
+        index, terms, weights, _ = processor._lexical_query(
+            job_description, processor._preprocess_text(job_description), processor.ranking)
+        total = int(np.diff(index.postings.indptr)[terms].sum())
+        if total:
+            shares.append(index.top_k(terms, weights, processor.candidate_depth)[1] / total)
+    return round(float(np.mean(shares)), 4) if shares else None
+
+
+def batch_latency(processor, queries, repeat, batch_size=64):
+    """
+    Time uncached scoring of the queries in batches.
+
+    Returns:
+        dict: Mean milliseconds per query
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for i in range(0, len(queries), batch_size):
+            processor.score_queries(queries[i:i + batch_size])
+    seconds = time.perf_counter() - start
+    return {'batch_ms': round(seconds * 1000 / (repeat * len(queries)), 3)}
+
+
+def catalog_queries(assessments):
+    """Query texts made of each assessment's name and skills."""
+    return [f"{a.get('name', '')} {a.get('skills', '')}".strip() for a in assessments]
+
+
+def top_k_names(processor, queries, top_k=10):
+    """Top-k recommendation names per query."""
+    return [[r['name'] for r in processor.get_recommendations(query, top_k=top_k)] for query in queries]
+
+
+def benchmark_variant(label, kwargs, assessments, test_sets, queries, repeat):
+    """
+    Fit one variant and measure it.
+
+    Returns:
+        tuple: (metrics dict, fitted processor)
+    """
+    start = time.perf_counter()
+    processor = NLPProcessor(assessments, **kwargs)
+    build_seconds = time.perf_counter() - start
+
+    # The index the variant actually scores with: postings, or dense vectors
+    # (the int8 codes when quantized; the float32 rows are only read to rescore)
+    if processor.ranking == 'lsa':
+        lsa_index = processor.lsa_index
+        columns = lsa_index.dimensions
+        vectors = (lsa_index.embeddings.nbytes if lsa_index.codes is None
+                   else lsa_index.codes.nbytes + lsa_index.scales.nbytes)
+        index_bytes = lsa_index.projection.nbytes + vectors
+    else:
+        postings = processor.bm25_index.postings if processor.ranking == 'bm25' else processor.catalog_postings
+        columns = postings.shape[0]
+        index_bytes = _sparse_bytes(postings)
+    metrics = {
+        'variant': label,
+        'build_ms': round(build_seconds * 1000, 1),
+        'columns': columns,
+        'column_bytes': column_bytes(processor.query_vectorizer),
+        'index_bytes': index_bytes,
+    }
+    for name, test_cases in test_sets.items():
+        evaluation = evaluate_recommendations(processor, test_cases)
+        metrics[name] = {key: round(evaluation[key], 4)
+                         for key in ('avg_recall', 'avg_precision', 'avg_f1')}
+    metrics.update(query_latency(processor, queries, repeat))
+    metrics.update(batch_latency(processor, queries, repeat))
+    metrics['postings_read'] = postings_read(processor, queries)
+    return metrics, processor
+
+
+def ranking_overlap(reference, candidate):
+    """Mean share of the reference top-k found in the candidate top-k."""
+    overlaps = [len(set(a) & set(b)) / len(a) for a, b in zip(reference, candidate) if a]
+    return round(float(np.mean(overlaps)), 4) if overlaps else 0.0
+
+
+def quantization_drift(processor, kwargs, assessments, queries, rankings):
+    """
+    Ranking and score drift of a quantized LSA variant against float32.
+
+    Fits the same variant without quantization and compares the top 10
+    recommendations and the score vectors of every query.
+
+    Returns:
+        dict: Top-10 overlap with float32 and the mean of the largest
+            absolute score difference per query; empty for other variants
+    """
+    options = dict(kwargs.get('vectorizer_options') or {})
+    if not options.pop('lsa_quantization', None):
+        return {}
+    exact = NLPProcessor(assessments, **dict(kwargs, vectorizer_options=options))
+    errors = []
+    for query in queries:
+        job_description = processor.normalize_query(query)
+        errors.append(np.abs(processor.score_query(job_description) - exact.score_query(job_description)).max())
+    return {'fp32_overlap': ranking_overlap(top_k_names(exact, queries), rankings),
+            'score_error': round(float(np.mean(errors)), 5)}
+
+
+def scale_catalog(assessments, copies):
+    """Replicate a catalog with distinct ids and names."""
+    if copies <= 1:
+        return assessments
+    return [dict(a, id=f"{a.get('id')}-{i}", name=f"{a.get('name', '')} {i}")
+            for i in range(copies) for a in assessments]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark index variants.")
+    parser.add_argument('--repeat', type=int, default=5, help="Timing passes over the queries")
+    parser.add_argument('--scale', type=int, default=1, help="Copies of the catalog to index")
+    parser.add_argument('--variant', action='append', default=None,
+                        help="Only run this variant (repeatable; the first is the reference)")
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    variants = VARIANTS
+    if args.variant:
+        known = dict(VARIANTS)
+        variants = [(label, known[label]) for label in args.variant]
+    catalog = load_assessments('../data/shl_assessments.json')
+    assessments = scale_catalog(catalog, args.scale)
+    test_sets = {name: load_test_data(name) for name in TEST_FILES}
+    queries = [case['query'] for cases in test_sets.values() for case in cases]
+    queries += catalog_queries(catalog)
+
+    # Import scikit-learn up front so it does not count as build time
+    import sklearn.feature_extraction.text  # noqa: F401
+
+    results = []
+    reference = None
+    for label, kwargs in variants:
+        metrics, processor = benchmark_variant(label, kwargs, assessments, test_sets, queries, args.repeat)
+        rankings = top_k_names(processor, queries)
+        if reference is None:
+            reference = rankings
+        metrics['top10_overlap'] = ranking_overlap(reference, rankings)
+        metrics.update(quantization_drift(processor, kwargs, assessments, queries, rankings))
+        results.append(metrics)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{len(assessments)} assessments, {len(queries)} queries, reference: {variants[0][0]}\n")
+    print(f"{'variant':<18}{'columns':>9}{'col KB':>9}{'index KB':>9}{'build ms':>10}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'batch':>8}{'read':>7}{'recall':>9}{'prec':>8}{'overlap':>9}")
+    for m in results:
+        quality = m[TEST_FILES[0]]
+        read = f"{m['postings_read']:.3f}" if m['postings_read'] is not None else '-'
+        print(f"{m['variant']:<18}{m['columns']:>9}{m['column_bytes'] / 1024:>9.1f}"
+              f"{m['index_bytes'] / 1024:>9.1f}{m['build_ms']:>10.1f}{m['p50_ms']:>9.3f}"
+              f"{m['p95_ms']:>9.3f}{m['batch_ms']:>8.3f}{read:>7}{quality['avg_recall']:>9.4f}{quality['avg_precision']:>8.4f}"
+              f"{m['top10_overlap']:>9.4f}")
+    for m in results:
+        if 'fp32_overlap' in m:
+            print(f"{m['variant']}: top 10 overlap with float32 {m['fp32_overlap']:.4f}, "
+                  f"mean max score error {m['score_error']}")
+    print(f"\nrecall/prec on {TEST_FILES[0]}; overlap is the share of the reference top 10 kept;"
+          f" read is the share of query-term postings read with dynamic pruning;"
+          f" batch is ms per query scored 64 at a time; columns are LSA dimensions for the lsa variants;"
+          f" index KB of int8 variants counts the codes, not the float32 rows read to rescore")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Check the Aho-Corasick keyword matcher against naive substring matching.
+
+For every pattern the naive matcher scans the text with ``str.find`` and,
+for patterns short enough to need a word boundary, checks the characters
+around each occurrence. Both matchers run over the compiled boost rule
+patterns (query side and assessment side) on the SHL test queries, one
+query per assessment and every assessment text, with and without word
+boundaries, and over random patterns and texts with overlapping matches.
+
+Usage (from test_data/):
+    python test_keyword_matcher.py
+"""
+import json
+import random
+import sys
+import os
+
+# Add parent directory to path so we can import our modules
+sys.path.insert(0, os.path.abspath('..'))
+
+from utils.data_loader import load_assessments
+from utils.field_cache import AssessmentFieldCache
+from utils.keyword_matcher import KeywordMatcher
+from utils.rules import load_rules
+from benchmark_vectorizers import TEST_FILES, catalog_queries
+
+
+def is_word_char(char):
+    """Whether a character glues to a keyword, like KeywordMatcher._on_boundary."""
+    return char.isalnum() or char == '_'
+
+
+def naive_find(patterns, text, word_boundary_max_length=0):
+    """
+    Indices of the patterns occurring in a text, one pattern at a time.
+    """
+    found = set()
+    for index, pattern in enumerate(patterns):
+        if not pattern:
+            continue
+        bounded = len(pattern) <= word_boundary_max_length
+        position = text.find(pattern)
+        while position != -1:
+            end = position + len(pattern)
+            if not bounded or ((position == 0 or not is_word_char(text[position - 1])) and
+                               (end == len(text) or not is_word_char(text[end]))):
+                found.add(index)
+                break
+            position = text.find(pattern, position + 1)
+    return found
+
+
+def compare(patterns, texts, word_boundary_max_length):
+    """
+    Texts on which the two matchers disagree.
+
+    Returns:
+        list: (text, matcher result, naive result) per mismatch
+    """
+    matcher = KeywordMatcher(patterns, word_boundary_max_length)
+    mismatches = []
+    for text in texts:
+        expected = naive_find(patterns, text, word_boundary_max_length)
+        actual = matcher.find(text)
+        if actual != expected:
+            mismatches.append((text, actual, expected))
+    return mismatches
+
+
+def random_cases(seed=0, cases=200):
+    """
+    Random patterns and texts over a small alphabet, so matches overlap,
+    nest and share prefixes and suffixes.
+    """
+    rng = random.Random(seed)
+    alphabet = 'ab_ c1'
+    for _ in range(cases):
+        patterns = [''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 4)))
+                    for _ in range(rng.randint(1, 12))]
+        texts = [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 40))) for _ in range(20)]
+        yield patterns, texts
+
+
+def main():
+    rules = load_rules()
+    assessments = load_assessments('../data/shl_assessments.json')
+    queries = []
+    for path in TEST_FILES:
+        with open(path, 'r', encoding='utf-8') as f:
+            queries.extend(case['query'] for case in json.load(f))
+    queries = [query.lower() for query in queries + catalog_queries(assessments)]
+    cache = AssessmentFieldCache(assessments)
+    assessment_texts = [cache.text(i) for i in range(cache.size)]
+
+    query_patterns = rules.keywords + rules.roles + rules.penalty_query_terms
+    checks = []
+    for boundary in (0, rules.word_boundary_max_length):
+        checks.append((f"query patterns, word boundary {boundary}", query_patterns, queries, boundary))
+        checks.append((f"feature columns, word boundary {boundary}", rules.feature_columns,
+                       assessment_texts, boundary))
+    for i, (patterns, texts) in enumerate(random_cases()):
+        checks.append((f"random case {i}", patterns, texts, i % 4))
+
+    failed = 0
+    for name, patterns, texts, boundary in checks:
+        mismatches = compare(patterns, texts, boundary)
+        if mismatches:
+            failed += 1
+            text, actual, expected = mismatches[0]
+            print(f"FAIL {name}: {len(mismatches)} of {len(texts)} texts differ, e.g. {text!r}: "
+                  f"matcher {sorted(actual)}, naive {sorted(expected)}")
+        elif not name.startswith("random"):
+            print(f"ok   {name}: {len(texts)} texts, {len(patterns)} patterns")
+    print(f"{len(checks) - failed} of {len(checks)} checks passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Check the MaxScore candidates against brute-force top-k.
+
+For the cosine and the BM25F postings of the SHL catalog (and of a catalog
+scaled up with ``scale_catalog``) every benchmark query, alone and joined
+with the next ones into a longer query, is scored exhaustively and its top
+k compared with ``InvertedIndex.top_k``. Ties at the k-th score may be
+broken either way; everything strictly above it must be found and nothing
+below it returned. Each case runs again with a random tenth of the
+assessments excluded, like the rows deleted or replaced by incremental
+updates, which must never be returned nor push a live assessment out.
+
+Finally a processor with deleted and replaced assessments must keep the
+best assessments of exhaustive reranking among its candidates with dynamic
+pruning, and never recommend a deleted assessment.
+
+Usage (from test_data/):
+    python test_maxscore.py
+"""
+import json
+import logging
+import sys
+import os
+
+# Add parent directory to path so we can import our modules
+sys.path.insert(0, os.path.abspath('..'))
+
+import numpy as np
+from utils.data_loader import load_assessments
+from utils.nlp_processor import NLPProcessor
+from benchmark_vectorizers import TEST_FILES, catalog_queries, scale_catalog
+
+DEPTHS = (10, 50)
+SCALES = (1, 20)
+
+# Scores closer than this count as tied
+TOLERANCE = 1e-9
+
+# Best assessments of the exhaustive ranking that pruning must score
+TOP_ROWS = 5
+
+
+def brute_force_top_k(index, terms, weights, k, exclude):
+    """
+    Exhaustive scores of every assessment and the k-th best positive score.
+    """
+    scores = np.zeros(index.size)
+    postings = index.postings
+    for term, weight in zip(terms, weights):
+        start, end = postings.indptr[term], postings.indptr[term + 1]
+        scores[postings.indices[start:end]] += weight * postings.data[start:end]
+    scores[exclude] = -np.inf
+    positive = np.sort(scores[scores > 0])[::-1]
+    kth = positive[k - 1] if len(positive) >= k else 0.0
+    return scores, kth, min(k, len(positive))
+
+
+def agrees(rows, scores, kth, expected_count, exclude):
+    """
+    Whether MaxScore rows are a valid top k of the exhaustive scores.
+    """
+    if len(rows) != expected_count or np.isin(rows, exclude).any():
+        return False
+    above = np.flatnonzero(scores > kth + TOLERANCE)
+    return bool(np.isin(above, rows).all() and (scores[rows] >= kth - TOLERANCE).all())
+
+
+def lexical_queries(processor, queries, ranking):
+    """
+    (term rows, weights) of every query for one inverted index.
+    """
+    if ranking == 'bm25':
+        bm25 = processor.bm25_index
+        result = []
+        for query in queries:
+            terms = np.array(bm25.query_terms(query.lower()), dtype=np.int64)
+            result.append((terms, np.ones(len(terms))))
+        return result
+    return [processor.query_vectorizer.cosine_query(processor._preprocess_text(query.lower()))
+            for query in queries]
+
+
+def check_index(processor, queries, rng):
+    """
+    Compare MaxScore with brute force for both rankings, depths and exclusions.
+
+    Returns:
+        list: (name, failed queries, queries) per check
+    """
+    size = processor.catalog_postings.shape[1]
+    excluded = np.sort(rng.choice(size, size // 10, replace=False))
+    results = []
+    for ranking in ('cosine', 'bm25'):
+        index = processor.bm25_index.inverted_index if ranking == 'bm25' else processor.inverted_index
+        lexical = lexical_queries(processor, queries, ranking)
+        for depth in DEPTHS:
+            for exclude in (np.zeros(0, dtype=np.int64), excluded):
+                failed = 0
+                for terms, weights in lexical:
+                    rows, _ = index.top_k(terms, weights, depth, exclude if len(exclude) else None)
+                    scores, kth, count = brute_force_top_k(index, terms, weights, depth, exclude)
+                    if not agrees(rows, scores, kth, count, exclude):
+                        failed += 1
+                name = f"{ranking} top {depth}" + (f", {len(exclude)} excluded" if len(exclude) else "")
+                results.append((name, failed, len(lexical)))
+    return results
+
+
+def check_updates(assessments, queries, rng):
+    """
+    Scores of an updated processor with and without dynamic pruning.
+
+    Pruning scores the candidates only and leaves the other assessments at 0,
+    and lexical ties at the candidate depth may be broken either way, so the
+    tails of the rankings may differ; the best assessments of the exhaustive
+    ranking must be among the pruned candidates.
+
+    Returns:
+        list: (name, failed queries, queries) per ranking
+    """
+    deletes = [a['id'] for a in rng.choice(assessments, 10, replace=False)]
+    upserts = [dict(a, name=f"{a['name']} updated") for a in assessments[:5] if a['id'] not in deletes]
+    results = []
+    for ranking in ('cosine', 'bm25'):
+        pruned = NLPProcessor(assessments, ranking=ranking, candidate_depth=20, dynamic_pruning=True)
+        pruned = pruned.apply_updates(upserts, deletes)
+        exhaustive = NLPProcessor(assessments, ranking=ranking, candidate_depth=20)
+        exhaustive = exhaustive.apply_updates(upserts, deletes)
+        failed = 0
+        for query in queries:
+            expected = exhaustive.score_query(query)
+            actual = pruned.score_query(query)
+            scored = np.flatnonzero(actual != 0)
+            best = np.argsort(-expected, kind='stable')[:TOP_ROWS]
+            recommended = {r['id'] for r in pruned.get_recommendations(query, top_k=10)}
+            if not np.isin(best[expected[best] > 0], scored).all() or recommended & set(deletes):
+                failed += 1
+        results.append((f"{ranking} with updates, pruned vs exhaustive top 5", failed, len(queries)))
+    return results
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    rng = np.random.default_rng(0)
+    assessments = load_assessments('../data/shl_assessments.json')
+    queries = []
+    for path in TEST_FILES:
+        with open(path, 'r', encoding='utf-8') as f:
+            queries.extend(case['query'] for case in json.load(f))
+    queries += catalog_queries(assessments)
+    # Longer queries read more posting lists and prune more
+    long_queries = [" ".join(queries[i:i + 6]) for i in range(0, len(queries), 6)]
+
+    results = []
+    for scale in SCALES:
+        processor = NLPProcessor(scale_catalog(assessments, scale))
+        for name, failed, total in check_index(processor, queries + long_queries, rng):
+            results.append((f"{processor.catalog_size} assessments, {name}", failed, total))
+    results += check_updates(assessments, queries, rng)
+
+    failures = 0
+    for name, failed, total in results:
+        if failed:
+            failures += 1
+            print(f"FAIL {name}: {failed} of {total} queries differ")
+        else:
+            print(f"ok   {name}: {total} queries")
+    print(f"{len(results) - failures} of {len(results)} checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Check that the serving-path QueryVectorizer reproduces scikit-learn exactly.
+
+For several TfidfVectorizer settings the catalog is fitted by NLPProcessor
+and the SHL test queries plus one query per assessment are vectorized both
+with ``TfidfVectorizer.transform`` and with ``QueryVectorizer.transform``;
+the rows must be equal bit for bit. The cosine scores of single queries and
+of the whole batch must equal ``cosine_similarity`` against the fitted
+matrix, and a vectorizer loaded from a saved index must give the same rows.
+
+Usage (from test_data/):
+    python test_query_vectorizer.py
+"""
+import json
+import logging
+import sys
+import os
+import tempfile
+
+# Add parent directory to path so we can import our modules
+sys.path.insert(0, os.path.abspath('..'))
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+from utils.data_loader import load_assessments
+from utils.index_store import load_index, save_index
+from utils.nlp_processor import NLPProcessor
+from benchmark_vectorizers import TEST_FILES, catalog_queries
+
+# TfidfVectorizer settings checked, by name
+SETTINGS = {
+    "default": {},
+    "sublinear_tf": {"sublinear_tf": True},
+    "min_df 2, max_df 0.5": {"min_df": 2, "max_df": 0.5},
+    "max_features 300": {"max_features": 300},
+}
+
+
+def same_rows(expected, actual):
+    """
+    Whether two CSR matrices have the same columns and bitwise equal values.
+    """
+    expected = expected.tocsr()
+    expected.sort_indices()
+    actual = actual.tocsr()
+    return (expected.shape == actual.shape
+            and np.array_equal(expected.indptr, actual.indptr)
+            and np.array_equal(expected.indices, actual.indices)
+            and np.array_equal(expected.data, actual.data))
+
+
+def check(processor, texts):
+    """
+    Compare the serving transformer of a fitted processor with scikit-learn.
+
+    Returns:
+        list: Descriptions of the failed comparisons
+    """
+    failures = []
+    query_vectorizer = processor.query_vectorizer
+    expected_rows = processor.vectorizer.transform(texts)
+    if not same_rows(expected_rows, query_vectorizer.transform(texts)):
+        failures.append("transform rows differ")
+
+    expected = cosine_similarity(expected_rows, processor.assessment_vectors)
+    batch = query_vectorizer.similarity(texts, processor.catalog_postings)
+    if not np.array_equal(expected, batch):
+        failures.append(f"batch similarity differs for {int((expected != batch).any(axis=1).sum())} queries")
+    single = np.vstack([query_vectorizer.similarity([text], processor.catalog_postings) for text in texts])
+    if not np.array_equal(expected, single):
+        failures.append(f"single similarity differs for {int((expected != single).any(axis=1).sum())} queries")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'index')
+        save_index(processor, path, 'parity')
+        loaded = load_index(path, rules=processor.rules)
+        if not same_rows(expected_rows, loaded.query_vectorizer.transform(texts)):
+            failures.append("transform rows of the loaded index differ")
+    return failures
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    assessments = load_assessments('../data/shl_assessments.json')
+    queries = []
+    for path in TEST_FILES:
+        with open(path, 'r', encoding='utf-8') as f:
+            queries.extend(case['query'] for case in json.load(f))
+    queries += catalog_queries(assessments)
+
+    failed = 0
+    for name, options in SETTINGS.items():
+        processor = NLPProcessor(assessments, vectorizer_options=options)
+        texts = [processor._preprocess_text(query) for query in queries]
+        failures = check(processor, texts)
+        if failures:
+            failed += 1
+            print(f"FAIL {name}: " + "; ".join(failures))
+        else:
+            print(f"ok   {name}: {len(texts)} queries, {len(processor.query_vectorizer.idf)} columns")
+    print(f"{len(SETTINGS) - failed} of {len(SETTINGS)} settings passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
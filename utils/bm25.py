@@ -0,0 +1,260 @@
+import json
+import logging
+import os
+import numpy as np
+import scipy.sparse as sp
+from utils.inverted_index import InvertedIndex
+from utils.packed_table import PackedVocabulary, save_packed_vocabulary
+
+
+class BM25Index:
+    """
+    BM25F ranking over an inverted index of the assessment fields.
+
+    Each field (name, description, skills, type) is tokenized separately and
+    its term frequencies are normalized by the field length relative to the
+    field's average length, weighted by the field boost and summed into one
+    pseudo term frequency per (assessment, term). Everything that does not
+    depend on the query - IDF, saturation and length normalization - is
+    folded into one impact per posting at build time, so a query only sums
+    the posting lists of its own terms.
+
+    Scores are divided by the largest score the query could reach (every
+    query term at full saturation), which keeps them in [0, 1) like the
+    cosine similarity and on the same scale as the rule-based boosts.
+
+    The index is saved with the rest of an index artifact and memory-mapped
+    by ``load``; assessments changed since are scored by a ``segment``
+    built with the same statistics.
+    """
+
+    # Field -> boost; replaces repeating the name and skills in the text
+    DEFAULT_FIELD_WEIGHTS = {'name': 2.0, 'description': 1.0, 'skills': 2.0, 'type': 0.5}
+
+    def __init__(self, assessments, analyze, field_weights=None, k1=1.2, b=0.75):
+        """
+        Build the index.
+
+        Args:
+            assessments (list): List of assessment dictionaries
+            analyze (callable): Text -> list of tokens, used for fields and queries
+            field_weights (dict, optional): Field -> boost
+            k1 (float): Term frequency saturation
+            b (float): Strength of the field length normalization
+        """
+        self.logger = logging.getLogger(__name__)
+        self.analyze = analyze
+        self.field_weights = dict(field_weights or self.DEFAULT_FIELD_WEIGHTS)
+        self.k1 = k1
+        self.b = b
+        self.size = len(assessments)
+        self.documents = self.size
+
+        self.vocabulary = {}
+        field_lengths, entries = self._field_terms(assessments, grow=True)
+
+        # Per-field length normalization against the average over the catalog
+        average_lengths = field_lengths.mean(axis=0) if self.size else np.ones(len(self.field_weights))
+        average_lengths[average_lengths == 0] = 1.0
+        self.average_lengths = average_lengths
+        pseudo_tf = self._pseudo_tf(field_lengths, entries, len(self.vocabulary))
+
+        # Documents containing each term in any field
+        document_frequency = np.bincount(pseudo_tf.indices, minlength=len(self.vocabulary))
+        self.idf = np.log(1 + (self.documents - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        self.postings = self._impacts(pseudo_tf)
+        self.max_impact = np.zeros(len(self.vocabulary))
+        np.maximum.at(self.max_impact, pseudo_tf.indices, pseudo_tf.data)
+        self.inverted_index = InvertedIndex(self.postings, self.max_impact)
+        self.logger.info(
+            f"Built BM25 index: {self.documents} assessments, {len(self.vocabulary)} terms, "
+            f"{self.postings.nnz} postings")
+
+    def _field_terms(self, assessments, grow):
+        """
+        Tokenize the fields of assessments.
+
+        Args:
+            assessments (list): Assessment dictionaries
+            grow (bool): Add unknown tokens to the vocabulary instead of dropping them
+
+        Returns:
+            tuple: (field lengths of shape (assessments, fields), (row, term,
+                field, count) arrays with one entry per distinct term of each field)
+        """
+        fields = list(self.field_weights)
+        vocabulary = self.vocabulary
+        field_lengths = np.zeros((len(assessments), len(fields)), dtype=np.float64)
+        rows, terms, field_ids, counts = [], [], [], []
+        for row, assessment in enumerate(assessments):
+            for field_id, field in enumerate(fields):
+                value = assessment.get(field) or ''
+                if isinstance(value, (list, tuple)):
+                    value = ' '.join(str(item) for item in value)
+                tokens = self.analyze(str(value))
+                field_lengths[row, field_id] = len(tokens)
+                frequencies = {}
+                for token in tokens:
+                    term = vocabulary.setdefault(token, len(vocabulary)) if grow else vocabulary.get(token)
+                    if term is not None:
+                        frequencies[term] = frequencies.get(term, 0) + 1
+                for term, count in frequencies.items():
+                    rows.append(row)
+                    terms.append(term)
+                    field_ids.append(field_id)
+                    counts.append(count)
+        entries = (np.array(rows, dtype=np.int64), np.array(terms, dtype=np.int64),
+                   np.array(field_ids, dtype=np.int64), np.array(counts, dtype=np.float64))
+        return field_lengths, entries
+
+    def _pseudo_tf(self, field_lengths, entries, n_terms):
+        """
+        Length-normalized, field-weighted term frequencies of shape (assessments, terms).
+        """
+        rows, terms, field_ids, counts = entries
+        norms = 1 - self.b + self.b * field_lengths[rows, field_ids] / self.average_lengths[field_ids]
+        weights = np.array([self.field_weights[field] for field in self.field_weights])
+        pseudo_tf = sp.csr_matrix((weights[field_ids] * counts / norms, (rows, terms)),
+                                  shape=(len(field_lengths), n_terms))
+        pseudo_tf.sum_duplicates()
+        return pseudo_tf
+
+    def _impacts(self, pseudo_tf):
+        """
+        Fold IDF and saturation into the pseudo term frequencies, in place,
+        and return them term-major.
+        """
+        tf = pseudo_tf.data
+        pseudo_tf.data = self.idf[pseudo_tf.indices] * tf * (self.k1 + 1) / (self.k1 + tf)
+        return pseudo_tf.T.tocsr()
+
+    def segment(self, assessments):
+        """
+        Index more assessments with the statistics of this one.
+
+        Like the cosine delta segment, new assessments are weighted with the
+        IDF and average field lengths of the indexed catalog and terms it does
+        not know are dropped, so their scores are comparable with those of
+        this index and nothing here is rebuilt.
+
+        Args:
+            assessments (list): Assessment dictionaries, e.g. changed ones
+
+        Returns:
+            BM25Index: Index over the given assessments only
+        """
+        segment = BM25Index.__new__(BM25Index)
+        segment.__dict__.update(self.__dict__)
+        segment.size = len(assessments)
+        field_lengths, entries = self._field_terms(assessments, grow=False)
+        pseudo_tf = self._pseudo_tf(field_lengths, entries, len(self.idf))
+        segment.postings = self._impacts(pseudo_tf)
+        segment.max_impact = np.zeros(len(self.idf))
+        np.maximum.at(segment.max_impact, pseudo_tf.indices, pseudo_tf.data)
+        segment.inverted_index = InvertedIndex(segment.postings, segment.max_impact)
+        return segment
+
+    def save(self, directory, name='bm25'):
+        """
+        Write the index as a packed vocabulary, ``.npy`` arrays and a JSON header.
+
+        Args:
+            directory (str): Target directory
+            name (str): File name prefix
+        """
+        vocabulary = self.vocabulary
+        save_packed_vocabulary(directory, f"{name}_vocabulary", sorted(vocabulary, key=vocabulary.get))
+        for array in ('idf', 'max_impact', 'average_lengths'):
+            np.save(os.path.join(directory, f"{name}_{array}.npy"), getattr(self, array))
+        for part in ('data', 'indices', 'indptr'):
+            np.save(os.path.join(directory, f"{name}_postings_{part}.npy"), getattr(self.postings, part))
+        header = {"field_weights": self.field_weights, "k1": self.k1, "b": self.b,
+                  "size": self.size, "documents": self.documents,
+                  "postings_shape": list(self.postings.shape)}
+        with open(os.path.join(directory, f"{name}.json"), 'w') as f:
+            json.dump(header, f)
+
+    @classmethod
+    def load(cls, directory, analyze=None, name='bm25', mmap_mode='r'):
+        """
+        Open an index written by ``save`` without rebuilding it.
+
+        Args:
+            directory (str): Directory holding the index files
+            analyze (callable, optional): Text -> list of tokens, the one the index
+                was built with; the processor serving the index sets it when not given
+            name (str): File name prefix
+            mmap_mode (str, optional): ``numpy.load`` mmap mode, None reads into memory
+
+        Returns:
+            BM25Index: The index
+        """
+        with open(os.path.join(directory, f"{name}.json"), 'r') as f:
+            header = json.load(f)
+        index = cls.__new__(cls)
+        index.logger = logging.getLogger(__name__)
+        index.analyze = analyze
+        index.field_weights = header["field_weights"]
+        index.k1 = header["k1"]
+        index.b = header["b"]
+        index.size = header["size"]
+        index.documents = header["documents"]
+        index.vocabulary = PackedVocabulary(directory, f"{name}_vocabulary", mmap_mode)
+        for array in ('idf', 'max_impact', 'average_lengths'):
+            setattr(index, array, np.load(os.path.join(directory, f"{name}_{array}.npy"),
+                                          mmap_mode=mmap_mode))
+        parts = [np.load(os.path.join(directory, f"{name}_postings_{part}.npy"), mmap_mode=mmap_mode)
+                 for part in ('data', 'indices', 'indptr')]
+        index.postings = sp.csr_matrix(tuple(parts), shape=tuple(header["postings_shape"]))
+        index.inverted_index = InvertedIndex(index.postings, index.max_impact)
+        return index
+
+    def query_terms(self, text):
+        """
+        Distinct indexed terms of a query.
+        """
+        vocabulary = self.vocabulary
+        return sorted({term for term in map(vocabulary.get, self.analyze(text)) if term is not None})
+
+    def query_norm(self, terms):
+        """
+        Largest score a query with these terms can reach; scores are divided by it.
+        """
+        return self.idf[terms].sum() * (self.k1 + 1)
+
+    def score(self, text):
+        """
+        Normalized BM25F score of every assessment for one query.
+
+        Args:
+            text (str): Query text, preprocessed like the fields
+
+        Returns:
+            numpy.ndarray: Score per assessment
+        """
+        scores = np.zeros(self.size)
+        terms = self.query_terms(text)
+        if not terms:
+            return scores
+        indptr, docs, impacts = self.postings.indptr, self.postings.indices, self.postings.data
+        for term in terms:
+            start, end = indptr[term], indptr[term + 1]
+            scores[docs[start:end]] += impacts[start:end]
+        scores /= self.query_norm(terms)
+        return scores
+
+    def scores(self, texts):
+        """
+        Normalized BM25F scores for several queries.
+
+        Args:
+            texts (list): Query texts
+
+        Returns:
+            numpy.ndarray: Scores of shape (texts, assessments)
+        """
+        result = np.zeros((len(texts), self.size))
+        for i, text in enumerate(texts):
+            result[i] = self.score(text)
+        return result
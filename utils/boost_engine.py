@@ -0,0 +1,217 @@
+import logging
+import numpy as np
+from scipy import sparse
+from utils.field_cache import row_positions
+
+
+class BoostEngine:
+    """
+    Applies the keyword, category and role boosts to a whole catalog at once.
+
+    All assessment-side keyword matching is done when the engine is built:
+    every assessment becomes a row of a sparse incidence matrix whose columns
+    are the category keywords, the category names and the role terms. At
+    query time only the job description is scanned; the boost for every
+    assessment is then a single sparse matrix-vector product.
+    """
+
+    def __init__(self, field_cache, rules, features=None, penalty_flags=None, feature_postings=None):
+        """
+        Build the incidence matrices for the catalog.
+
+        Args:
+            field_cache (AssessmentFieldCache): Normalized assessment fields
+            rules (CompiledRules): Compiled boost rule tables
+            features (scipy.sparse.csr_matrix, optional): Previously built
+                feature matrix for the same catalog and rules; skips the scan
+            penalty_flags (numpy.ndarray, optional): Previously built penalty flags
+            feature_postings (scipy.sparse.csr_matrix, optional): Previously
+                built transpose of the feature matrix
+        """
+        self.logger = logging.getLogger(__name__)
+        self.field_cache = field_cache
+        self.rules = rules
+
+        # Column layout of the feature matrix:
+        # [category keywords | category names | role terms]
+        self._category_offset = len(rules.keywords)
+        self._role_term_offset = self._category_offset + len(rules.categories)
+
+        if features is not None and penalty_flags is not None:
+            self.features = features
+            self.penalty_flags = penalty_flags
+        else:
+            self._build_features()
+
+        # Feature column -> assessments, to find the rule hits of a query
+        if feature_postings is None:
+            feature_postings = self.features.T.tocsr()
+        self.feature_postings = feature_postings
+
+    def _build_features(self):
+        """
+        Scan every assessment once and record which feature columns it contains.
+        """
+        cache = self.field_cache
+        n_columns = len(self.rules.feature_columns)
+        rows, cols = [], []
+        for i in range(cache.size):
+            columns = self.rules.match_features(cache.text(i))
+            rows.extend([i] * len(columns))
+            cols.extend(columns)
+
+        self.features = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(cache.size, n_columns))
+
+        name_terms = self.rules.penalty_name_terms
+        self.penalty_flags = np.array(
+            [any(term in cache.field(i, 'name') for term in name_terms) for i in range(cache.size)],
+            dtype=float)
+
+        self.logger.info(
+            f"Built boost features: {self.features.shape[1]} columns, {self.features.nnz} matches")
+
+    def compute_boosts(self, job_description):
+        """
+        Compute the boost for every assessment given a job description.
+
+        Args:
+            job_description (str): The job description text
+
+        Returns:
+            numpy.ndarray: Boost value per assessment
+        """
+        return self.compute_boosts_batch([job_description])[:, 0]
+
+    def query_features(self, job_descriptions):
+        """
+        Scan job descriptions for the rule features they activate.
+
+        Args:
+            job_descriptions (list): Job description texts
+
+        Returns:
+            tuple: (feature weights of shape (features, job descriptions),
+                list of term sets for the term match boost, penalty flag per
+                job description)
+        """
+        rules = self.rules
+        weights = rules.weights
+        n_queries = len(job_descriptions)
+
+        feature_weights = np.zeros((self.features.shape[1], n_queries))
+        job_term_sets = []
+        penalized = np.zeros(n_queries)
+
+        for j, job_description in enumerate(job_descriptions):
+            job_description_lower = job_description.lower()
+
+            # Identify categories and roles present in the job description
+            keyword_hits, active_roles, penalize = rules.match_query(job_description_lower)
+            category_counts = keyword_hits @ rules.category_keywords
+            active_categories = (category_counts > 0).astype(float)
+
+            feature_weights[:self._category_offset, j] = rules.category_keywords @ (
+                weights['category_keyword'] * category_counts / rules.category_sizes)
+            feature_weights[self._category_offset:self._role_term_offset, j] = (
+                weights['category_name'] * active_categories)
+            feature_weights[self._role_term_offset:, j] = (
+                weights['role_match'] * (active_roles @ rules.role_term_matrix))
+
+            # Basic term matching (small boost)
+            job_term_sets.append({term for term in job_description_lower.split() if len(term) > 3})
+
+            penalized[j] = penalize
+
+        return feature_weights, job_term_sets, penalized
+
+    def rule_hits(self, feature_weights, limit=None, exclude=None):
+        """
+        Assessments that a query's keyword, category or role rules would boost.
+
+        Only the postings of the query's active feature columns are read.
+
+        Args:
+            feature_weights (numpy.ndarray): One query's feature weights, from
+                ``query_features``
+            limit (int, optional): Keep only this many assessments, those with
+                the largest rule boost
+            exclude (numpy.ndarray, optional): Assessments never returned, e.g.
+                deleted or replaced rows; they take no place within the limit
+
+        Returns:
+            numpy.ndarray: Assessment indices
+        """
+        columns = np.flatnonzero(feature_weights)
+        if not len(columns):
+            return np.zeros(0, dtype=np.int64)
+        postings = self.feature_postings
+        positions, owners = row_positions(postings.indptr, columns)
+        hits, inverse = np.unique(postings.indices[positions], return_inverse=True)
+        keep = ~np.isin(hits, exclude) if exclude is not None and len(exclude) else None
+        if limit is None or len(hits) <= limit:
+            return hits if keep is None else hits[keep]
+        boosts = np.bincount(inverse, weights=postings.data[positions] * feature_weights[columns][owners])
+        if keep is not None:
+            hits, boosts = hits[keep], boosts[keep]
+            if len(hits) <= limit:
+                return hits
+        return hits[np.argpartition(-boosts, limit - 1)[:limit]]
+
+    def _row_products(self, rows, feature_weights):
+        """
+        Feature boosts of selected assessments, reading only their matrix rows.
+
+        Equivalent to ``self.features[rows] @ feature_weights`` without
+        building the row subset as a new sparse matrix.
+        """
+        features = self.features
+        offsets, owner = row_positions(features.indptr, rows)
+        boosts = np.zeros((len(rows), feature_weights.shape[1]))
+        values = features.data[offsets]
+        columns = features.indices[offsets]
+        for j in range(feature_weights.shape[1]):
+            boosts[:, j] = np.bincount(owner, weights=values * feature_weights[columns, j],
+                                       minlength=len(rows))
+        return boosts
+
+    def compute_boosts_batch(self, job_descriptions, rows=None, query_features=None):
+        """
+        Compute the boosts of every assessment for several job descriptions.
+
+        Each job description is scanned once to build one column of feature
+        weights; the boosts of the whole batch are then a single sparse
+        matrix product.
+
+        Args:
+            job_descriptions (list): Job description texts
+            rows (numpy.ndarray, optional): Assessment indices to compute the
+                boosts of; every assessment when not given
+            query_features (tuple, optional): Result of ``query_features`` for
+                the job descriptions, to avoid scanning them again
+
+        Returns:
+            numpy.ndarray: Boost matrix of shape (assessments or rows, job descriptions)
+        """
+        weights = self.rules.weights
+        if query_features is None:
+            query_features = self.query_features(job_descriptions)
+        feature_weights, job_term_sets, penalized = query_features
+
+        if rows is None:
+            boosts = self.features @ feature_weights
+            penalty_flags = self.penalty_flags
+        else:
+            boosts = self._row_products(rows, feature_weights)
+            penalty_flags = self.penalty_flags[rows]
+
+        term_counts = np.zeros(boosts.shape)
+        for j, job_terms in enumerate(job_term_sets):
+            term_counts[:, j] = self.field_cache.term_match_counts(job_terms, rows)
+        boosts += weights['term_match'] * term_counts
+
+        # Apply domain-specific penalties
+        if penalized.any():
+            boosts -= weights['programming_penalty'] * np.outer(penalty_flags, penalized)
+
+        return boosts
@@ -0,0 +1,223 @@
+"""
+Offline bulk scoring of JSONL job descriptions.
+
+Loads the catalog and its persisted index (fitting it only when no index
+matches the catalog) once, then fans the records of a JSONL file out over a
+process pool. Worker processes are forked from the parent after the index is
+loaded, so they share it instead of loading it again.
+
+Each input line is a JSON object holding the text to score in
+'job_description' or 'query' (or 'title' and 'body', as in requests.jsonl)
+and an optional 'id' / 'request_id'.
+
+Usage:
+    python -m utils.bulk_score requests.jsonl -o results.jsonl
+    python -m utils.bulk_score requests.jsonl -o results.csv --format csv --workers 8
+"""
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from itertools import islice
+
+from utils.data_loader import load_assessments
+from utils.index_store import DEFAULT_INDEX_DIR, load_or_build_processor
+from utils.query_cache import QueryCache
+
+logger = logging.getLogger(__name__)
+
+CSV_COLUMNS = ['id', 'rank', 'assessment_id', 'name', 'score', 'elapsed_ms', 'error']
+
+# Processor used by the worker processes; set before the pool is created
+# (inherited on fork) or by _init_worker (spawn)
+_processor = None
+_top_k = 10
+
+
+def _load_processor(catalog_path, index_dir):
+    """
+    Load the catalog and the processor for it.
+    """
+    return load_or_build_processor(load_assessments(catalog_path), index_dir=index_dir, cache=QueryCache())
+
+
+def _init_worker(catalog_path, index_dir, top_k):
+    """
+    Build the processor in a worker when it could not be inherited by fork.
+    """
+    global _processor, _top_k
+    _top_k = top_k
+    if _processor is None:
+        logging.disable(logging.INFO)
+        _processor = _load_processor(catalog_path, index_dir)
+
+
+def _record_text(record):
+    """
+    Extract the job description to score from an input record.
+    """
+    text = record.get('job_description') or record.get('query')
+    if not text:
+        text = ' '.join(str(record[field]) for field in ('title', 'body') if record.get(field))
+    return text
+
+
+def _score_record(task):
+    """
+    Score one input line in a worker process.
+
+    Args:
+        task (tuple): (line number, raw JSON line)
+
+    Returns:
+        dict: Result record with id, timing and recommendations or error
+    """
+    line_number, line = task
+    start = time.perf_counter()
+    record_id = line_number
+    try:
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            raise ValueError("record must be a JSON object")
+        record_id = record.get('id', record.get('request_id', line_number))
+
+        text = _record_text(record)
+        if not text or not text.strip():
+            raise ValueError("record has no job description")
+
+        recommendations = _processor.get_recommendations(text, top_k=record.get('top_k', _top_k))
+        result = {
+            "id": record_id,
+            "recommendations": [
+                {"id": rec.get('id'), "name": rec.get('name'), "score": rec['similarity_score']}
+                for rec in recommendations
+            ],
+        }
+    except Exception as e:
+        result = {"id": record_id, "error": str(e)}
+
+    result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return result
+
+
+def _read_tasks(input_file):
+    """
+    Lazily yield (line number, line) for every non-empty input line.
+    """
+    for line_number, line in enumerate(input_file, start=1):
+        if line.strip():
+            yield line_number, line
+
+
+class _ResultWriter:
+    """
+    Writes result records as JSONL or as one CSV row per recommendation.
+    """
+
+    def __init__(self, output_file, output_format):
+        self.output_file = output_file
+        self.output_format = output_format
+        if output_format == 'csv':
+            self.csv_writer = csv.DictWriter(output_file, fieldnames=CSV_COLUMNS)
+            self.csv_writer.writeheader()
+
+    def write(self, result):
+        if self.output_format == 'jsonl':
+            self.output_file.write(json.dumps(result) + '\n')
+            return
+
+        if 'error' in result:
+            self.csv_writer.writerow({
+                'id': result['id'], 'elapsed_ms': result['elapsed_ms'], 'error': result['error']})
+            return
+        for rank, rec in enumerate(result['recommendations'], start=1):
+            self.csv_writer.writerow({
+                'id': result['id'], 'rank': rank, 'assessment_id': rec['id'],
+                'name': rec['name'], 'score': rec['score'], 'elapsed_ms': result['elapsed_ms']})
+
+
+def bulk_score(input_path, output_path, output_format='jsonl', catalog_path="data/shl_assessments.json",
+               top_k=10, workers=None, chunk_size=16, index_dir=DEFAULT_INDEX_DIR):
+    """
+    Score every record of a JSONL file and write the results.
+
+    Records are read lazily and dispatched in bounded windows, so memory
+    does not grow with the input size. Output order matches input order.
+
+    Args:
+        input_path (str): JSONL input file
+        output_path (str): Output file ('-' for stdout)
+        output_format (str): 'jsonl' or 'csv'
+        catalog_path (str): Assessment catalog JSON file
+        top_k (int): Default number of recommendations per record
+        workers (int, optional): Worker processes, defaults to the CPU count
+        chunk_size (int): Records sent to a worker at a time
+        index_dir (str): Directory of persisted indexes
+
+    Returns:
+        dict: Summary with record, error and timing counts
+    """
+    global _processor, _top_k
+    workers = workers or os.cpu_count() or 1
+    _top_k = top_k
+
+    # Load the index once in the parent; forked workers inherit it
+    build_start = time.perf_counter()
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    if context.get_start_method() == 'fork':
+        _processor = _load_processor(catalog_path, index_dir)
+    build_seconds = time.perf_counter() - build_start
+
+    window = workers * chunk_size * 4
+    summary = {"records": 0, "errors": 0, "build_seconds": round(build_seconds, 3)}
+    start = time.perf_counter()
+
+    output_file = sys.stdout if output_path == '-' else open(output_path, 'w', newline='')
+    try:
+        writer = _ResultWriter(output_file, output_format)
+        with open(input_path, 'r', encoding='utf-8') as input_file, context.Pool(
+                workers, initializer=_init_worker, initargs=(catalog_path, index_dir, top_k)) as pool:
+            tasks = _read_tasks(input_file)
+            while True:
+                batch = list(islice(tasks, window))
+                if not batch:
+                    break
+                for result in pool.imap(_score_record, batch, chunksize=chunk_size):
+                    writer.write(result)
+                    summary["records"] += 1
+                    summary["errors"] += 'error' in result
+    finally:
+        if output_file is not sys.stdout:
+            output_file.close()
+
+    elapsed = time.perf_counter() - start
+    summary["score_seconds"] = round(elapsed, 3)
+    summary["records_per_second"] = round(summary["records"] / elapsed, 1) if elapsed > 0 else 0.0
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a JSONL file of job descriptions offline.")
+    parser.add_argument('input', help="JSONL file of queries")
+    parser.add_argument('-o', '--output', default='-', help="Output file (default: stdout)")
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl', help="Output format")
+    parser.add_argument('--catalog', default="data/shl_assessments.json", help="Assessment catalog")
+    parser.add_argument('--index-dir', default=DEFAULT_INDEX_DIR, help="Persisted index directory")
+    parser.add_argument('--top-k', type=int, default=10, help="Recommendations per record")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=16, help="Records per worker task")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    summary = bulk_score(args.input, args.output, args.format, args.catalog,
+                         args.top_k, args.workers, args.chunk_size, args.index_dir)
+    print(json.dumps(summary), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import hashlib
+import json
+import logging
+import numpy as np
+import scipy.sparse as sp
+from utils.boost_engine import BoostEngine
+from utils.field_cache import AssessmentFieldCache
+from utils.query_vectorizer import cosine_postings
+
+
+class OverlayCatalog:
+    """
+    Read-only assessment sequence: a base catalog with some rows replaced
+    or appended. Deleted rows stay addressable; callers mask them out.
+    """
+
+    def __init__(self, base, docs, size):
+        self.base = base
+        self.docs = docs
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("catalog index out of range")
+        doc = self.docs.get(int(index))
+        if doc is not None:
+            return doc
+        if index < len(self.base):
+            return self.base[index]
+        # An appended row that was deleted again
+        return {}
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self[i]
+
+
+class _BaseCatalog:
+    """
+    Per-base data shared by every delta built on the same fitted processor.
+    """
+
+    def __init__(self, processor):
+        self.processor = processor
+        self.size = len(processor.assessments)
+        self.id_rows = {}
+        for row, assessment in enumerate(processor.assessments):
+            self.id_rows.setdefault(assessment.get('id'), row)
+        vectors = processor.assessment_vectors.tocsr()
+        self.vectors = vectors
+        self.document_frequency = np.bincount(
+            vectors.indices, minlength=len(processor.query_vectorizer.idf)).astype(np.int64)
+
+
+class CatalogDelta:
+    """
+    Assessments upserted or deleted since the TF-IDF index was fitted.
+
+    The fitted matrices are never modified. Changed and new assessments are
+    vectorized with the fitted vocabulary and IDF into a small delta segment
+    with its own cosine and BM25F postings and boost features, deleted rows are
+    tombstoned, and scores are the base scores with the delta rows written
+    over them. Applying an update rebuilds only the delta segment, so its
+    cost grows with the number of changed assessments, not the catalog.
+
+    Because new documents are weighted with the IDF of the fitted catalog,
+    the delta tracks how far the IDF of the current catalog has drifted from
+    it (``drift``); a full refit resets it.
+    """
+
+    def __init__(self, base, docs, deleted, id_overrides, size, vectors, oov_terms, version):
+        self.logger = logging.getLogger(__name__)
+        self.base = base
+        self.docs = docs
+        self.deleted = deleted
+        self.id_overrides = id_overrides
+        self.size = size
+        self.vectors = vectors
+        self.oov_terms = oov_terms
+        self.version = version
+
+        processor = base.processor
+        self.rows = np.array(sorted(docs), dtype=np.int64)
+        delta_docs = [docs[row] for row in self.rows]
+
+        # Delta segment: cosine and BM25F postings and boost features of the changed docs
+        indptr = np.zeros(len(self.rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(vectors[row][0]) for row in self.rows])
+        indices = np.concatenate([vectors[row][0] for row in self.rows]) if len(self.rows) else np.zeros(0, np.int64)
+        data = np.concatenate([vectors[row][1] for row in self.rows]) if len(self.rows) else np.zeros(0)
+        matrix = sp.csr_matrix((data, indices, indptr),
+                               shape=(len(self.rows), len(processor.query_vectorizer.idf)))
+        self.matrix = matrix
+        self.postings = cosine_postings(matrix)
+        self.bm25 = processor.bm25_index.segment(delta_docs)
+        self.boost_engine = BoostEngine(AssessmentFieldCache(delta_docs), processor.rules)
+
+        # Rows that no longer take their base scores
+        self.live = None
+        if deleted:
+            self.live = np.ones(size, dtype=bool)
+            self.live[sorted(deleted)] = False
+
+        # Base rows whose fitted postings are out of date (deleted or
+        # replaced); candidate selection over the base index skips them
+        self.stale_rows = np.union1d(self.rows[self.rows < base.size],
+                                     np.array([row for row in deleted if row < base.size], dtype=np.int64))
+
+        self.catalog = OverlayCatalog(processor.assessments, docs, size)
+        changes = dict(docs)
+        changes.update((row, None) for row in deleted)
+        self.facet_index = processor.facet_index.updated(changes, size)
+        self.drift = self._idf_drift()
+
+    @property
+    def live_count(self):
+        """
+        Number of assessments that are not deleted.
+        """
+        return self.size - len(self.deleted)
+
+    def row(self, assessment_id):
+        """
+        Current row of an assessment id, None when it does not exist.
+        """
+        if assessment_id in self.id_overrides:
+            return self.id_overrides[assessment_id]
+        row = self.base.id_rows.get(assessment_id)
+        return None if row is None or row in self.deleted else row
+
+    def _idf_drift(self):
+        """
+        How far the IDF of the current catalog is from the fitted one.
+
+        Returns the larger of the maximum relative change of a term's IDF
+        and the share of terms introduced by changed assessments that the
+        fitted vocabulary does not know.
+        """
+        base = self.base
+        df = base.document_frequency.copy()
+        replaced = [row for row in self.rows if row < base.size] + [row for row in self.deleted if row < base.size]
+        for row in replaced:
+            df[base.vectors.indices[base.vectors.indptr[row]:base.vectors.indptr[row + 1]]] -= 1
+        for row in self.rows:
+            df[self.vectors[row][0]] += 1
+
+        idf = base.processor.query_vectorizer.idf
+        present = df > 0
+        current = np.log((1 + self.live_count) / (1 + df[present])) + 1
+        idf_change = float(np.max(np.abs(current - idf[present]) / idf[present])) if present.any() else 0.0
+
+        new_terms = set()
+        for row in self.rows:
+            new_terms |= self.oov_terms[row]
+        return max(idf_change, len(new_terms) / max(len(idf), 1))
+
+    @classmethod
+    def apply(cls, processor, upserts=(), deletes=()):
+        """
+        Build the delta of a processor with more assessments upserted or deleted.
+
+        Args:
+            processor (NLPProcessor): Current processor, fitted or already updated
+            upserts (list): Assessment dictionaries; an existing 'id' replaces that
+                assessment, a new one is appended
+            deletes (list): Ids of assessments to delete
+
+        Returns:
+            CatalogDelta: The new delta
+
+        Raises:
+            ValueError: When an upsert has no id
+            KeyError: When a deleted id does not exist
+        """
+        previous = processor.delta
+        if previous is None:
+            base = _BaseCatalog(processor)
+            docs, deleted, id_overrides, vectors, oov_terms = {}, set(), {}, {}, {}
+            size = base.size
+        else:
+            base = previous.base
+            docs, deleted = dict(previous.docs), set(previous.deleted)
+            id_overrides, vectors = dict(previous.id_overrides), dict(previous.vectors)
+            oov_terms = dict(previous.oov_terms)
+            size = previous.size
+
+        def current_row(assessment_id):
+            # Same as row(), over the working copies
+            if assessment_id in id_overrides:
+                return id_overrides[assessment_id]
+            row = base.id_rows.get(assessment_id)
+            return None if row is None or row in deleted else row
+
+        base_processor = base.processor
+        query_vectorizer = base_processor.query_vectorizer
+        for assessment_id in deletes:
+            row = current_row(assessment_id)
+            if row is None:
+                raise KeyError(f"Unknown assessment id {assessment_id!r}")
+            for table in (docs, vectors, oov_terms):
+                table.pop(row, None)
+            deleted.add(row)
+            id_overrides[assessment_id] = None
+
+        for assessment in upserts:
+            if not isinstance(assessment, dict) or assessment.get('id') is None:
+                raise ValueError("Upserted assessments need an 'id'")
+            assessment = dict(assessment)
+            row = current_row(assessment['id'])
+            if row is None:
+                row = size
+                size += 1
+            text = base_processor._preprocess_text(base_processor._assessment_text(assessment))
+            vectors[row] = query_vectorizer.transform_one(text)
+            oov_terms[row] = frozenset(
+                token for token in query_vectorizer.tokenize(text)
+                if not query_vectorizer.known(token))
+            docs[row] = assessment
+            deleted.discard(row)
+            id_overrides[assessment['id']] = row
+
+        payload = json.dumps({"upserts": list(upserts), "deletes": list(deletes)},
+                             sort_keys=True, default=str)
+        version = hashlib.sha256(
+            f"{processor.catalog_version}:{payload}".encode('utf-8')).hexdigest()[:16]
+        return cls(base, docs, deleted, id_overrides, size, vectors, oov_terms, version)
+
+    def overlay_scores(self, scores, processed_texts, job_descriptions, query_vectorizer, lexical=None):
+        """
+        Extend base scores to the updated catalog.
+
+        Args:
+            scores (numpy.ndarray): Base scores of shape (queries, base assessments)
+            processed_texts (list): Preprocessed queries
+            job_descriptions (list): Normalized queries, for the boosts
+            query_vectorizer (QueryVectorizer): Fitted query transformer
+            lexical (numpy.ndarray, optional): Lexical scores of the delta rows, of
+                shape (queries, delta rows) (e.g. BM25); cosine over the delta
+                segment when not given
+
+        Returns:
+            numpy.ndarray: Scores of shape (queries, rows), -inf for deleted rows
+        """
+        full = np.full((scores.shape[0], self.size), -np.inf)
+        full[:, :scores.shape[1]] = scores
+        if len(self.rows):
+            if lexical is not None:
+                similarity = lexical
+            else:
+                similarity = query_vectorizer.similarity(processed_texts, self.postings)
+            full[:, self.rows] = similarity + self.boost_engine.compute_boosts_batch(job_descriptions).T
+        if self.deleted:
+            full[:, sorted(self.deleted)] = -np.inf
+        return full
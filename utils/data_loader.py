@@ -1,19 +1,31 @@
+import hashlib
 import json
 import os
 import logging
+import tempfile
 
 logger = logging.getLogger(__name__)
 
-def load_assessments(file_path="data/shl_assessments.json"):
+def load_assessments(file_path="data/shl_assessments.json", strict=False):
     """
     Load assessment data from JSON file.
     
     Args:
         file_path (str): Path to the assessments JSON file
+        strict (bool): Raise when the file is missing or invalid instead of
+            falling back to the sample assessments
         
     Returns:
         list: List of assessment dictionaries
     """
+    if strict:
+        with open(file_path, 'r') as f:
+            assessments = json.load(f)
+        if not isinstance(assessments, list):
+            raise ValueError(f"{file_path} must contain a list of assessments")
+        logger.info(f"Successfully loaded {len(assessments)} assessments from {file_path}")
+        return assessments
+    
     try:
         # Check if file exists
         if not os.path.exists(file_path):
@@ -33,6 +45,86 @@ def load_assessments(file_path="data/shl_assessments.json"):
         logger.info("Loading sample assessment data instead")
         return _generate_sample_assessments()
 
+def update_assessments(assessments, upserts=(), deletes=()):
+    """
+    Upsert and delete assessments in a catalog list, in place.
+    
+    Deletes are applied first. An upsert whose 'id' exists replaces that
+    assessment where it is, any other one is appended, so the result has
+    the row order ``NLPProcessor.apply_updates`` gives the same changes.
+    
+    Args:
+        assessments (list): List of assessment dictionaries, modified
+        upserts (list): Assessment dictionaries, matched on 'id'
+        deletes (list): Ids of assessments to remove
+        
+    Returns:
+        list: The updated list
+        
+    Raises:
+        ValueError: When an upsert has no id
+        KeyError: When a deleted id does not exist
+    """
+    for assessment_id in deletes:
+        for i, assessment in enumerate(assessments):
+            if assessment.get('id') == assessment_id:
+                del assessments[i]
+                break
+        else:
+            raise KeyError(f"Unknown assessment id {assessment_id!r}")
+    
+    for assessment in upserts:
+        if not isinstance(assessment, dict) or assessment.get('id') is None:
+            raise ValueError("Upserted assessments need an 'id'")
+        for i, existing in enumerate(assessments):
+            if existing.get('id') == assessment['id']:
+                assessments[i] = dict(assessment)
+                break
+        else:
+            assessments.append(dict(assessment))
+    return assessments
+
+def save_assessments(assessments, file_path="data/shl_assessments.json"):
+    """
+    Write a catalog file atomically.
+    
+    The JSON is written to a temporary file next to the target and renamed
+    over it, so readers see either the old or the new catalog.
+    
+    Args:
+        assessments (list): List of assessment dictionaries
+        file_path (str): Path to the assessments JSON file
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.catalog-', suffix='.json', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(list(assessments), f, indent=2)
+        if os.path.exists(file_path):
+            # mkstemp creates the file private; keep the catalog's permissions
+            os.chmod(tmp_path, os.stat(file_path).st_mode & 0o7777)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    logger.info(f"Saved {len(assessments)} assessments to {file_path}")
+
+def catalog_version(assessments):
+    """
+    Compute a content hash identifying a catalog.
+    
+    Two catalogs with the same assessments produce the same version, so
+    anything derived from a catalog can be cached or invalidated on it.
+    
+    Args:
+        assessments (list): List (or sequence) of assessment dictionaries
+        
+    Returns:
+        str: Short hexadecimal catalog version
+    """
+    payload = json.dumps(list(assessments), sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
 def _generate_sample_assessments():
     """
     Generate sample assessment data if no file is available.
@@ -0,0 +1,351 @@
+import logging
+import numpy as np
+import scipy.sparse as sp
+from utils.field_cache import row_positions
+
+
+def _normalize_rows(matrix):
+    """
+    Divide the rows of a dense matrix by their L2 norms in place; zero rows stay zero.
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    matrix /= norms
+    return matrix
+
+
+# Fewest query rows times vectors multiplied in one product; smaller
+# products are padded with zero queries up to it
+MIN_PRODUCT_SIZE = 1 << 14
+
+
+def _batch_product(queries, vectors):
+    """
+    Products of a query batch with float32 vectors as one matrix multiply.
+
+    BLAS scores a single query with a matrix-vector kernel and very small
+    products with dedicated kernels, which sum in other orders than a full
+    matrix multiply. Smaller batches are padded with zero queries to at
+    least two rows and ``MIN_PRODUCT_SIZE`` products, so a single query
+    goes through the same GEMM kernel as a batch and gets the same scores.
+    A padded batch is multiplied as vectors times queries, which saves
+    packing the whole vector matrix for a couple of queries.
+
+    Args:
+        queries (numpy.ndarray): (queries, dimensions) float32 vectors
+        vectors (numpy.ndarray): (rows, dimensions) float32 vectors
+
+    Returns:
+        numpy.ndarray: float32 products of shape (queries, rows)
+    """
+    rows = max(2, -(-MIN_PRODUCT_SIZE // max(len(vectors), 1)))
+    if len(queries) >= rows:
+        return queries @ vectors.T
+    padded = np.zeros((rows, queries.shape[1]), dtype=queries.dtype)
+    padded[:len(queries)] = queries
+    return np.ascontiguousarray((vectors @ padded.T).T[:len(queries)])
+
+
+class IVFIndex:
+    """
+    Inverted-file index over normalized dense vectors.
+
+    Spherical k-means splits the vectors into ``n_lists`` clusters at build
+    time; each cluster keeps the rows assigned to it, as one CSR-like
+    (offsets, rows) layout. A query is compared with the centroids and only
+    the rows of its ``nprobe`` closest clusters are scored, so the work per
+    query drops to about ``nprobe / n_lists`` of a brute-force scan, at the
+    cost of missing neighbours that fell into other clusters.
+    """
+
+    def __init__(self, centroids, offsets, rows):
+        """
+        Wrap a fitted index.
+
+        Args:
+            centroids (numpy.ndarray): (lists, dimensions) float32 unit centroids
+            offsets (numpy.ndarray): Start of each list in ``rows``, plus the end
+            rows (numpy.ndarray): Vector rows grouped by list
+        """
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+
+    @property
+    def n_lists(self):
+        """
+        Number of clusters.
+        """
+        return len(self.centroids)
+
+    @staticmethod
+    def _assign(vectors, centroids, chunk_size=65536):
+        """
+        Closest centroid of every vector and its similarity, in chunks.
+        """
+        assignment = np.zeros(len(vectors), dtype=np.int64)
+        similarity = np.zeros(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), chunk_size):
+            scores = vectors[start:start + chunk_size] @ centroids.T
+            assignment[start:start + chunk_size] = scores.argmax(axis=1)
+            similarity[start:start + chunk_size] = scores.max(axis=1)
+        return assignment, similarity
+
+    @classmethod
+    def fit(cls, vectors, n_lists, iterations=20, sample_size=256, seed=0):
+        """
+        Cluster vectors with spherical k-means.
+
+        Args:
+            vectors (numpy.ndarray): (rows, dimensions) float32 unit vectors
+            n_lists (int): Number of clusters; capped at the number of rows
+            iterations (int): k-means iterations
+            sample_size (int): Training rows per cluster; the centroids are
+                fitted on a sample of at most ``sample_size * n_lists`` rows
+                and every row is assigned afterwards
+            seed (int): Seed of the initialization and the sample
+
+        Returns:
+            IVFIndex: Fitted index
+        """
+        rng = np.random.default_rng(seed)
+        n_lists = max(1, min(int(n_lists), len(vectors)))
+        training = vectors
+        if len(vectors) > sample_size * n_lists:
+            training = vectors[np.sort(rng.choice(len(vectors), sample_size * n_lists, replace=False))]
+
+        centroids = np.array(training[rng.choice(len(training), n_lists, replace=False)], dtype=np.float32)
+        for _ in range(iterations):
+            assignment, similarity = cls._assign(training, centroids)
+            members = sp.csr_matrix((np.ones(len(training), dtype=np.float32),
+                                     (assignment, np.arange(len(training)))),
+                                    shape=(n_lists, len(training)))
+            sums = np.asarray(members @ training, dtype=np.float32)
+            # Re-seed empty clusters with the worst fitting rows
+            empty = np.flatnonzero(np.bincount(assignment, minlength=n_lists) == 0)
+            if len(empty):
+                sums[empty] = training[np.argsort(similarity)[:len(empty)]]
+            centroids = _normalize_rows(sums)
+
+        assignment, _ = cls._assign(vectors, centroids)
+        rows = np.argsort(assignment, kind='stable')
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignment, minlength=n_lists))
+        sizes = np.diff(offsets)
+        logging.getLogger(__name__).info(
+            f"Fitted IVF index: {n_lists} lists, {sizes.min()}-{sizes.max()} rows per list")
+        return cls(centroids, offsets, rows)
+
+    def candidates(self, queries, nprobe):
+        """
+        Rows of the ``nprobe`` lists closest to each query.
+
+        Args:
+            queries (numpy.ndarray): (queries, dimensions) unit vectors
+            nprobe (int): Lists to visit per query
+
+        Returns:
+            list: Sorted row array per query
+        """
+        nprobe = min(nprobe, self.n_lists)
+        scores = queries @ self.centroids.T
+        probes = np.argpartition(-scores, nprobe - 1, axis=1)[:, :nprobe]
+        return [np.sort(self.rows[row_positions(self.offsets, probe)[0]]) for probe in probes]
+
+
+class LSAIndex:
+    """
+    Dense latent semantic (LSA) index of the assessments.
+
+    A truncated SVD of the TF-IDF assessment matrix is computed at build
+    time; assessments are stored as L2-normalized rows of one contiguous
+    float32 array of shape (assessments, dimensions), next to the
+    (columns, dimensions) projection from TF-IDF columns to that space.
+    Terms that occur in similar assessments get similar directions, so an
+    assessment can match a query without sharing its exact terms.
+
+    Queries are projected with the same TF-IDF vector the sparse mode
+    uses, and a batch is scored with one float32 matrix multiply. A single
+    query is padded into the same matrix multiply as a batch (see
+    ``_batch_product``), so it scores the same alone and in a batch.
+
+    With int8 quantization every assessment vector is also stored as int8
+    codes with one float32 scale per vector (its largest absolute weight /
+    127). Queries are scored against the codes, converted to float32 a
+    block at a time, and the ``rescore_depth`` best assessments of each
+    query are rescored exactly with the float32 vectors, gathered for the
+    whole batch at once. When the index is memory-mapped from an artifact,
+    only the codes are read for every query and the float32 vectors of the
+    rescored rows are paged in on demand.
+    """
+
+    # Assessments per query rescored with the float32 vectors
+    RESCORE_DEPTH = 100
+
+    # Rows converted from int8 per block; small enough to stay in cache
+    BLOCK_SIZE = 4096
+
+    def __init__(self, projection, embeddings, ivf=None, codes=None, scales=None,
+                 rescore_depth=RESCORE_DEPTH):
+        """
+        Wrap a fitted projection and the assessment embeddings.
+
+        Args:
+            projection (numpy.ndarray): (columns, dimensions) float32 map
+                from TF-IDF columns to the latent space
+            embeddings (numpy.ndarray): (assessments, dimensions) float32
+                L2-normalized assessment vectors
+            ivf (IVFIndex, optional): Clustering of the embeddings for
+                approximate search
+            codes (numpy.ndarray, optional): (assessments, dimensions) int8
+                quantized embeddings; scoring uses them when given
+            scales (numpy.ndarray, optional): float32 scale per quantized vector
+            rescore_depth (int): Assessments per query rescored exactly
+                when scoring on the quantized vectors
+        """
+        self.projection = projection
+        self.embeddings = embeddings
+        self.ivf = ivf
+        self.codes = codes
+        self.scales = scales
+        self.rescore_depth = rescore_depth
+
+    @property
+    def dimensions(self):
+        """
+        Number of latent dimensions.
+        """
+        return self.embeddings.shape[1]
+
+    @staticmethod
+    def quantize(embeddings):
+        """
+        Quantize vectors to int8 with one scale per vector.
+
+        Args:
+            embeddings (numpy.ndarray): (rows, dimensions) float32 vectors
+
+        Returns:
+            tuple: (int8 codes, float32 scales); codes * scales approximates the vectors
+        """
+        scales = np.abs(embeddings).max(axis=1) / 127
+        scales[scales == 0] = 1
+        codes = np.rint(embeddings / scales[:, np.newaxis]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    @classmethod
+    def fit(cls, assessment_vectors, dimensions, ivf_lists=None, quantization=None, random_state=0):
+        """
+        Compute the truncated SVD of a TF-IDF assessment matrix.
+
+        Args:
+            assessment_vectors (scipy.sparse.csr_matrix): TF-IDF assessment matrix
+            dimensions (int): Number of latent dimensions; capped below the
+                number of assessments and of columns
+            ivf_lists (int, optional): Also cluster the embeddings into this
+                many lists for approximate search
+            quantization (str, optional): 'int8' to also store and score
+                quantized vectors
+            random_state (int): Seed of the randomized solver, for reproducible builds
+
+        Returns:
+            LSAIndex: Fitted index
+        """
+        # scikit-learn is only needed to build; queries use NumPy
+        from sklearn.decomposition import TruncatedSVD
+
+        dimensions = max(1, min(int(dimensions), min(assessment_vectors.shape) - 1))
+        svd = TruncatedSVD(n_components=dimensions, random_state=random_state)
+        embeddings = svd.fit_transform(assessment_vectors.astype(np.float64))
+        projection = np.ascontiguousarray(svd.components_.T, dtype=np.float32)
+        embeddings = _normalize_rows(np.ascontiguousarray(embeddings, dtype=np.float32))
+        logging.getLogger(__name__).info(
+            f"Fitted LSA index: {dimensions} dimensions, "
+            f"{svd.explained_variance_ratio_.sum():.3f} of the variance")
+        ivf = IVFIndex.fit(embeddings, ivf_lists, seed=random_state) if ivf_lists else None
+        if quantization is None:
+            return cls(projection, embeddings, ivf)
+        if quantization != 'int8':
+            raise ValueError(f"Unsupported LSA quantization {quantization!r}, expected 'int8'")
+        return cls(projection, embeddings, ivf, *cls.quantize(embeddings))
+
+    def embed(self, vectors):
+        """
+        Project TF-IDF rows into the latent space.
+
+        Args:
+            vectors (scipy.sparse.csr_matrix): TF-IDF rows over the fitted columns
+
+        Returns:
+            numpy.ndarray: (rows, dimensions) float32 L2-normalized vectors
+        """
+        embedded = np.asarray(vectors.astype(np.float32) @ self.projection, dtype=np.float32)
+        return _normalize_rows(embedded)
+
+    def similarity(self, vectors, embeddings=None, nprobe=None):
+        """
+        Cosine similarity of TF-IDF rows with every assessment in the latent space.
+
+        Args:
+            vectors (scipy.sparse.csr_matrix): Query TF-IDF rows
+            embeddings (numpy.ndarray, optional): Assessment vectors to score;
+                the indexed assessments when not given
+            nprobe (int, optional): With an IVF index, score only the rows
+                of this many lists per query; the others get 0
+
+        Returns:
+            numpy.ndarray: Similarities of shape (queries, assessments)
+        """
+        queries = self.embed(vectors)
+        if embeddings is not None:
+            return _batch_product(queries, embeddings)
+        if not nprobe or self.ivf is None or nprobe >= self.ivf.n_lists:
+            if self.codes is None:
+                return _batch_product(queries, self.embeddings)
+            scores = self._quantized_scores(queries, self.codes, self.scales)
+            self._rescore(queries, scores)
+            return scores
+
+        scores = np.zeros((len(queries), len(self.embeddings)), dtype=np.float32)
+        for j, rows in enumerate(self.ivf.candidates(queries, nprobe)):
+            if self.codes is None:
+                scores[j, rows] = self.embeddings[rows] @ queries[j]
+            else:
+                approximate = self._quantized_scores(queries[j:j + 1], self.codes[rows], self.scales[rows])
+                self._rescore(queries[j:j + 1], approximate, rows)
+                scores[j, rows] = approximate[0]
+        return scores
+
+    def _quantized_scores(self, queries, codes, scales):
+        """
+        Similarities with int8 vectors, converting a block of rows at a time.
+        """
+        scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+        block = np.empty((min(self.BLOCK_SIZE, len(codes)), codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(codes), self.BLOCK_SIZE):
+            rows = block[:min(self.BLOCK_SIZE, len(codes) - start)]
+            rows[...] = codes[start:start + len(rows)]
+            scores[:, start:start + len(rows)] = _batch_product(queries, rows)
+        scores *= scales
+        return scores
+
+    def _rescore(self, queries, scores, rows=None):
+        """
+        Replace the best approximate scores of every query with exact ones, in place.
+
+        The float32 vectors of all rescored assessments are gathered at once
+        and multiplied with their queries in one batched product.
+
+        Args:
+            queries (numpy.ndarray): (queries, dimensions) query vectors
+            scores (numpy.ndarray): (queries, rows) approximate scores
+            rows (numpy.ndarray, optional): Assessment rows of the score
+                columns; all when not given
+        """
+        size = scores.shape[1]
+        depth = min(self.rescore_depth, size)
+        if depth == 0:
+            return
+        best = np.sort(np.argpartition(scores, size - depth, axis=1)[:, size - depth:], axis=1)
+        exact = np.einsum('ijk,ik->ij', self.embeddings[best if rows is None else rows[best]], queries)
+        np.put_along_axis(scores, best, exact, axis=1)
@@ -0,0 +1,275 @@
+import json
+import logging
+import os
+import re
+import numpy as np
+
+FACET_FIELDS = ('type', 'remote_available', 'adaptive_testing')
+
+# Duration buckets as (label, lower bound exclusive, upper bound inclusive) in minutes
+DURATION_BUCKETS = (
+    ('<=20', None, 20),
+    ('21-30', 20, 30),
+    ('31-45', 30, 45),
+    ('46-60', 45, 60),
+    ('>60', 60, None),
+)
+UNKNOWN_DURATION = 'unknown'
+
+# Number of set bits in every possible byte, used to count packed bitmaps
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+
+def duration_bucket(assessment):
+    """
+    Get the duration bucket label of an assessment.
+
+    Reads ``duration_minutes`` and falls back to parsing a ``duration``
+    string such as "25 minutes".
+
+    Args:
+        assessment (dict): Assessment dictionary
+
+    Returns:
+        str: Bucket label, or 'unknown' when no duration is available
+    """
+    minutes = assessment.get('duration_minutes')
+    if minutes is None:
+        match = re.search(r'\d+', str(assessment.get('duration') or ''))
+        minutes = int(match.group()) if match else None
+    if not isinstance(minutes, (int, float)) or isinstance(minutes, bool):
+        return UNKNOWN_DURATION
+
+    for label, lower, upper in DURATION_BUCKETS:
+        if (lower is None or minutes > lower) and (upper is None or minutes <= upper):
+            return label
+    return UNKNOWN_DURATION
+
+
+class FacetIndex:
+    """
+    Per-value bitmaps over the catalog for every filterable field.
+
+    Built once per catalog version. Each facet value maps to a packed bitmap
+    (one bit per assessment), so any combination of filters is a handful of
+    bitwise ANDs over n/8 bytes, and facet counts are popcounts of the
+    combined bitmaps.
+    """
+
+    def __init__(self, assessments, version=None):
+        """
+        Build the bitmaps.
+
+        Args:
+            assessments (list): List of assessment dictionaries
+            version (str, optional): Catalog version the index was built for
+        """
+        self.logger = logging.getLogger(__name__)
+        self.version = version
+        self.size = len(assessments)
+
+        values = {field: [a.get(field) for a in assessments] for field in FACET_FIELDS}
+        values['duration'] = [duration_bucket(a) for a in assessments]
+
+        self.bitmaps = {}
+        for field, field_values in values.items():
+            column = np.array(field_values, dtype=object)
+            self.bitmaps[field] = {}
+            distinct = list(dict.fromkeys(field_values))
+            if field == 'duration':
+                order = [label for label, _, _ in DURATION_BUCKETS] + [UNKNOWN_DURATION]
+                distinct.sort(key=order.index)
+            for value in distinct:
+                bitmap = np.packbits(column == value)
+                bitmap.setflags(write=False)
+                self.bitmaps[field][value] = bitmap
+
+        self._all = np.packbits(np.ones(self.size, dtype=bool))
+        self._none = np.zeros_like(self._all)
+        self.logger.info(
+            f"Built facet bitmaps for {self.size} assessments: "
+            + ", ".join(f"{field}={len(bitmaps)}" for field, bitmaps in self.bitmaps.items()))
+
+    @classmethod
+    def load(cls, directory, name='facets', mmap_mode='r', version=None):
+        """
+        Open an index written by ``save`` without rebuilding it.
+
+        Args:
+            directory (str): Directory holding the index files
+            name (str): File name prefix
+            mmap_mode (str, optional): ``numpy.load`` mmap mode, None reads into memory
+            version (str, optional): Catalog version the index was built for
+
+        Returns:
+            FacetIndex: The index, its bitmaps rows of the mapped matrix
+        """
+        with open(os.path.join(directory, f"{name}.json"), 'r') as f:
+            layout = json.load(f)
+        matrix = np.load(os.path.join(directory, f"{name}_bitmaps.npy"), mmap_mode=mmap_mode)
+        index = cls.__new__(cls)
+        index.logger = logging.getLogger(__name__)
+        index.version = version
+        index.size = layout["size"]
+        index._all = matrix[0]
+        index._none = np.zeros_like(index._all)
+        index.bitmaps = {}
+        row = 1
+        for field, values in layout["fields"]:
+            index.bitmaps[field] = {}
+            for value in values:
+                index.bitmaps[field][value] = matrix[row]
+                row += 1
+        return index
+
+    def save(self, directory, name='facets'):
+        """
+        Write the bitmaps as one ``.npy`` matrix plus a JSON list of the values.
+
+        Args:
+            directory (str): Target directory
+            name (str): File name prefix
+        """
+        fields = [[field, list(bitmaps)] for field, bitmaps in self.bitmaps.items()]
+        matrix = np.vstack([self._all] + [bitmap for bitmaps in self.bitmaps.values()
+                                          for bitmap in bitmaps.values()])
+        np.save(os.path.join(directory, f"{name}_bitmaps.npy"), matrix)
+        with open(os.path.join(directory, f"{name}.json"), 'w') as f:
+            json.dump({"size": self.size, "fields": fields}, f)
+
+    def updated(self, changes, size):
+        """
+        Copy of the index with some rows replaced, deleted or appended.
+        
+        Only the changed bits are touched; the bitmaps are copied (n/8 bytes
+        each) so the original index stays valid for in-flight requests.
+        
+        Args:
+            changes (dict): Row -> new assessment dictionary, or None for a deleted row
+            size (int): Number of rows after the changes
+            
+        Returns:
+            FacetIndex: Updated index
+        """
+        n_bytes = (size + 7) // 8
+        
+        def grown(bitmap):
+            copy = np.zeros(n_bytes, dtype=np.uint8)
+            copy[:len(bitmap)] = bitmap
+            return copy
+        
+        index = FacetIndex.__new__(FacetIndex)
+        index.logger = self.logger
+        index.version = self.version
+        index.size = size
+        index.bitmaps = {field: {value: grown(bitmap) for value, bitmap in bitmaps.items()}
+                         for field, bitmaps in self.bitmaps.items()}
+        index._all = grown(self._all)
+        index._none = np.zeros(n_bytes, dtype=np.uint8)
+        
+        # Clear every changed row, then set the bits of the new values
+        rows = np.array(sorted(changes), dtype=np.int64)
+        positions = rows >> 3
+        bits = (128 >> (rows & 7)).astype(np.uint8)
+        for bitmap in [index._all] + [b for bitmaps in index.bitmaps.values() for b in bitmaps.values()]:
+            np.bitwise_and.at(bitmap, positions, ~bits)
+        
+        for row, position, bit in zip(rows, positions, bits):
+            assessment = changes[int(row)]
+            if assessment is None:
+                continue
+            index._all[position] |= bit
+            values = {field: assessment.get(field) for field in FACET_FIELDS}
+            values['duration'] = duration_bucket(assessment)
+            for field, value in values.items():
+                bitmap = index.bitmaps[field].get(value)
+                if bitmap is None:
+                    bitmap = index.bitmaps[field][value] = np.zeros(n_bytes, dtype=np.uint8)
+                bitmap[position] |= bit
+        
+        for bitmaps in index.bitmaps.values():
+            for bitmap in bitmaps.values():
+                bitmap.setflags(write=False)
+        return index
+    
+    def bitmap(self, field, value):
+        """
+        Get the bitmap of the assessments whose field equals a value.
+
+        Args:
+            field (str): Facet field
+            value: Facet value
+
+        Returns:
+            numpy.ndarray: Packed bitmap (empty when the value does not occur)
+        """
+        try:
+            return self.bitmaps[field].get(value, self._none)
+        except TypeError:
+            # Unhashable filter values can never match a catalog value
+            return self._none
+
+    def combine(self, filters, exclude=None):
+        """
+        AND together the bitmaps of the active filters.
+
+        Args:
+            filters (dict): Facet field -> required value, None means inactive
+            exclude (str, optional): Facet field to leave out
+
+        Returns:
+            numpy.ndarray or None: Packed bitmap, None when no filter is active
+        """
+        combined = None
+        for field, value in filters.items():
+            if value is None or field == exclude:
+                continue
+            bitmap = self.bitmap(field, value)
+            combined = bitmap if combined is None else combined & bitmap
+        return combined
+
+    def mask(self, filters):
+        """
+        Boolean mask of the assessments passing all active filters.
+
+        Args:
+            filters (dict): Facet field -> required value, None means inactive
+
+        Returns:
+            numpy.ndarray or None: Mask over the catalog, None when no filter is active
+        """
+        combined = self.combine(filters)
+        if combined is None:
+            return None
+        return np.unpackbits(combined, count=self.size).astype(bool)
+
+    @staticmethod
+    def count(bitmap):
+        """
+        Number of assessments set in a packed bitmap.
+        """
+        return int(_POPCOUNT[bitmap].sum())
+
+    def counts(self, filters):
+        """
+        Count, for every facet value, how many assessments it would leave.
+
+        Each facet is counted under all the other active filters but not its
+        own, so the counts show what selecting a different value would give.
+
+        Args:
+            filters (dict): Facet field -> required value, None means inactive
+
+        Returns:
+            dict: Facet field -> list of {"value", "count"} entries
+        """
+        result = {}
+        for field, bitmaps in self.bitmaps.items():
+            others = self.combine(filters, exclude=field)
+            if others is None:
+                others = self._all
+            result[field] = [
+                {"value": value, "count": self.count(bitmap & others)}
+                for value, bitmap in bitmaps.items()
+            ]
+        return result
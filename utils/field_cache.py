@@ -0,0 +1,214 @@
+import logging
+import os
+import re
+import numpy as np
+from utils.packed_table import PackedStrings, save_packed_strings
+
+FIELDS = ('name', 'description', 'skills')
+
+
+def row_positions(indptr, rows):
+    """
+    Positions of the stored entries of selected rows of a CSR layout.
+
+    Args:
+        indptr (numpy.ndarray): Row pointer array
+        rows (numpy.ndarray): Row indices
+
+    Returns:
+        tuple: (entry positions, index into ``rows`` of each entry)
+    """
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+    return positions, np.repeat(np.arange(len(rows)), lengths)
+
+
+class AssessmentFieldCache:
+    """
+    Normalized assessment text fields, computed once per catalog version.
+
+    The lowercased "name description skills" text of every assessment is
+    kept with the offsets of its fields, so the scoring path can slice or
+    search them without rebuilding strings per request. The whitespace
+    tokens of every assessment are stored as a shared vocabulary (one
+    newline-separated UTF-8 blob) plus a token -> assessment posting list,
+    which turns free-term matching into a search over the (much smaller)
+    vocabulary. Everything is held in flat arrays and string tables, so a
+    cache saved next to an index is memory-mapped by ``load`` and shared by
+    every process that maps the same files.
+    """
+
+    # Arrays written by ``save`` as {name}_{array}.npy
+    ARRAYS = ('offsets', 'token_indptr', 'token_docs', 'doc_tokens', 'doc_indptr', 'token_starts')
+
+    def __init__(self, assessments, version=None):
+        """
+        Build the cache.
+
+        Args:
+            assessments (list): List of assessment dictionaries
+            version (str, optional): Catalog version the cache was built for
+        """
+        self.logger = logging.getLogger(__name__)
+        self.version = version
+        self.size = len(assessments)
+
+        # offsets[i] = [name start, description start, skills start, end + 1]
+        # within text(i), which is exactly f"{name} {description} {skills}".lower()
+        offsets = np.zeros((self.size, len(FIELDS) + 1), dtype=np.int64)
+        texts = []
+        for i, assessment in enumerate(assessments):
+            values = [str(assessment.get(field, '') or '').lower() for field in FIELDS]
+            position = 0
+            for j, value in enumerate(values):
+                offsets[i, j] = position
+                position += len(value) + 1
+            offsets[i, -1] = position
+            texts.append(' '.join(values))
+        self.texts = texts
+        self.offsets = offsets
+        self.offsets.setflags(write=False)
+
+        self._build_token_index()
+        self.logger.info(
+            f"Cached fields for {self.size} assessments, {len(self.token_starts)} distinct tokens")
+
+    @classmethod
+    def load(cls, directory, name='fields', mmap_mode='r', version=None):
+        """
+        Open a cache written by ``save`` without rebuilding it.
+
+        Args:
+            directory (str): Directory holding the cache files
+            name (str): File name prefix
+            mmap_mode (str, optional): ``numpy.load`` mmap mode, None reads into memory
+            version (str, optional): Catalog version the cache was built for
+
+        Returns:
+            AssessmentFieldCache: The cache
+        """
+        cache = cls.__new__(cls)
+        cache.logger = logging.getLogger(__name__)
+        cache.version = version
+        cache.texts = PackedStrings(directory, f"{name}_text", mmap_mode)
+        for array in cls.ARRAYS:
+            setattr(cache, array, np.load(os.path.join(directory, f"{name}_{array}.npy"),
+                                          mmap_mode=mmap_mode))
+        cache.vocabulary_text = np.load(os.path.join(directory, f"{name}_vocabulary.npy"),
+                                        mmap_mode=mmap_mode)
+        cache.size = len(cache.offsets)
+        return cache
+
+    def save(self, directory, name='fields'):
+        """
+        Write the cache as packed strings and ``.npy`` arrays.
+
+        Args:
+            directory (str): Target directory
+            name (str): File name prefix
+        """
+        save_packed_strings(directory, f"{name}_text", self.texts)
+        for array in self.ARRAYS:
+            np.save(os.path.join(directory, f"{name}_{array}.npy"), getattr(self, array))
+        np.save(os.path.join(directory, f"{name}_vocabulary.npy"),
+                np.frombuffer(bytes(self.vocabulary_text), dtype=np.uint8))
+
+    def _build_token_index(self):
+        """
+        Build the token vocabulary and the token -> assessment postings.
+        """
+        token_ids = {}
+        postings = []
+        for i in range(self.size):
+            for token in set(self.text(i).split()):
+                token_id = token_ids.setdefault(token, len(token_ids))
+                if token_id == len(postings):
+                    postings.append([])
+                postings[token_id].append(i)
+
+        self.token_indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        self.token_indptr[1:] = np.cumsum([len(docs) for docs in postings])
+        self.token_docs = np.array(
+            [doc for docs in postings for doc in docs], dtype=np.int64)
+
+        # Assessment -> token ids, to match terms against a few assessments
+        posting_tokens = np.repeat(np.arange(len(postings)), np.diff(self.token_indptr))
+        self.doc_tokens = posting_tokens[np.argsort(self.token_docs, kind='stable')]
+        self.doc_indptr = np.zeros(self.size + 1, dtype=np.int64)
+        self.doc_indptr[1:] = np.cumsum(np.bincount(self.token_docs, minlength=self.size))
+
+        # Tokens never contain whitespace, so a search for a whitespace-free
+        # term in the joined vocabulary cannot match across two tokens
+        encoded = [token.encode('utf-8') for token in token_ids]
+        self.vocabulary_text = b'\n'.join(encoded)
+        self.token_starts = np.zeros(len(encoded), dtype=np.int64)
+        self.token_starts[1:] = np.cumsum([len(token) + 1 for token in encoded[:-1]])
+
+    def text(self, index):
+        """
+        Lowercased "name description skills" text of one assessment.
+        """
+        return self.texts[index]
+
+    def field(self, index, name):
+        """
+        Lowercased value of one cached field of one assessment.
+        """
+        j = FIELDS.index(name)
+        return self.texts[index][self.offsets[index, j]:self.offsets[index, j + 1] - 1]
+
+    def token_set(self, index):
+        """
+        Set of whitespace tokens of one assessment.
+        """
+        return set(self.text(index).split())
+
+    def term_match_counts(self, terms, rows=None):
+        """
+        Count, per assessment, how many of the given terms occur in its text.
+
+        A term occurs in an assessment text iff it is a substring of one of
+        its whitespace tokens, so each term is searched once in the
+        vocabulary and the postings of every matching token are merged. For
+        a few selected rows their own tokens are checked instead, which does
+        not depend on the catalog size.
+
+        Args:
+            terms (set): Whitespace-free terms
+            rows (numpy.ndarray, optional): Assessment indices to count for;
+                every assessment when not given
+
+        Returns:
+            numpy.ndarray: Number of matching terms per assessment (or per row)
+        """
+        counts = np.zeros(self.size if rows is None else len(rows))
+        if rows is not None:
+            positions, owners = row_positions(self.doc_indptr, rows)
+            row_tokens = self.doc_tokens[positions]
+        # Searched as bytes, so a mapped vocabulary is not copied
+        vocabulary_text = self.vocabulary_text
+        token_starts = self.token_starts
+        n_tokens = len(token_starts)
+        for term in terms:
+            pattern = re.compile(re.escape(term.encode('utf-8')))
+            matched_tokens = []
+            match = pattern.search(vocabulary_text)
+            while match is not None:
+                token_id = int(np.searchsorted(token_starts, match.start(), side='right')) - 1
+                matched_tokens.append(token_id)
+                if token_id + 1 >= n_tokens:
+                    break
+                match = pattern.search(vocabulary_text, int(token_starts[token_id + 1]))
+            if not matched_tokens:
+                continue
+            if rows is not None:
+                counts[np.unique(owners[np.isin(row_tokens, matched_tokens)])] += 1
+                continue
+            docs = np.concatenate([
+                self.token_docs[self.token_indptr[t]:self.token_indptr[t + 1]]
+                for t in matched_tokens
+            ])
+            counts[np.unique(docs)] += 1
+        return counts
@@ -0,0 +1,150 @@
+"""
+Import-time report for the serving process.
+
+Imports a module in a fresh interpreter with ``python -X importtime`` and
+summarizes the per-module cost, so cold-start regressions (a new heavy
+dependency, an eager import that used to be deferred) show up before they
+reach production. Optionally fails when the total goes over a budget or when
+a module that must stay off the serving path gets imported.
+
+The app is imported with the background build and the catalog watcher off
+(``QUIET_ENV``): the index is loaded before the import returns and counts
+towards it, and nothing is imported by another thread while it is measured.
+Without a prebuilt index for the catalog the import includes fitting one;
+build it first with ``python -m utils.index_store``.
+
+Usage:
+    python -m utils.import_report
+    python -m utils.import_report app --top 20 --budget-ms 1500 --forbid sklearn
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+_LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+# Load the index before the import returns and start no catalog watcher, so
+# no background thread imports anything while the import is measured
+QUIET_ENV = {
+    "RECOMMEND_BACKGROUND_BUILD": "0",
+    "RECOMMEND_CATALOG_WATCH_INTERVAL": "0",
+}
+
+
+def parse_importtime(output):
+    """
+    Parse the stderr of ``python -X importtime``.
+
+    Args:
+        output (str): Captured stderr
+
+    Returns:
+        list: One dict per imported module with name, depth, self_us and cumulative_us
+    """
+    modules = []
+    for line in output.splitlines():
+        match = _LINE_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        modules.append({
+            "name": name,
+            "depth": len(indent) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    return modules
+
+
+def import_report(module='app', top=15, env=None):
+    """
+    Import a module in a subprocess and summarize where the time went.
+
+    Args:
+        module (str): Module to import
+        top (int): Number of entries per ranking
+        env (dict, optional): Extra environment variables for the subprocess,
+            applied over ``QUIET_ENV``
+
+    Returns:
+        dict: Total time, per-package totals and the slowest modules
+    """
+    process_env = dict(os.environ, **QUIET_ENV)
+    process_env.update(env or {})
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, env=process_env)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    modules = parse_importtime(result.stderr)
+    packages = {}
+    for entry in modules:
+        package = entry["name"].split('.')[0]
+        packages[package] = packages.get(package, 0) + entry["self_us"]
+
+    return {
+        "module": module,
+        "total_ms": round(sum(m["cumulative_us"] for m in modules if m["depth"] == 0) / 1000, 1),
+        "modules": len(modules),
+        "imported": sorted({m["name"] for m in modules}),
+        "by_package": [
+            {"package": name, "self_ms": round(us / 1000, 1)}
+            for name, us in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        ],
+        "by_cumulative": [
+            {"module": m["name"], "cumulative_ms": round(m["cumulative_us"] / 1000, 1)}
+            for m in sorted(modules, key=lambda m: -m["cumulative_us"])[:top]
+        ],
+        "by_self": [
+            {"module": m["name"], "self_ms": round(m["self_us"] / 1000, 1)}
+            for m in sorted(modules, key=lambda m: -m["self_us"])[:top]
+        ],
+    }
+
+
+def _print_report(report):
+    print(f"Import of {report['module']}: {report['total_ms']} ms over {report['modules']} modules")
+    for title, key, value in (("Self time per top-level package", 'by_package', 'self_ms'),
+                              ("Slowest modules (cumulative)", 'by_cumulative', 'cumulative_ms'),
+                              ("Slowest modules (self)", 'by_self', 'self_ms')):
+        print(f"\n{title}:")
+        for entry in report[key]:
+            name = entry.get('package', entry.get('module'))
+            print(f"  {entry[value]:>9.1f} ms  {name}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report per-module import cost of the serving process.")
+    parser.add_argument('module', nargs='?', default='app', help="Module to import (default: app)")
+    parser.add_argument('--top', type=int, default=15, help="Entries per ranking")
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help="Exit with status 1 when the total import time is over this budget")
+    parser.add_argument('--forbid', action='append', default=[],
+                        help="Exit with status 1 when this package gets imported (repeatable)")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = import_report(args.module, args.top)
+    imported = report.pop("imported")
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+
+    failures = []
+    if args.budget_ms is not None and report["total_ms"] > args.budget_ms:
+        failures.append(f"total import time {report['total_ms']} ms is over the {args.budget_ms} ms budget")
+    for package in args.forbid:
+        if any(name == package or name.startswith(package + '.') for name in imported):
+            failures.append(f"forbidden package {package} was imported")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,470 @@
+import fcntl
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from utils.data_loader import load_assessments, save_assessments, update_assessments
+from utils.index_store import DEFAULT_INDEX_DIR, KEEP_INDEXES, load_or_build_processor
+
+
+class IndexManager:
+    """
+    Owns the serving processor and builds it off the request path.
+
+    The catalog load and the index load (or fit) run in a background
+    thread, so the process can answer liveness checks while it starts.
+    Requests read ``processor``, which stays None until the first build
+    succeeded; ``status()`` reports the state for readiness checks.
+
+    The catalog can be reloaded while serving, on an explicit trigger or
+    when the catalog file changes. A reload builds a complete new processor
+    (an immutable snapshot) next to the current one and then replaces the
+    reference in a single assignment: requests that already took the old
+    processor finish on it, new requests get the new one. A failed reload
+    keeps serving the previous snapshot.
+
+    Single assessments can be upserted or deleted through ``update``, which
+    writes them through to the catalog file. Every process serving the file
+    (``sync``, run by ``update``, the watcher and ``check_catalog``) diffs it
+    against its processor and swaps in one carrying an incremental delta,
+    so all workers, reloads and refits serve the same catalog. Once the IDF
+    drift of the delta passes ``refit_drift`` a full refit of the current
+    catalog runs in the background.
+    """
+
+    STARTING = 'starting'
+    LOADING = 'loading'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    # Share of the catalog a file change may touch and still be applied as
+    # an incremental delta; larger changes reload the catalog
+    MAX_INCREMENTAL_SHARE = 0.1
+
+    def __init__(self, catalog_path="data/shl_assessments.json", index_dir=DEFAULT_INDEX_DIR,
+                 cache=None, refit_drift=0.25, vectorizer='tfidf', vectorizer_options=None,
+                 ranking='cosine', candidate_depth=None, dynamic_pruning=False, nprobe=None,
+                 keep_indexes=KEEP_INDEXES):
+        """
+        Initialize the manager; nothing is loaded until ``start`` or ``build``.
+
+        Args:
+            catalog_path (str): Assessment catalog JSON file
+            index_dir (str): Directory of persisted indexes
+            cache (QueryCache, optional): Cache for per-query score vectors
+            refit_drift (float): IDF drift of incremental updates that triggers a full refit
+            vectorizer (str): Vectorizer mode, see NLPProcessor.VECTORIZERS
+            vectorizer_options (dict, optional): Settings of the vectorizer mode
+            ranking (str): Default lexical scoring, see NLPProcessor.RANKINGS
+            candidate_depth (int, optional): Assessments reranked per query; all when not given
+            dynamic_pruning (bool): Find the lexical candidates with MaxScore
+            nprobe (int, optional): IVF clusters scored per query with the 'lsa' ranking
+            keep_indexes (int): Artifacts kept in ``index_dir`` after a build;
+                0 or None keeps every artifact
+        """
+        self.logger = logging.getLogger(__name__)
+        self.catalog_path = catalog_path
+        self.index_dir = index_dir
+        self.cache = cache
+        self.state = self.STARTING
+        self.processor = None
+        self.assessment_types = []
+        self.build_seconds = None
+        self.error = None
+        self.loaded_at = None
+        self.reloads = 0
+        self.reload_failures = 0
+        self.last_reload = None
+        self.refit_drift = refit_drift
+        self.vectorizer = vectorizer
+        self.vectorizer_options = vectorizer_options
+        self.ranking = ranking
+        self.candidate_depth = candidate_depth
+        self.dynamic_pruning = dynamic_pruning
+        self.nprobe = nprobe
+        self.keep_indexes = keep_indexes
+        self.updates = 0
+        self.refits = 0
+        self._update_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._build_lock = threading.Lock()
+        self._catalog_signature = None
+        self._watch_stop = threading.Event()
+
+    @property
+    def ready(self):
+        """
+        Whether a processor is available to serve requests.
+        """
+        return self.processor is not None
+
+    @property
+    def building(self):
+        """
+        Whether a build or reload is running.
+        """
+        return self._build_lock.locked()
+
+    def start(self):
+        """
+        Build the index in a background daemon thread.
+        """
+        threading.Thread(target=self.build, name='index-build', daemon=True).start()
+
+    def reload(self):
+        """
+        Start a background reload unless a build is already running.
+
+        Returns:
+            bool: Whether a reload was started
+        """
+        if self.building:
+            return False
+        threading.Thread(target=self.build, name='index-reload', daemon=True).start()
+        return True
+
+    def _catalog_file_signature(self):
+        """
+        Inode, modification time and size of the catalog file, None when it is missing.
+        """
+        try:
+            stat = os.stat(self.catalog_path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _assessment_types(processor):
+        """
+        Assessment types present in a processor's catalog, from its facet bitmaps.
+        """
+        facet_index = processor.facet_index
+        return list(dict.fromkeys(
+            'Unknown' if value is None else value
+            for value, bitmap in facet_index.bitmaps['type'].items() if facet_index.count(bitmap)))
+
+    def build(self):
+        """
+        Load the catalog and its index, fitting one when none matches, and
+        swap it in.
+
+        Only one build runs at a time; a call made while another build is
+        running returns immediately. Failures are logged and recorded in the
+        status instead of raised.
+
+        Returns:
+            bool: Whether a new processor was swapped in
+        """
+        if not self._build_lock.acquire(blocking=False):
+            return False
+        try:
+            return self._build()
+        finally:
+            self._build_lock.release()
+
+    def _build(self):
+        """
+        Build and swap in a new processor; the caller holds the build lock.
+        """
+        is_reload = self.processor is not None
+        if not is_reload:
+            self.state = self.LOADING
+        # Taken before reading the file, so a change during the build is
+        # synced once the new processor is swapped in
+        signature = self._catalog_file_signature()
+        start = time.perf_counter()
+        try:
+            # A reload must not replace a working catalog with the sample data
+            assessments = load_assessments(self.catalog_path, strict=is_reload)
+            self.logger.info(f"Loaded {len(assessments)} assessments")
+            processor = self._load_processor(assessments)
+        except Exception as e:
+            seconds = time.perf_counter() - start
+            self.logger.error(f"Error initializing NLP processor: {e}")
+            if is_reload:
+                self.reload_failures += 1
+                self.last_reload = {"success": False, "seconds": round(seconds, 3),
+                                    "error": str(e), "at": time.time()}
+            else:
+                self.build_seconds = seconds
+                self.error = str(e)
+                self.state = self.FAILED
+            return False
+
+        seconds = time.perf_counter() - start
+        # Incremental updates are in the file, so the new catalog includes them
+        with self._update_lock:
+            previous = self.processor
+            self.processor = processor
+            self._catalog_signature = signature
+            self.assessment_types = self._assessment_types(processor)
+        self.loaded_at = time.time()
+        self.error = None
+        self.state = self.READY
+        self._ready.set()
+
+        if previous is None:
+            self.build_seconds = seconds
+            self.logger.info(f"NLP processor initialized successfully in {seconds:.2f}s")
+        else:
+            self.reloads += 1
+            self.last_reload = {"success": True, "seconds": round(seconds, 3),
+                                "error": None, "at": self.loaded_at}
+            self.logger.info(
+                f"Reloaded catalog {previous.catalog_version} -> {processor.catalog_version} "
+                f"in {seconds:.2f}s")
+
+        self._invalidate_cache(processor)
+        self.sync()
+        return True
+
+    def _load_processor(self, assessments):
+        """
+        Load or fit the index of a catalog with the configured vectorizer.
+        """
+        return load_or_build_processor(assessments, index_dir=self.index_dir, cache=self.cache,
+                                       vectorizer=self.vectorizer,
+                                       vectorizer_options=self.vectorizer_options,
+                                       ranking=self.ranking,
+                                       candidate_depth=self.candidate_depth,
+                                       dynamic_pruning=self.dynamic_pruning,
+                                       nprobe=self.nprobe,
+                                       keep_indexes=self.keep_indexes)
+
+    def _invalidate_cache(self, processor):
+        """
+        Drop cached scores of every catalog version but the one being served.
+        """
+        if self.cache is not None:
+            self.cache.invalidate(keep_version=processor.catalog_version)
+
+    @contextmanager
+    def _catalog_file_lock(self):
+        """
+        Hold an exclusive lock on the catalog file across processes.
+        """
+        with open(self.catalog_path + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def update(self, upserts=(), deletes=()):
+        """
+        Upsert and delete assessments in the catalog file and serve the result.
+
+        The change is written to the catalog file under a file lock shared
+        by every worker, then synced into this process without refitting;
+        other workers pick it up with their next ``sync``.
+
+        Args:
+            upserts (list): Assessment dictionaries, matched on 'id'
+            deletes (list): Ids of assessments to retire
+
+        Returns:
+            dict: Status after the update, including whether a refit started
+
+        Raises:
+            RuntimeError: When no processor is loaded yet
+            ValueError, KeyError: When an update is invalid; nothing is applied
+            OSError: When the catalog file cannot be read or written
+        """
+        if self.processor is None:
+            raise RuntimeError("Index is not ready")
+        with self._catalog_file_lock():
+            assessments = load_assessments(self.catalog_path, strict=True)
+            update_assessments(assessments, upserts, deletes)
+            save_assessments(assessments, self.catalog_path)
+
+        result = self.sync()
+        status = self.status()
+        status["refit_started"] = result["refit_started"]
+        return status
+
+    def sync(self):
+        """
+        Bring the served catalog in line with the catalog file.
+
+        The file is diffed against the current processor and the difference
+        applied as an incremental update. A change that cannot be applied
+        incrementally (see ``NLPProcessor.catalog_changes``) or that touches
+        more than ``MAX_INCREMENTAL_SHARE`` of the catalog starts a reload
+        instead. Once the IDF drift passes ``refit_drift`` a refit starts.
+
+        Returns:
+            dict: Number of changes applied, whether a reload or a refit started
+        """
+        result = {"changes": 0, "reload_started": False, "refit_started": False}
+        with self._update_lock:
+            processor = self.processor
+            signature = self._catalog_file_signature()
+            if processor is None or signature is None or signature == self._catalog_signature:
+                return result
+            try:
+                assessments = load_assessments(self.catalog_path, strict=True)
+            except Exception as e:
+                # Retried on the next check, the signature is left unchanged
+                self.logger.error(f"Error reading catalog file {self.catalog_path}: {e}")
+                return result
+
+            changes = processor.catalog_changes(assessments)
+            if changes is not None:
+                upserts, deletes = changes
+                if len(upserts) + len(deletes) > self.MAX_INCREMENTAL_SHARE * max(len(assessments), 1):
+                    changes = None
+            if changes is not None:
+                if upserts or deletes:
+                    processor = processor.apply_updates(upserts, deletes)
+                    self.processor = processor
+                    self.assessment_types = self._assessment_types(processor)
+                    self.updates += 1
+                    result["changes"] = len(upserts) + len(deletes)
+                self._catalog_signature = signature
+
+        if changes is None:
+            self.logger.info(f"Catalog file {self.catalog_path} changed too much for an update, reloading")
+            result["reload_started"] = self.reload()
+            return result
+        if result["changes"]:
+            self.logger.info(f"Synced {result['changes']} assessment changes from {self.catalog_path}")
+            self._invalidate_cache(processor)
+
+        if processor.idf_drift > self.refit_drift and not self.building:
+            self.logger.info(
+                f"IDF drift {processor.idf_drift:.3f} is over {self.refit_drift}, starting a refit")
+            threading.Thread(target=self.refit, name='index-refit', daemon=True).start()
+            result["refit_started"] = True
+        return result
+
+    def check_catalog(self):
+        """
+        Start a background ``sync`` when the catalog file changed.
+
+        Cheap enough to call on every request: it costs one ``stat`` unless
+        the file changed, and at most one sync runs at a time.
+
+        Returns:
+            bool: Whether a sync was started
+        """
+        signature = self._catalog_file_signature()
+        if self.processor is None or signature is None or signature == self._catalog_signature:
+            return False
+        # A running build or refit syncs when it swaps its processor in
+        if self.building or not self._sync_lock.acquire(blocking=False):
+            return False
+
+        def run():
+            try:
+                self.sync()
+            finally:
+                self._sync_lock.release()
+
+        threading.Thread(target=run, name='catalog-sync', daemon=True).start()
+        return True
+
+    def refit(self):
+        """
+        Fit a new index on the current catalog, including incremental updates.
+
+        File changes synced while the fit runs are applied to the refitted
+        processor once it is swapped in.
+
+        Returns:
+            bool: Whether a refitted processor was swapped in
+        """
+        if not self._build_lock.acquire(blocking=False):
+            return False
+        try:
+            with self._update_lock:
+                assessments = self.processor.live_assessments()
+                signature = self._catalog_signature
+            start = time.perf_counter()
+            try:
+                processor = self._load_processor(assessments)
+            except Exception as e:
+                self.logger.error(f"Error refitting the index: {e}")
+                return False
+
+            with self._update_lock:
+                self.processor = processor
+                self._catalog_signature = signature
+                self.assessment_types = self._assessment_types(processor)
+                self.refits += 1
+            self.logger.info(
+                f"Refitted {len(assessments)} assessments in {time.perf_counter() - start:.2f}s")
+            self._invalidate_cache(processor)
+            self.sync()
+            return True
+        finally:
+            self._build_lock.release()
+
+    def watch(self, interval):
+        """
+        Poll the catalog file and sync (or, before the first build, build) when it changes.
+
+        Args:
+            interval (float): Seconds between checks
+        """
+        def poll():
+            while not self._watch_stop.wait(interval):
+                signature = self._catalog_file_signature()
+                if signature is not None and signature != self._catalog_signature and not self.building:
+                    self.logger.info(f"Catalog file {self.catalog_path} changed, syncing")
+                    if self.processor is None:
+                        self.build()
+                    else:
+                        self.sync()
+
+        threading.Thread(target=poll, name='catalog-watch', daemon=True).start()
+
+    def stop_watching(self):
+        """
+        Stop the catalog file watcher.
+        """
+        self._watch_stop.set()
+
+    def wait(self, timeout=None):
+        """
+        Block until the processor is ready.
+
+        Args:
+            timeout (float, optional): Seconds to wait at most
+
+        Returns:
+            bool: Whether the processor is ready
+        """
+        return self._ready.wait(timeout)
+
+    def status(self):
+        """
+        Get the index state for readiness checks.
+
+        Returns:
+            dict: State, snapshot version, assessment count, build duration,
+                reload counters and errors
+        """
+        processor = self.processor
+        return {
+            "state": self.state,
+            "ready": processor is not None,
+            "vectorizer": self.vectorizer,
+            "ranking": self.ranking,
+            "candidate_depth": self.candidate_depth,
+            "dynamic_pruning": self.dynamic_pruning,
+            "nprobe": self.nprobe,
+            "catalog_version": processor.catalog_version if processor is not None else None,
+            "assessments": processor.catalog_size if processor is not None else 0,
+            "build_seconds": round(self.build_seconds, 3) if self.build_seconds is not None else None,
+            "loaded_at": self.loaded_at,
+            "error": self.error,
+            "reloading": processor is not None and self.building,
+            "reloads": self.reloads,
+            "reload_failures": self.reload_failures,
+            "last_reload": self.last_reload,
+            "updates": self.updates,
+            "idf_drift": round(processor.idf_drift, 4) if processor is not None else None,
+            "refits": self.refits,
+        }
@@ -0,0 +1,565 @@
+"""
+Persisted, content-addressed recommendation index.
+
+Fitting the TF-IDF vectorizer and scanning the catalog for boost features
+is done once by a build step; the result is written to
+``<index root>/<key>/`` where the key is a hash of the catalog, the boost
+rule file, the vectorizer mode and settings and the artifact format. Server workers
+compute the key of the catalog they loaded and read the matching artifact
+instead of refitting, and only build (and save) a new one when the key
+changes.
+
+Every array is stored as a ``.npy`` file and the vocabulary and catalog as
+packed string tables (a hashing index stores only its per-column IDF
+instead of a vocabulary). The per-catalog structures built
+next to the vectors (field cache, facet bitmaps, boost feature postings,
+BM25F postings) are saved too, so workers memory-map the artifact read-only, share
+one physical copy of the index through the page cache and build nothing at load. An index built with the
+``lsa_dimensions`` option also stores the dense LSA projection and assessment vectors.
+
+Usage:
+    python -m utils.index_store --catalog data/shl_assessments.json --index-dir data/index
+    python -m utils.index_store --dtype float32 --min-df 2 --report
+    python -m utils.index_store --lsa-dimensions 128 --report
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import numpy as np
+import scipy.sparse as sp
+from utils.data_loader import load_assessments
+from utils.bm25 import BM25Index
+from utils.dense_index import IVFIndex, LSAIndex
+from utils.nlp_processor import NLPProcessor
+from utils.facets import FacetIndex
+from utils.field_cache import AssessmentFieldCache
+from utils.packed_table import (PackedCatalog, PackedStrings, PackedVocabulary, save_packed_strings,
+                                save_packed_vocabulary)
+from utils.query_vectorizer import HashingQueryVectorizer, QueryVectorizer
+from utils.rules import DEFAULT_RULES_PATH, load_rules
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 7
+DEFAULT_INDEX_DIR = "data/index"
+MANIFEST_FILE = "manifest.json"
+
+# Artifacts kept in an index directory, including the one being served
+KEEP_INDEXES = 2
+
+
+def index_key(assessments, rules_path=DEFAULT_RULES_PATH, vectorizer='tfidf', vectorizer_options=None):
+    """
+    Compute the content address of the index for a catalog and configuration.
+
+    Args:
+        assessments (list): List of assessment dictionaries
+        rules_path (str): Path to the boost rules JSON file
+        vectorizer (str): Vectorizer mode
+        vectorizer_options (dict, optional): Settings of the vectorizer mode
+
+    Returns:
+        str: Hexadecimal index key
+    """
+    digest = hashlib.sha256()
+    digest.update(f"format={INDEX_FORMAT_VERSION}\nvectorizer={vectorizer}\n".encode('utf-8'))
+    digest.update(json.dumps(NLPProcessor.VECTORIZER_PARAMS, sort_keys=True).encode('utf-8'))
+    digest.update(json.dumps(vectorizer_options or {}, sort_keys=True).encode('utf-8'))
+    with open(rules_path, 'rb') as f:
+        digest.update(f.read())
+    digest.update(json.dumps(assessments, sort_keys=True, separators=(',', ':'),
+                             default=str).encode('utf-8'))
+    return digest.hexdigest()[:32]
+
+
+def _save_csr(directory, name, matrix):
+    """
+    Write the arrays of a CSR matrix as name_{data,indices,indptr}.npy.
+    """
+    for part in ('data', 'indices', 'indptr'):
+        np.save(os.path.join(directory, f"{name}_{part}.npy"), getattr(matrix, part))
+
+
+def _load_csr(directory, name, shape, mmap_mode=None):
+    """
+    Read a CSR matrix written by _save_csr; mapped arrays are used without copying.
+    """
+    parts = [np.load(os.path.join(directory, f"{name}_{part}.npy"), mmap_mode=mmap_mode)
+             for part in ('data', 'indices', 'indptr')]
+    return sp.csr_matrix(tuple(parts), shape=tuple(shape))
+
+
+def save_index(processor, path, key):
+    """
+    Write a fitted processor's index to a directory.
+
+    The files are written to a temporary sibling directory that is renamed
+    into place, so concurrent readers never see a partial artifact.
+
+    Args:
+        processor (NLPProcessor): Fitted processor
+        path (str): Target artifact directory
+        key (str): Index key of the processor's catalog and configuration
+    """
+    if processor.delta is not None:
+        raise ValueError("Cannot save a processor with incremental updates; refit it first")
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.index-', dir=parent)
+    try:
+        query_vectorizer = processor.query_vectorizer
+        if isinstance(query_vectorizer, HashingQueryVectorizer):
+            columns = {"n_features": query_vectorizer.n_features,
+                       "n_documents": query_vectorizer.n_documents}
+        else:
+            # Terms in column order, with a hash index for term -> column lookups
+            vocabulary = query_vectorizer.vocabulary
+            terms = sorted(vocabulary, key=vocabulary.get)
+            save_packed_vocabulary(staging, 'vocabulary', terms)
+            columns = {"vocabulary_size": len(terms)}
+        save_packed_strings(staging, 'stop_words', sorted(query_vectorizer.stop_words))
+        np.save(os.path.join(staging, 'idf.npy'), query_vectorizer.idf)
+
+        vectors = processor.assessment_vectors.tocsr()
+        postings = processor.catalog_postings.tocsr()
+        features = processor.boost_engine.features.tocsr()
+        feature_postings = processor.boost_engine.feature_postings.tocsr()
+        _save_csr(staging, 'assessment_vectors', vectors)
+        _save_csr(staging, 'catalog_postings', postings)
+        _save_csr(staging, 'boost_features', features)
+        _save_csr(staging, 'boost_feature_postings', feature_postings)
+        np.save(os.path.join(staging, 'penalty_flags.npy'), processor.boost_engine.penalty_flags)
+        processor.field_cache.save(staging, 'fields')
+        processor.facet_index.save(staging, 'facets')
+        processor.bm25_index.save(staging, 'bm25')
+        lsa_index = processor.lsa_index
+        if lsa_index is not None:
+            np.save(os.path.join(staging, 'lsa_projection.npy'), lsa_index.projection)
+            np.save(os.path.join(staging, 'lsa_embeddings.npy'), lsa_index.embeddings)
+            if lsa_index.codes is not None:
+                np.save(os.path.join(staging, 'lsa_codes.npy'), lsa_index.codes)
+                np.save(os.path.join(staging, 'lsa_scales.npy'), lsa_index.scales)
+            if lsa_index.ivf is not None:
+                for part in ('centroids', 'offsets', 'rows'):
+                    np.save(os.path.join(staging, f'ivf_{part}.npy'), getattr(lsa_index.ivf, part))
+
+        PackedCatalog.save(staging, 'catalog', processor.assessments)
+
+        manifest = {
+            "format": INDEX_FORMAT_VERSION,
+            "key": key,
+            "catalog_version": processor.catalog_version,
+            "rules_version": processor.rules.version,
+            "vectorizer": processor.vectorizer_mode,
+            "vectorizer_params": NLPProcessor.VECTORIZER_PARAMS,
+            "vectorizer_options": processor.vectorizer_options,
+            "query_vectorizer": query_vectorizer.config,
+            "columns": columns,
+            "assessments": len(processor.assessments),
+            "assessment_vectors_shape": list(vectors.shape),
+            "catalog_postings_shape": list(postings.shape),
+            "boost_features_shape": list(features.shape),
+            "boost_feature_postings_shape": list(feature_postings.shape),
+            "lsa_dimensions": lsa_index.dimensions if lsa_index is not None else None,
+            "ivf_lists": lsa_index.ivf.n_lists if lsa_index is not None and lsa_index.ivf is not None else None,
+            "lsa_quantization": 'int8' if lsa_index is not None and lsa_index.codes is not None else None,
+        }
+        with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        os.rename(staging, path)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+            # Another worker saved the same artifact first
+            return
+        raise
+    logger.info(f"Saved index {key} to {path}")
+
+
+def prune_indexes(index_dir, current_key, keep=KEEP_INDEXES):
+    """
+    Delete old artifacts from an index directory.
+
+    The current artifact and the most recently written others, ``keep`` in
+    total, are kept; staging directories of builds in progress are not
+    touched. Workers still serving a deleted artifact keep their mapping.
+
+    Args:
+        index_dir (str): Directory holding the artifacts, one per key
+        current_key (str): Key of the artifact being served
+        keep (int): Number of artifacts to keep; 0 or None keeps every artifact
+
+    Returns:
+        list: Keys of the deleted artifacts
+    """
+    if not keep:
+        return []
+    artifacts = []
+    for name in os.listdir(index_dir):
+        manifest = os.path.join(index_dir, name, MANIFEST_FILE)
+        if name != current_key and os.path.isfile(manifest):
+            artifacts.append((os.path.getmtime(manifest), name))
+    artifacts.sort(reverse=True)
+    deleted = []
+    for _, name in artifacts[max(keep - 1, 0):]:
+        shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+        deleted.append(name)
+    if deleted:
+        logger.info(f"Pruned {len(deleted)} old index artifacts from {index_dir}")
+    return deleted
+
+
+def load_index(path, rules=None, cache=None, mmap_mode='r', ranking='cosine', candidate_depth=None,
+               dynamic_pruning=False, nprobe=None):
+    """
+    Load a processor from an artifact directory without refitting.
+
+    Only NumPy and SciPy are needed; scikit-learn is not imported.
+
+    Args:
+        path (str): Artifact directory
+        rules (CompiledRules, optional): Compiled boost rules the artifact was built with
+        cache (QueryCache, optional): Cache for per-query score vectors
+        mmap_mode (str, optional): ``numpy.load`` mmap mode for the arrays and
+            string tables; None reads private copies into memory
+        ranking (str): Default lexical scoring of the processor
+        candidate_depth (int, optional): Assessments reranked per query
+        dynamic_pruning (bool): Find the lexical candidates with MaxScore
+        nprobe (int, optional): IVF clusters scored per query with the 'lsa' ranking
+
+    Returns:
+        NLPProcessor: Ready-to-query processor
+    """
+    with open(os.path.join(path, MANIFEST_FILE), 'r') as f:
+        manifest = json.load(f)
+    if manifest.get("format") != INDEX_FORMAT_VERSION:
+        raise ValueError(f"Unsupported index format {manifest.get('format')!r} in {path}")
+
+    assessments = PackedCatalog(path, 'catalog', mmap_mode)
+    stop_words = PackedStrings(path, 'stop_words', mmap_mode)
+    vectorizer = manifest["vectorizer"]
+    if vectorizer == 'hashing':
+        query_vectorizer = HashingQueryVectorizer(
+            manifest["columns"]["n_features"],
+            np.load(os.path.join(path, 'idf.npy'), mmap_mode=mmap_mode),
+            manifest["columns"]["n_documents"],
+            stop_words=stop_words, **manifest["query_vectorizer"])
+    else:
+        query_vectorizer = QueryVectorizer(
+            PackedVocabulary(path, 'vocabulary', mmap_mode),
+            np.load(os.path.join(path, 'idf.npy'), mmap_mode=mmap_mode),
+            stop_words=stop_words, **manifest["query_vectorizer"])
+
+    assessment_vectors = _load_csr(path, 'assessment_vectors',
+                                   manifest["assessment_vectors_shape"], mmap_mode)
+    catalog_postings = _load_csr(path, 'catalog_postings',
+                                 manifest["catalog_postings_shape"], mmap_mode)
+    boost_features = _load_csr(path, 'boost_features', manifest["boost_features_shape"], mmap_mode)
+    feature_postings = _load_csr(path, 'boost_feature_postings',
+                                 manifest["boost_feature_postings_shape"], mmap_mode)
+    penalty_flags = np.load(os.path.join(path, 'penalty_flags.npy'), mmap_mode=mmap_mode)
+    version = manifest["catalog_version"]
+    field_cache = AssessmentFieldCache.load(path, 'fields', mmap_mode, version)
+    facet_index = FacetIndex.load(path, 'facets', mmap_mode, version)
+    bm25_index = BM25Index.load(path, name='bm25', mmap_mode=mmap_mode)
+    lsa_index = None
+    if manifest.get("lsa_dimensions"):
+        ivf = None
+        if manifest.get("ivf_lists"):
+            ivf = IVFIndex(*[np.load(os.path.join(path, f'ivf_{part}.npy'), mmap_mode=mmap_mode)
+                             for part in ('centroids', 'offsets', 'rows')])
+        quantized = [None, None]
+        if manifest.get("lsa_quantization"):
+            quantized = [np.load(os.path.join(path, f'lsa_{part}.npy'), mmap_mode=mmap_mode)
+                         for part in ('codes', 'scales')]
+        lsa_index = LSAIndex(np.load(os.path.join(path, 'lsa_projection.npy'), mmap_mode=mmap_mode),
+                             np.load(os.path.join(path, 'lsa_embeddings.npy'), mmap_mode=mmap_mode),
+                             ivf, *quantized)
+
+    processor = NLPProcessor.from_index(assessments, query_vectorizer, assessment_vectors,
+                                        catalog_postings, boost_features, penalty_flags,
+                                        rules=rules, cache=cache, vectorizer=vectorizer,
+                                        vectorizer_options=manifest["vectorizer_options"],
+                                        ranking=ranking, candidate_depth=candidate_depth,
+                                        dynamic_pruning=dynamic_pruning, lsa_index=lsa_index,
+                                        nprobe=nprobe, feature_postings=feature_postings,
+                                        field_cache=field_cache, facet_index=facet_index,
+                                        version=version, bm25_index=bm25_index)
+    logger.info(f"Loaded index {manifest['key']} from {path}")
+    return processor
+
+
+def _discard_artifact(path):
+    """
+    Move a broken artifact out of the way and delete it.
+
+    The directory is renamed first, so a new artifact can be saved under
+    its key even while the old files are still being deleted or mapped.
+
+    Args:
+        path (str): Artifact directory
+    """
+    aside = tempfile.mkdtemp(prefix='.broken-', dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        os.rename(path, os.path.join(aside, 'index'))
+    except OSError as e:
+        # Another worker may have moved it already
+        logger.warning(f"Could not move broken index {path} aside: {e}")
+    shutil.rmtree(aside, ignore_errors=True)
+
+
+def load_or_build_processor(assessments, index_dir=DEFAULT_INDEX_DIR, rules_path=DEFAULT_RULES_PATH,
+                            cache=None, vectorizer='tfidf', vectorizer_options=None, ranking='cosine',
+                            candidate_depth=None, dynamic_pruning=False, nprobe=None,
+                            keep_indexes=KEEP_INDEXES):
+    """
+    Load the index matching a catalog, building and saving it when missing.
+
+    After saving a new artifact the older ones are pruned (see ``prune_indexes``).
+    An artifact that fails to load is deleted and rebuilt; if the rebuilt
+    one cannot be loaded either, the freshly fitted processor is served.
+
+    Args:
+        assessments (list): List of assessment dictionaries
+        index_dir (str): Directory holding the artifacts, one per key
+        rules_path (str): Path to the boost rules JSON file
+        cache (QueryCache, optional): Cache for per-query score vectors
+        vectorizer (str): Vectorizer mode, see NLPProcessor.VECTORIZERS
+        vectorizer_options (dict, optional): Settings of the vectorizer mode
+        ranking (str): Default lexical scoring; not part of the key, every
+            artifact stores the BM25F index next to the TF-IDF one
+        candidate_depth (int, optional): Assessments reranked per query; not
+            part of the key
+        dynamic_pruning (bool): Find the lexical candidates with MaxScore; the
+            BM25F per-term maxima are stored, the cosine ones are computed
+            from the postings on first use
+        nprobe (int, optional): IVF clusters scored per query; not part of the key
+        keep_indexes (int): Artifacts kept in ``index_dir`` after a build;
+            0 or None keeps every artifact
+
+    Returns:
+        NLPProcessor: Ready-to-query processor
+    """
+    rules = load_rules(rules_path)
+    key = index_key(assessments, rules_path, vectorizer, vectorizer_options)
+    path = os.path.join(index_dir, key)
+
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        try:
+            return load_index(path, rules=rules, cache=cache, ranking=ranking,
+                              candidate_depth=candidate_depth, dynamic_pruning=dynamic_pruning,
+                              nprobe=nprobe)
+        except Exception as e:
+            logger.warning(f"Could not load index {key}, rebuilding: {e}")
+            _discard_artifact(path)
+
+    logger.info(f"No index for key {key}, fitting a new one")
+    processor = NLPProcessor(assessments, rules=rules, cache=cache, vectorizer=vectorizer,
+                             vectorizer_options=vectorizer_options, ranking=ranking,
+                             candidate_depth=candidate_depth, dynamic_pruning=dynamic_pruning,
+                             nprobe=nprobe)
+    try:
+        save_index(processor, path, key)
+    except OSError as e:
+        logger.warning(f"Could not save index {key} to {path}: {e}")
+        return processor
+    try:
+        prune_indexes(index_dir, key, keep_indexes)
+    except OSError as e:
+        logger.warning(f"Could not prune old indexes in {index_dir}: {e}")
+
+    # Serve from the mapped artifact so this worker shares it with the others
+    try:
+        return load_index(path, rules=rules, cache=cache, ranking=ranking,
+                          candidate_depth=candidate_depth, dynamic_pruning=dynamic_pruning, nprobe=nprobe)
+    except Exception as e:
+        logger.warning(f"Could not load saved index {key}, serving the fitted one: {e}")
+        return processor
+
+
+def index_footprint(processor):
+    """
+    Bytes held by the arrays of a fitted index.
+
+    Args:
+        processor (NLPProcessor): Fitted processor
+
+    Returns:
+        dict: Column count and bytes per component, with their total
+    """
+    def sparse_bytes(matrix):
+        return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+    def lsa_bytes(lsa_index):
+        # The vectors scored on every query; with quantization the float32
+        # ones are only read for rescoring and counted separately
+        if lsa_index is None:
+            return 0
+        if lsa_index.codes is None:
+            return lsa_index.projection.nbytes + lsa_index.embeddings.nbytes
+        return lsa_index.projection.nbytes + lsa_index.codes.nbytes + lsa_index.scales.nbytes
+
+    query_vectorizer = processor.query_vectorizer
+    footprint = {
+        "columns": len(query_vectorizer.idf),
+        "vocabulary": sum(len(term.encode('utf-8')) for term in query_vectorizer.vocabulary or ()),
+        "idf": query_vectorizer.idf.nbytes,
+        "assessment_vectors": sparse_bytes(processor.assessment_vectors),
+        "catalog_postings": sparse_bytes(processor.catalog_postings),
+        "lsa": lsa_bytes(processor.lsa_index),
+        "lsa_rescore": (processor.lsa_index.embeddings.nbytes
+                        if processor.lsa_index is not None and processor.lsa_index.codes is not None else 0),
+        "ivf": (sum(getattr(processor.lsa_index.ivf, part).nbytes for part in ('centroids', 'offsets', 'rows'))
+                if processor.lsa_index is not None and processor.lsa_index.ivf is not None else 0),
+    }
+    footprint["total"] = sum(value for name, value in footprint.items() if name != "columns")
+    return footprint
+
+
+def ranking_change(reference, candidate, queries, top_k=10):
+    """
+    Compare the recommendations of two processors.
+
+    Args:
+        reference (NLPProcessor): Processor to compare against
+        candidate (NLPProcessor): Processor being evaluated
+        queries (list): Query texts
+        top_k (int): Number of recommendations compared per query
+
+    Returns:
+        dict: Mean share of the reference top-k kept, and the number of
+            queries whose first recommendation changed
+    """
+    overlaps = []
+    top1_changed = 0
+    for query in queries:
+        expected = [r['name'] for r in reference.get_recommendations(query, top_k=top_k)]
+        actual = [r['name'] for r in candidate.get_recommendations(query, top_k=top_k)]
+        if expected:
+            overlaps.append(len(set(expected) & set(actual)) / len(expected))
+        top1_changed += expected[:1] != actual[:1]
+    return {
+        "queries": len(queries),
+        "top_k": top_k,
+        "overlap": round(sum(overlaps) / len(overlaps), 4) if overlaps else 1.0,
+        "top1_changed": top1_changed,
+    }
+
+
+def _evaluation_queries(paths):
+    """
+    Query texts of the evaluation sets (lists of {"query": ...} objects).
+    """
+    queries = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            queries.extend(case['query'] for case in json.load(f))
+    return queries
+
+
+def _document_frequency(text):
+    """
+    Parse a document frequency bound like scikit-learn reads it: an integer
+    is a document count, a decimal a share of the documents.
+    """
+    return float(text) if '.' in text else int(text)
+
+
+def _print_report(reference, processor, queries):
+    """
+    Print the memory saved and the ranking change against the default index.
+    """
+    before, after = index_footprint(reference), index_footprint(processor)
+    print(f"{'':<20}{'default':>12}{'this build':>12}")
+    for name in before:
+        print(f"{name:<20}{before[name]:>12}{after[name]:>12}")
+    saved = before["total"] - after["total"]
+    print(f"Memory saved: {saved} bytes ({saved / before['total']:.1%})")
+    change = ranking_change(reference, processor, queries)
+    print(f"Top-{change['top_k']} overlap with the default index: {change['overlap']:.4f} over "
+          f"{change['queries']} queries, first recommendation changed for {change['top1_changed']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the persisted recommendation index.")
+    parser.add_argument('--catalog', default="data/shl_assessments.json", help="Assessment catalog")
+    parser.add_argument('--rules', default=DEFAULT_RULES_PATH, help="Boost rules file")
+    parser.add_argument('--index-dir', default=DEFAULT_INDEX_DIR, help="Index artifact directory")
+    parser.add_argument('--vectorizer', default='tfidf', choices=NLPProcessor.VECTORIZERS,
+                        help="Vectorizer mode")
+    parser.add_argument('--hash-features', type=int, default=None,
+                        help="Number of hash columns of the hashing vectorizer (sized to the vocabulary by default)")
+    parser.add_argument('--dtype', choices=('float64', 'float32'), default=None,
+                        help="Storage precision of the index matrices")
+    parser.add_argument('--min-df', type=_document_frequency, default=None,
+                        help="Drop terms in fewer documents (count, or share with a decimal point)")
+    parser.add_argument('--max-df', type=_document_frequency, default=None,
+                        help="Drop terms in more documents (count, or share with a decimal point)")
+    parser.add_argument('--max-features', type=int, default=None,
+                        help="Keep only the most frequent terms")
+    parser.add_argument('--sublinear-tf', action='store_true', help="Use 1 + log(tf) term weights")
+    parser.add_argument('--lsa-dimensions', type=int, default=None,
+                        help="Also build a dense LSA index with this many dimensions")
+    parser.add_argument('--ivf-lists', type=int, default=None,
+                        help="Cluster the LSA index into this many lists for approximate search")
+    parser.add_argument('--lsa-quantization', choices=('int8',), default=None,
+                        help="Score the LSA index on quantized vectors, rescoring the best exactly")
+    parser.add_argument('--keep', type=int, default=KEEP_INDEXES,
+                        help="Artifacts kept in the index directory after a build (0 keeps all)")
+    parser.add_argument('--report', action='store_true',
+                        help="Compare memory and rankings with the default index")
+    parser.add_argument('--eval', action='append', default=None,
+                        help="Evaluation set for --report (repeatable)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    options = {}
+    if args.vectorizer == 'hashing' and args.hash_features:
+        options["n_features"] = args.hash_features
+    if args.dtype:
+        options["dtype"] = args.dtype
+    for name in ('min_df', 'max_df'):
+        if getattr(args, name) is not None:
+            options[name] = getattr(args, name)
+    if args.max_features:
+        options["max_features"] = args.max_features
+    if args.sublinear_tf:
+        options["sublinear_tf"] = True
+    if args.lsa_dimensions:
+        options["lsa_dimensions"] = args.lsa_dimensions
+        if args.ivf_lists:
+            options["ivf_lists"] = args.ivf_lists
+        if args.lsa_quantization:
+            options["lsa_quantization"] = args.lsa_quantization
+    options = options or None
+    # With a dense index, --report compares its rankings
+    ranking = 'lsa' if args.lsa_dimensions else 'cosine'
+
+    assessments = load_assessments(args.catalog)
+    rules = load_rules(args.rules)
+    key = index_key(assessments, args.rules, args.vectorizer, options)
+    path = os.path.join(args.index_dir, key)
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        print(f"Index {key} is up to date at {path}")
+        processor = load_index(path, rules=rules, ranking=ranking) if args.report else None
+    else:
+        processor = NLPProcessor(assessments, rules=rules, vectorizer=args.vectorizer,
+                                 vectorizer_options=options, ranking=ranking)
+        save_index(processor, path, key)
+        print(f"Built index {key} at {path}")
+        for pruned in prune_indexes(args.index_dir, key, args.keep):
+            print(f"Deleted old index {pruned}")
+
+    if args.report:
+        queries = _evaluation_queries(args.eval or ["test_data/shl_manual_test_data.json",
+                                                    "test_data/parsed_test_cases.json"])
+        _print_report(NLPProcessor(assessments, rules=rules), processor, queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import numpy as np
+
+
+class InvertedIndex:
+    """
+    Term-major posting lists with the maximum impact of every term, for
+    top-k retrieval with MaxScore dynamic pruning.
+
+    ``top_k`` processes the query terms term-at-a-time in decreasing order of
+    their upper bound (query weight times the term's maximum impact). As
+    soon as the upper bounds of the terms left cannot lift an unseen
+    assessment over the current k-th best score, no new assessments can
+    enter the top k: the remaining (usually long, low-weight) posting lists
+    are only probed for the candidates already found, by binary search,
+    and candidates that can no longer reach the threshold are dropped.
+    The result is the same top k as exhaustive scoring, while a long query
+    on a large catalog reads a small fraction of its postings.
+    """
+
+    def __init__(self, postings, max_impact=None):
+        """
+        Wrap term-major postings.
+
+        Args:
+            postings (scipy.sparse.csr_matrix): One row per term, one column
+                per assessment, non-negative impacts
+            max_impact (numpy.ndarray, optional): Largest impact per term,
+                computed when not given
+        """
+        if not postings.has_sorted_indices:
+            postings = postings.copy()
+            postings.sort_indices()
+        self.postings = postings
+        self.size = postings.shape[1]
+        if max_impact is None:
+            max_impact = np.zeros(postings.shape[0])
+            lengths = np.diff(postings.indptr)
+            nonempty = np.flatnonzero(lengths)
+            if len(nonempty):
+                max_impact[nonempty] = np.maximum.reduceat(postings.data, postings.indptr[nonempty])
+        self.max_impact = max_impact
+
+    def _probe(self, term, rows):
+        """
+        Positions of the postings of a term for sorted rows; -1 where absent.
+        """
+        postings = self.postings
+        start, end = postings.indptr[term], postings.indptr[term + 1]
+        docs = postings.indices[start:end]
+        positions = np.searchsorted(docs, rows)
+        found = positions < len(docs)
+        found[found] = docs[positions[found]] == rows[found]
+        return np.where(found, start + positions, -1)
+
+    def scores_for(self, terms, weights, rows):
+        """
+        Exact scores of selected assessments, reading only their postings.
+
+        Terms are accumulated in the given order, so with ascending terms the
+        scores are bit-for-bit those of a full term-major accumulation.
+
+        Args:
+            terms (numpy.ndarray): Query term rows
+            weights (numpy.ndarray): Query weight per term
+            rows (numpy.ndarray): Sorted assessment indices
+
+        Returns:
+            numpy.ndarray: Score per row
+        """
+        scores = np.zeros(len(rows))
+        data = self.postings.data
+        for term, weight in zip(terms, weights):
+            positions = self._probe(term, rows)
+            hit = positions >= 0
+            scores[hit] += weight * data[positions[hit]]
+        return scores
+
+    def top_k(self, terms, weights, k, exclude=None):
+        """
+        Find the k best scoring assessments with MaxScore pruning.
+
+        Args:
+            terms (numpy.ndarray): Query term rows
+            weights (numpy.ndarray): Query weight per term
+            k (int): Number of assessments to find
+            exclude (numpy.ndarray, optional): Assessments never returned, e.g.
+                deleted or replaced rows; they do not count towards the k
+                best, so they cannot raise the pruning threshold
+
+        Returns:
+            tuple: (assessment indices with a positive score, sorted;
+                number of postings read)
+        """
+        postings = self.postings
+        indptr, docs_all, data = postings.indptr, postings.indices, postings.data
+        bounds = weights * self.max_impact[terms]
+        order = np.argsort(-bounds, kind='stable')
+        # remaining[i]: most that terms order[i:] can still add
+        remaining = np.concatenate([np.cumsum(bounds[order][::-1])[::-1], [0.0]])
+
+        scores = np.zeros(self.size)
+        if exclude is not None:
+            # Stays -inf whatever is added, so never a candidate
+            scores[exclude] = -np.inf
+        candidates = None
+        threshold = 0.0
+        read = 0
+        for step, i in enumerate(order):
+            term, weight = terms[i], weights[i]
+            start, end = indptr[term], indptr[term + 1]
+            docs = docs_all[start:end]
+            if candidates is None and remaining[step] > threshold:
+                # Unseen assessments can still make the top k: scan the list.
+                # Partial scores only grow, so the k-th best among the
+                # assessments just updated bounds the final k-th score
+                scores[docs] += weight * data[start:end]
+                read += end - start
+                if end - start >= k:
+                    threshold = max(threshold, -np.partition(-scores[docs], k - 1)[k - 1])
+                continue
+
+            # Only assessments already seen that can still reach the threshold matter
+            if candidates is None:
+                candidates = np.flatnonzero(scores > 0)
+            candidates = candidates[scores[candidates] + remaining[step] >= threshold]
+            if len(candidates) < end - start:
+                positions = self._probe(term, candidates)
+                hit = positions >= 0
+                scores[candidates[hit]] += weight * data[positions[hit]]
+                read += len(candidates)
+            else:
+                scores[docs] += weight * data[start:end]
+                read += end - start
+            if len(candidates) >= k:
+                threshold = max(threshold, -np.partition(-scores[candidates], k - 1)[k - 1])
+
+        rows = np.flatnonzero(scores > 0) if candidates is None else candidates[scores[candidates] > 0]
+        if len(rows) > k:
+            rows = rows[np.lexsort((rows, -scores[rows]))[:k]]
+        return np.sort(rows), read
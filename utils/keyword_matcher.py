@@ -0,0 +1,121 @@
+from collections import deque
+
+
+class KeywordMatcher:
+    """
+    Multi-pattern substring matcher (Aho-Corasick automaton).
+
+    The automaton is built once from a list of patterns and then finds every
+    pattern occurring in a text in a single left-to-right scan, instead of one
+    ``pattern in text`` scan per pattern. Patterns may optionally be required
+    to match on word boundaries, so that short keywords such as 'r', 'ai' or
+    'go' do not match inside unrelated words.
+    """
+
+    def __init__(self, patterns, word_boundary_max_length=0):
+        """
+        Build the matching automaton.
+
+        Args:
+            patterns (list): Patterns to look for; duplicates are allowed and
+                every index of the list is reported separately
+            word_boundary_max_length (int): Patterns up to this length only
+                match when not surrounded by letters, digits or underscores.
+                0 disables word-boundary matching.
+        """
+        self.patterns = list(patterns)
+        self.word_boundary_max_length = word_boundary_max_length
+
+        # Each distinct pattern string becomes one output of the automaton
+        self._strings = list(dict.fromkeys(self.patterns))
+        string_ids = {string: i for i, string in enumerate(self._strings)}
+        self._string_indices = [[] for _ in self._strings]
+        for index, pattern in enumerate(self.patterns):
+            self._string_indices[string_ids[pattern]].append(index)
+        self._lengths = [len(string) for string in self._strings]
+        self._bounded = [0 < length <= word_boundary_max_length for length in self._lengths]
+
+        self._build()
+
+    def _build(self):
+        """
+        Build the trie, the failure links and the fully resolved transition table.
+        """
+        goto = [{}]
+        outputs = [[]]
+        for string_id, string in enumerate(self._strings):
+            if not string:
+                continue
+            state = 0
+            for char in string:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(string_id)
+
+        # Breadth-first pass: resolve failure links and merge the outputs of
+        # the failure state, then turn the trie into a complete transition
+        # table so scanning never has to follow failure links.
+        fail = [0] * len(goto)
+        transitions = [dict(goto[0])]
+        transitions.extend({} for _ in range(len(goto) - 1))
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            fallback = transitions[fail[state]]
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            resolved = dict(fallback)
+            for char, next_state in goto[state].items():
+                fail[next_state] = fallback.get(char, 0)
+                resolved[char] = next_state
+                queue.append(next_state)
+            transitions[state] = resolved
+
+        self._transitions = transitions
+        self._outputs = [tuple(output) for output in outputs]
+
+    def find(self, text):
+        """
+        Find all patterns occurring in a text.
+
+        Args:
+            text (str): Text to scan (patterns are matched case-sensitively)
+
+        Returns:
+            set: Indices into the pattern list of every pattern found
+        """
+        transitions = self._transitions
+        outputs = self._outputs
+        bounded = self._bounded
+        lengths = self._lengths
+        found = set()
+
+        state = 0
+        for position, char in enumerate(text):
+            state = transitions[state].get(char, 0)
+            if not outputs[state]:
+                continue
+            for string_id in outputs[state]:
+                if string_id in found:
+                    continue
+                if bounded[string_id] and not self._on_boundary(
+                        text, position - lengths[string_id] + 1, position + 1):
+                    continue
+                found.add(string_id)
+
+        return {index for string_id in found for index in self._string_indices[string_id]}
+
+    @staticmethod
+    def _on_boundary(text, start, end):
+        """
+        Check that text[start:end] is not glued to surrounding word characters.
+        """
+        if start > 0 and (text[start - 1].isalnum() or text[start - 1] == '_'):
+            return False
+        if end < len(text) and (text[end].isalnum() or text[end] == '_'):
+            return False
+        return True
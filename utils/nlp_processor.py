@@ -1,9 +1,17 @@
+import copy
 import numpy as np
 import logging
 import re
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from scipy.spatial.distance import cosine
+from utils.bm25 import BM25Index
+from utils.boost_engine import BoostEngine
+from utils.catalog_delta import CatalogDelta
+from utils.data_loader import catalog_version
+from utils.dense_index import LSAIndex
+from utils.facets import FacetIndex
+from utils.field_cache import AssessmentFieldCache
+from utils.inverted_index import InvertedIndex
+from utils.query_vectorizer import HashingQueryVectorizer, QueryVectorizer, cosine_postings
+from utils.rules import load_rules
 
 class NLPProcessor:
     """
@@ -11,20 +19,84 @@ class NLPProcessor:
     Uses TF-IDF vectorization and cosine similarity for matching.
     """
     
-    def __init__(self, assessments):
+    # TfidfVectorizer settings; part of the key of persisted indexes
+    VECTORIZER_PARAMS = {'stop_words': 'english'}
+    
+    # 'tfidf' fits a vocabulary with scikit-learn; 'hashing' hashes terms
+    # into a fixed number of columns and keeps only document frequencies
+    VECTORIZERS = ('tfidf', 'hashing')
+    
+    # Lexical scoring: cosine over the TF-IDF vectors, BM25F over the fields,
+    # or cosine in the dense LSA space (needs the 'lsa_dimensions' option)
+    RANKINGS = ('cosine', 'bm25', 'lsa')
+    
+    # Index options that are not vectorizer settings
+    INDEX_OPTIONS = ('dtype', 'lsa_dimensions', 'ivf_lists', 'lsa_quantization')
+    
+    def __init__(self, assessments, rules=None, cache=None, vectorizer='tfidf',
+                 vectorizer_options=None, ranking='cosine', candidate_depth=None,
+                 dynamic_pruning=False, nprobe=None):
         """
         Initialize the NLP processor with assessments data.
         
         Args:
             assessments (list): List of assessment dictionaries
+            rules (CompiledRules, optional): Compiled boost rules, loaded from
+                data/boost_rules.json when not given
+            cache (QueryCache, optional): Cache for per-query score vectors
+            vectorizer (str): Vectorizer mode, one of VECTORIZERS
+            vectorizer_options (dict, optional): Settings for the mode: 'dtype'
+                ('float64' or 'float32') for both modes, TfidfVectorizer
+                settings such as 'min_df', 'max_df', 'max_features' and
+                'sublinear_tf' for 'tfidf', 'n_features' and 'sublinear_tf'
+                for 'hashing', 'lsa_dimensions' to also build the dense
+                LSA index used by the 'lsa' ranking, 'ivf_lists' to
+                cluster it for approximate search and 'lsa_quantization'
+                ('int8') to score it on quantized vectors
+            ranking (str): Default lexical scoring, one of RANKINGS; requests
+                can choose another one
+            candidate_depth (int, optional): Rerank only this many assessments
+                per query (see ``_rerank_candidates``); every assessment when not given
+            dynamic_pruning (bool): With a candidate depth, find the lexical
+                candidates with MaxScore over the inverted index instead of
+                scoring every assessment (see ``_pruned_scores``)
+            nprobe (int, optional): With the 'lsa' ranking and an IVF index,
+                score only the assessments of this many clusters per query;
+                every assessment when not given
         """
+        self._check_ranking(ranking)
+        if ranking == 'lsa' and not (vectorizer_options or {}).get('lsa_dimensions'):
+            raise ValueError("Ranking 'lsa' needs the 'lsa_dimensions' vectorizer option")
+        if vectorizer not in self.VECTORIZERS:
+            raise ValueError(f"Unknown vectorizer {vectorizer!r}, expected one of {self.VECTORIZERS}")
+        dtype = np.dtype((vectorizer_options or {}).get('dtype', 'float64'))
+        if dtype not in (np.float64, np.float32):
+            raise ValueError(f"Unsupported index dtype {dtype}, expected float64 or float32")
         self.logger = logging.getLogger(__name__)
         self.assessments = assessments
+        self.cache = cache
+        self.vectorizer_mode = vectorizer
+        # Kept JSON-serializable: the options are part of the index key
+        self.vectorizer_options = dict(vectorizer_options or {})
+        self.index_dtype = dtype
+        self.ranking = ranking
+        self.candidate_depth = candidate_depth
+        self.dynamic_pruning = dynamic_pruning
+        self.nprobe = nprobe
+        
+        # Compile the boost rule tables once; requests only read them
+        self.rules = rules if rules is not None else load_rules()
         
         # Initialize TF-IDF vectorizer
-        self.logger.info("Initializing TF-IDF vectorizer...")
+        self.logger.info(f"Initializing {vectorizer} vectorizer...")
         try:
-            self.vectorizer = TfidfVectorizer(stop_words='english')
+            # scikit-learn is only needed to fit; queries use QueryVectorizer
+            if vectorizer == 'tfidf':
+                from sklearn.feature_extraction.text import TfidfVectorizer
+                params = {**self.VECTORIZER_PARAMS, **self._vectorizer_settings(), 'dtype': dtype.type}
+                self.vectorizer = TfidfVectorizer(**params)
+            else:
+                self.vectorizer = None
             
             # Pre-compute vectors for all assessments
             self._compute_assessment_vectors()
@@ -45,15 +117,10 @@ class NLPProcessor:
         self.processed_assessments = []
         
         for assessment in self.assessments:
-            # Combine all relevant fields
             name = assessment.get('name', '')
-            description = assessment.get('description', '')
-            skills = assessment.get('skills', '')
-            type_info = assessment.get('type', '')
             
-            # Weight important fields more by repeating them
-            # This ensures more relevant matches for critical fields like name and skills
-            text = f"{name} {name} {description} {skills} {skills} {type_info}"
+            # Combine all relevant fields
+            text = self._assessment_text(assessment)
             
             # Apply preprocessing
             processed_text = self._preprocess_text(text)
@@ -75,8 +142,295 @@ class NLPProcessor:
                 processed_text += " data_scientist data_analysis"
         
         # Generate TF-IDF vectors using the processed texts
-        self.assessment_vectors = self.vectorizer.fit_transform(self.processed_assessments)
+        if self.vectorizer is not None:
+            self.assessment_vectors = self.vectorizer.fit_transform(self.processed_assessments)
+            # Serving-path transformer over the fitted vocabulary
+            self.query_vectorizer = QueryVectorizer.from_sklearn(self.vectorizer)
+        else:
+            from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+            self.query_vectorizer = HashingQueryVectorizer.fit(
+                self.processed_assessments, stop_words=ENGLISH_STOP_WORDS, **self._vectorizer_settings())
+            self.assessment_vectors = self.query_vectorizer.transform(
+                self.processed_assessments).astype(self.index_dtype)
         self.logger.info(f"Computed vectors for {len(self.processed_assessments)} assessments")
+        
+        # The catalog side of the cosine product
+        self.catalog_postings = cosine_postings(self.assessment_vectors)
+        
+        # Dense low-rank projection of the same vectors, when configured
+        dimensions = self.vectorizer_options.get('lsa_dimensions')
+        self.lsa_index = None
+        if dimensions:
+            self.lsa_index = LSAIndex.fit(self.assessment_vectors, dimensions,
+                                          self.vectorizer_options.get('ivf_lists'),
+                                          self.vectorizer_options.get('lsa_quantization'))
+        
+        self._build_catalog_indexes()
+    
+    def _vectorizer_settings(self):
+        """
+        The vectorizer options without the index-only ones.
+        """
+        return {k: v for k, v in self.vectorizer_options.items() if k not in self.INDEX_OPTIONS}
+    
+    def _build_catalog_indexes(self, boost_features=None, penalty_flags=None, feature_postings=None,
+                               field_cache=None, facet_index=None, version=None, bm25_index=None):
+        """
+        Build the per-catalog structures used next to the TF-IDF vectors.
+        
+        Args:
+            boost_features (scipy.sparse.csr_matrix, optional): Previously
+                built boost feature matrix, computed when not given
+            penalty_flags (numpy.ndarray, optional): Previously built penalty flags
+            feature_postings (scipy.sparse.csr_matrix, optional): Previously
+                built transpose of the boost feature matrix
+            field_cache (AssessmentFieldCache, optional): Previously built field cache
+            facet_index (FacetIndex, optional): Previously built facet bitmaps
+            version (str, optional): Catalog version, hashed from the catalog when not given
+            bm25_index (BM25Index, optional): Previously built BM25F index
+        """
+        # Cache normalized fields and token sets once per catalog version
+        self.catalog_version = version if version is not None else catalog_version(self.assessments)
+        if field_cache is None:
+            field_cache = AssessmentFieldCache(self.assessments, self.catalog_version)
+        self.field_cache = field_cache
+        
+        # Per-value bitmaps for the filterable fields
+        if facet_index is None:
+            facet_index = FacetIndex(self.assessments, self.catalog_version)
+        self.facet_index = facet_index
+        
+        # Pre-compute keyword, category and role matches for boosting
+        self.boost_engine = BoostEngine(self.field_cache, self.rules, boost_features, penalty_flags,
+                                        feature_postings)
+        
+        # Assessments upserted or deleted since the fit
+        self.delta = None
+        
+        # BM25F index over the fields; saved with the index, so requests never build it
+        if bm25_index is None:
+            bm25_index = BM25Index(self.assessments, self._analyze)
+        elif bm25_index.analyze is None:
+            bm25_index.analyze = self._analyze
+        self.bm25_index = bm25_index
+        
+        # Per-term maximum weights of the cosine postings, for dynamic pruning
+        self._inverted_index = None
+    
+    @property
+    def inverted_index(self):
+        """
+        MaxScore index over the cosine postings, built on first access.
+        """
+        if self._inverted_index is None:
+            self._inverted_index = InvertedIndex(self.catalog_postings)
+        return self._inverted_index
+    
+    def _analyze(self, text):
+        """
+        Preprocess and tokenize a text the way the vectorizer does, for BM25.
+        """
+        return self.query_vectorizer.tokenize(self._preprocess_text(text))
+    
+    @classmethod
+    def _check_ranking(cls, ranking):
+        """
+        Raise ValueError for an unknown ranking name.
+        """
+        if ranking not in cls.RANKINGS:
+            raise ValueError(f"Unknown ranking {ranking!r}, expected one of {cls.RANKINGS}")
+    
+    @property
+    def rankings(self):
+        """
+        Rankings this processor can serve; 'lsa' needs the dense index.
+        """
+        return tuple(r for r in self.RANKINGS if r != 'lsa' or self.lsa_index is not None)
+    
+    def _check_available(self, ranking):
+        """
+        Raise ValueError for a ranking this processor cannot serve.
+        """
+        self._check_ranking(ranking)
+        if ranking not in self.rankings:
+            raise ValueError(f"Ranking {ranking!r} needs an index built with 'lsa_dimensions'")
+    
+    @classmethod
+    def from_index(cls, assessments, query_vectorizer, assessment_vectors, catalog_postings,
+                   boost_features, penalty_flags, rules=None, cache=None,
+                   vectorizer='tfidf', vectorizer_options=None, ranking='cosine',
+                   candidate_depth=None, dynamic_pruning=False, lsa_index=None, nprobe=None,
+                   feature_postings=None, field_cache=None, facet_index=None, version=None,
+                   bm25_index=None):
+        """
+        Create a processor from a previously fitted index without refitting.
+        
+        Args:
+            assessments (list): List of assessment dictionaries the index was built on
+            query_vectorizer (QueryVectorizer): Transformer over the fitted columns
+            assessment_vectors (scipy.sparse.csr_matrix): TF-IDF assessment matrix
+            catalog_postings (scipy.sparse.csr_matrix): Term-major cosine postings
+            boost_features (scipy.sparse.csr_matrix): Boost feature matrix
+            penalty_flags (numpy.ndarray): Programming penalty flag per assessment
+            rules (CompiledRules, optional): Compiled boost rules the index was built with
+            cache (QueryCache, optional): Cache for per-query score vectors
+            vectorizer (str): Vectorizer mode the index was built with
+            vectorizer_options (dict, optional): Settings of that mode
+            ranking (str): Default lexical scoring, one of RANKINGS
+            candidate_depth (int, optional): Assessments reranked per query
+            dynamic_pruning (bool): Find the lexical candidates with MaxScore
+            lsa_index (LSAIndex, optional): Dense index the artifact was built with
+            nprobe (int, optional): IVF clusters scored per query with the 'lsa' ranking
+            feature_postings (scipy.sparse.csr_matrix, optional): Transpose of the boost feature matrix
+            field_cache (AssessmentFieldCache, optional): Field cache of the catalog
+            facet_index (FacetIndex, optional): Facet bitmaps of the catalog
+            version (str, optional): Catalog version the index was built for
+            bm25_index (BM25Index, optional): BM25F index of the catalog, built when not given
+            
+        Returns:
+            NLPProcessor: Ready-to-query processor
+        """
+        processor = cls.__new__(cls)
+        processor.logger = logging.getLogger(__name__)
+        processor.assessments = assessments
+        processor.cache = cache
+        processor.vectorizer_mode = vectorizer
+        processor.vectorizer_options = dict(vectorizer_options or {})
+        processor.index_dtype = catalog_postings.dtype
+        cls._check_ranking(ranking)
+        processor.ranking = ranking
+        processor.candidate_depth = candidate_depth
+        processor.dynamic_pruning = dynamic_pruning
+        processor.nprobe = nprobe
+        processor.rules = rules if rules is not None else load_rules()
+        processor.vectorizer = None
+        processor.query_vectorizer = query_vectorizer
+        processor.assessment_vectors = assessment_vectors
+        processor.catalog_postings = catalog_postings
+        processor.lsa_index = lsa_index
+        processor._check_available(ranking)
+        processor._build_catalog_indexes(boost_features, penalty_flags, feature_postings,
+                                         field_cache, facet_index, version, bm25_index)
+        return processor
+    
+    @staticmethod
+    def _assessment_text(assessment):
+        """
+        Combine the fields of an assessment into the text that gets vectorized.
+        
+        Args:
+            assessment (dict): Assessment dictionary
+            
+        Returns:
+            str: Combined text
+        """
+        name = assessment.get('name', '')
+        description = assessment.get('description', '')
+        skills = assessment.get('skills', '')
+        type_info = assessment.get('type', '')
+        
+        # Weight important fields more by repeating them
+        # This ensures more relevant matches for critical fields like name and skills
+        return f"{name} {name} {description} {skills} {skills} {type_info}"
+    
+    @property
+    def catalog_size(self):
+        """
+        Number of assessments, not counting deleted ones.
+        """
+        return self.delta.live_count if self.delta is not None else len(self.assessments)
+    
+    @property
+    def idf_drift(self):
+        """
+        Drift of the catalog IDF since the fit, 0 when nothing was updated.
+        """
+        return self.delta.drift if self.delta is not None else 0.0
+    
+    def apply_updates(self, upserts=(), deletes=()):
+        """
+        Upsert and delete individual assessments without refitting.
+        
+        Changed assessments are vectorized with the fitted vocabulary and
+        IDF, and the facet bitmaps and boost features are updated for them
+        only. The processor itself is not modified: a new processor sharing
+        the fitted index is returned, so requests running on this one are
+        not affected and the caller swaps the new one in. BM25F scores of
+        changed assessments come from a delta segment as well.
+        
+        Args:
+            upserts (list): Assessment dictionaries; one with an existing
+                'id' replaces that assessment, others are added
+            deletes (list): Ids of assessments to retire
+            
+        Returns:
+            NLPProcessor: Processor serving the updated catalog
+        """
+        delta = CatalogDelta.apply(self, upserts, deletes)
+        processor = copy.copy(self)
+        processor.delta = delta
+        processor.assessments = delta.catalog
+        processor.facet_index = delta.facet_index
+        processor.catalog_version = delta.version
+        self.logger.info(
+            f"Applied {len(upserts)} upserts and {len(deletes)} deletes, "
+            f"{delta.live_count} assessments, IDF drift {delta.drift:.3f}")
+        return processor
+    
+    def upsert_assessments(self, assessments):
+        """
+        Add or replace assessments; see ``apply_updates``.
+        """
+        return self.apply_updates(upserts=assessments)
+    
+    def delete_assessments(self, assessment_ids):
+        """
+        Retire assessments by id; see ``apply_updates``.
+        """
+        return self.apply_updates(deletes=assessment_ids)
+    
+    def live_assessments(self):
+        """
+        List of the current (not deleted) assessments, e.g. for a refit.
+        """
+        if self.delta is None:
+            return list(self.assessments)
+        deleted = self.delta.deleted
+        return [a for i, a in enumerate(self.assessments) if i not in deleted]
+    
+    def catalog_changes(self, assessments):
+        """
+        Upserts and deletes that turn the current catalog into another one.
+        
+        The result is what ``apply_updates`` needs to serve ``assessments``
+        with the same row order a refit would give, e.g. after another
+        process changed the catalog file.
+        
+        Args:
+            assessments (list): The target catalog
+            
+        Returns:
+            tuple or None: (upserts, deletes), None when the target cannot be
+                reached incrementally: an assessment without an id, a
+                duplicated id, kept assessments in a different order or new
+                assessments before kept ones
+        """
+        current = self.live_assessments()
+        current_ids = [a.get('id') for a in current]
+        ids = [a.get('id') for a in assessments]
+        for id_list in (current_ids, ids):
+            if None in id_list or len(set(id_list)) != len(id_list):
+                return None
+        
+        target_ids = set(ids)
+        kept = [assessment_id for assessment_id in current_ids if assessment_id in target_ids]
+        if ids[:len(kept)] != kept:
+            return None
+        
+        known = dict(zip(current_ids, current))
+        upserts = [a for a in assessments if known.get(a['id']) != a]
+        deletes = [assessment_id for assessment_id in current_ids if assessment_id not in target_ids]
+        return upserts, deletes
     
     def _preprocess_text(self, text):
         """
@@ -120,202 +474,384 @@ class NLPProcessor:
         
         return text
     
-    def get_recommendations(self, job_description, top_k=10, test_type=None, 
-                           remote_available=None, adaptive_testing=None):
+    @staticmethod
+    def normalize_query(job_description):
         """
-        Get recommended assessments for a job description.
+        Normalize a job description for scoring and cache lookups.
+        
+        Only changes that cannot affect any score are applied: scoring is
+        case-insensitive and ignores leading and trailing whitespace.
         
         Args:
             job_description (str): The job description text
-            top_k (int): Number of recommendations to return
-            test_type (str, optional): Filter by test type
-            remote_available (bool, optional): Filter by remote availability
-            adaptive_testing (bool, optional): Filter by adaptive testing feature
             
         Returns:
-            list: Recommended assessments with similarity scores
+            str: Normalized job description
         """
-        try:
-            # Preprocess job description
-            processed_job_description = self._preprocess_text(job_description)
-            
-            # Transform job description using the same vectorizer
-            job_vector = self.vectorizer.transform([processed_job_description])
-            
-            # Calculate cosine similarity between job description and all assessments
-            similarity_matrix = cosine_similarity(job_vector, self.assessment_vectors)
-            
-            # Get similarity scores (first row contains all scores)
-            similarity_scores = similarity_matrix[0]
+        return job_description.strip().lower()
+    
+    def _compute_scores(self, job_descriptions, ranking='cosine'):
+        """
+        Compute the boosted relevance score of every assessment for a batch of queries.
+        
+        With cosine ranking queries are vectorized with the fitted vocabulary
+        and scored against the catalog postings, in one sparse product for a
+        batch; with BM25 ranking only the postings of the query terms are read;
+        with LSA ranking the query vectors are projected and the batch is
+        scored with one dense matrix product.
+        
+        Args:
+            job_descriptions (list): Normalized job descriptions
+            ranking (str): Lexical scoring, one of RANKINGS
             
-            # Create list of (index, score) tuples and sort by score (descending)
-            similarities = [(i, float(score)) for i, score in enumerate(similarity_scores)]
+        Returns:
+            numpy.ndarray: Scores of shape (queries, assessments)
+        """
+        # Preprocess job descriptions
+        processed_job_descriptions = [self._preprocess_text(text) for text in job_descriptions]
+        
+        depth = self.candidate_depth
+        if self.dynamic_pruning and depth and depth < self.catalog_postings.shape[1] and ranking != 'lsa':
+            scores, lexical = self._pruned_scores(processed_job_descriptions, job_descriptions, ranking)
+            if self.delta is not None:
+                scores = self.delta.overlay_scores(
+                    scores, processed_job_descriptions, job_descriptions, self.query_vectorizer, lexical)
+            return scores
+        
+        if ranking == 'bm25':
+            similarity_matrix = self.bm25_index.scores(job_descriptions)
+            lexical = None
+            if self.delta is not None:
+                # Changed assessments are scored by the BM25F delta segment
+                lexical = self.delta.bm25.scores(job_descriptions)
+        elif ranking == 'lsa':
+            # One float32 matrix product with the dense assessment vectors,
+            # or with those of the closest IVF clusters
+            query_vectors = self.query_vectorizer.transform(processed_job_descriptions)
+            similarity_matrix = self.lsa_index.similarity(query_vectors, nprobe=self.nprobe)
+            lexical = None
+            if self.delta is not None:
+                # Changed assessments are projected with the fitted SVD
+                lexical = self.lsa_index.similarity(query_vectors, self.lsa_index.embed(self.delta.matrix))
+        else:
+            # Vectorize with the fitted vocabulary and take the cosine
+            # similarity with all assessments
+            lexical = None
+            similarity_matrix = self.query_vectorizer.similarity(
+                processed_job_descriptions, self.catalog_postings)
+        
+        if depth and depth < similarity_matrix.shape[1]:
+            scores = self._rerank_candidates(similarity_matrix, job_descriptions)
+        else:
+            # Add keyword, category and role boosts for the whole catalog at once
+            scores = similarity_matrix + self.boost_engine.compute_boosts_batch(job_descriptions).T
+        
+        if self.delta is not None:
+            scores = self.delta.overlay_scores(
+                scores, processed_job_descriptions, job_descriptions, self.query_vectorizer, lexical)
+        return scores
+    
+    def _rerank_candidates(self, similarity_matrix, job_descriptions):
+        """
+        Two-stage scoring: apply the boosts to a bounded candidate set only.
+        
+        The candidates of a query are its ``candidate_depth`` best assessments
+        by lexical similarity (those with any overlap) plus its
+        ``candidate_depth`` best assessments by keyword, category and role
+        rule boost, read from the rule feature postings. The full boosts and
+        penalties are computed for the candidates only; the other assessments
+        keep their lexical score. Candidates are chosen per query, so a query
+        scores the same alone and in a batch.
+        
+        Args:
+            similarity_matrix (numpy.ndarray): Lexical scores of shape (queries, assessments)
+            job_descriptions (list): Normalized job descriptions
             
-            # Extract key terms from job description for boosting using more sophisticated approach
-            job_description_lower = job_description.lower()
+        Returns:
+            numpy.ndarray: Scores of shape (queries, assessments)
+        """
+        engine = self.boost_engine
+        feature_weights, job_term_sets, penalized = engine.query_features(job_descriptions)
+        scores = np.array(similarity_matrix, dtype=np.float64)
+        depth = self.candidate_depth
+        stale = self.delta.stale_rows if self.delta is not None else None
+        for j, job_description in enumerate(job_descriptions):
+            similarity = similarity_matrix[j]
+            if stale is not None and len(stale):
+                # Deleted and replaced rows are overlaid later; keep them out of the candidates
+                similarity = similarity.copy()
+                similarity[stale] = 0
+            top = np.argpartition(-similarity, depth - 1)[:depth]
+            top = top[similarity[top] > 0]
+            rows = np.union1d(top, engine.rule_hits(feature_weights[:, j], depth, stale))
+            boosts = engine.compute_boosts_batch(
+                [job_description], rows,
+                (feature_weights[:, j:j + 1], job_term_sets[j:j + 1], penalized[j:j + 1]))
+            scores[j, rows] += boosts[:, 0]
+        return scores
+    
+    def _lexical_query(self, job_description, processed_job_description, ranking):
+        """
+        Inverted index and query terms of one query for dynamic pruning.
+        
+        Args:
+            job_description (str): Normalized job description
+            processed_job_description (str): The same, preprocessed
+            ranking (str): Lexical scoring, one of RANKINGS
             
-            # Define domain-specific categories and their associated keywords
-            skill_categories = {
-                'programming': ['java', 'python', 'javascript', 'c++', 'c#', '.net', 'ruby', 'php', 'go', 'rust', 'scala', 'perl', 'assembly', 'swift', 'kotlin', 'dart', 'typescript', 'html', 'css', 'sql', 'nosql', 'r', 'matlab', 'programming', 'coding', 'developer', 'software', 'web', 'mobile', 'frontend', 'backend', 'fullstack', 'algorithm', 'data structure'],
-                'frameworks': ['spring', 'react', 'angular', 'vue', 'django', 'flask', 'laravel', 'express', 'node', 'rails', 'hibernate', 'bootstrap', 'jquery', '.net', 'aspnet', 'symfony', 'ember', 'gatsby', 'nextjs', 'nuxtjs', 'flutter'],
-                'data': ['database', 'sql', 'mysql', 'postgresql', 'oracle', 'mongodb', 'nosql', 'redis', 'cassandra', 'elasticsearch', 'data', 'analytics', 'big data', 'hadoop', 'spark', 'etl', 'tableau', 'power bi', 'data lake', 'data warehouse', 'bi', 'business intelligence'],
-                'cloud': ['aws', 'azure', 'gcp', 'cloud', 'docker', 'kubernetes', 'serverless', 'lambda', 'ec2', 's3', 'microservices', 'devops', 'cicd', 'jenkins', 'terraform', 'iaas', 'paas', 'saas'],
-                'ai_ml': ['machine learning', 'artificial intelligence', 'ai', 'ml', 'deep learning', 'neural network', 'nlp', 'natural language processing', 'computer vision', 'data science', 'tensorflow', 'pytorch', 'scikit-learn', 'keras', 'regression', 'classification', 'clustering'],
-                'sales': ['sales', 'marketing', 'customer', 'account', 'business development', 'client', 'revenue', 'lead', 'pipeline', 'crm', 'salesforce', 'hubspot', 'closing', 'negotiation', 'pitch', 'presentation', 'relationship', 'solution selling', 'b2b', 'b2c', 'retail'],
-                'management': ['manager', 'management', 'lead', 'leadership', 'supervisor', 'director', 'executive', 'ceo', 'cto', 'coo', 'cfo', 'vp', 'head', 'chief', 'project manager', 'program manager', 'scrum master', 'agile', 'team lead'],
-                'finance': ['accounting', 'finance', 'financial', 'investment', 'banking', 'trading', 'audit', 'tax', 'budget', 'forecast', 'analysis', 'capital', 'risk', 'compliance', 'regulation', 'portfolio', 'bank', 'banker', 'loan', 'credit', 'debit', 'transaction', 'deposit', 'withdrawal', 'interest', 'mortgage', 'payment'],
-                'hr': ['hr', 'human resources', 'talent', 'recruitment', 'recruiting', 'hiring', 'onboarding', 'training', 'development', 'performance', 'compensation', 'benefits', 'employee', 'workforce', 'culture', 'diversity', 'inclusion'],
-                'design': ['design', 'ux', 'ui', 'user experience', 'user interface', 'graphic', 'visual', 'creative', 'art', 'illustrator', 'photoshop', 'sketch', 'figma', 'adobe', 'wireframe', 'prototype', 'accessibility'],
-                'administrative': ['administrative', 'admin', 'assistant', 'clerk', 'receptionist', 'secretary', 'office', 'document', 'filing', 'paperwork', 'correspondence', 'data entry', 'typing', 'word processing', 'spreadsheet', 'scheduling', 'calendar', 'meeting', 'minute taking', 'phone', 'email', 'customer service', 'support', 'clerical', 'organization'],
-                'marketing': ['seo', 'search engine optimization', 'digital marketing', 'google analytics', 
-                'content marketing', 'sem', 'ppc', 'keyword research', 'marketing strategy'],
-                 'communication': [  'communication', 'english', 'verbal ability', 'written communication', 'presentation', 'grammar', 'fluency', 'spoken english'],
-                 'hr': ['human resources', 'hr', 'recruiting', 'talent acquisition', 'employee engagement','training', 'learning and development', 'payroll', 'onboarding', ],
-                 'customer_service': [  'customer service', 'call center', 'bpo', 'voice process', 'client support','service desk', 'telecalling', 'inbound', 'outbound', 'support executive'],
-                 'finance': [ 'accounting', 'finance', 'bookkeeping', 'ledger', 'invoice', 'audit', 'balance sheet', 'tax', 'payable', 'receivable', 'tally', 'ca', 'cpa'],
-                 'administration': [ 'administrative', 'office assistant', 'clerical', 'filing', 'data entry', 'records', 'scheduling', 'calendar', 'microsoft office', 'ms word', 'ms excel'],
-            }
+        Returns:
+            tuple: (InvertedIndex, term rows, weight per term, divisor of the
+                summed scores)
+        """
+        if ranking == 'bm25':
+            bm25 = self.bm25_index
+            terms = np.array(bm25.query_terms(job_description), dtype=np.int64)
+            norm = bm25.query_norm(terms) if len(terms) else 1.0
+            return bm25.inverted_index, terms, np.ones(len(terms)), norm
+        terms, weights = self.query_vectorizer.cosine_query(processed_job_description)
+        return self.inverted_index, terms, weights, 1.0
+    
+    def _pruned_scores(self, processed_job_descriptions, job_descriptions, ranking):
+        """
+        Two-stage scoring with a dynamically pruned first stage.
+        
+        Like ``_rerank_candidates``, but the ``candidate_depth`` best
+        assessments by lexical score are found with MaxScore over the
+        inverted index (cosine postings or BM25F postings), which reads only
+        part of the posting lists of long queries instead of scoring every
+        assessment. The lexical scores of the candidates are then read from
+        their postings in term order, so they equal the exhaustive scores;
+        assessments outside the candidates are not scored and get 0.
+        
+        Args:
+            processed_job_descriptions (list): Preprocessed job descriptions
+            job_descriptions (list): Normalized job descriptions
+            ranking (str): Lexical scoring, one of RANKINGS
             
-            # Create a flattened set of all keywords for basic matching
-            all_keywords = set()
-            for category_keywords in skill_categories.values():
-                all_keywords.update(category_keywords)
+        Returns:
+            tuple: (scores of shape (queries, base assessments), lexical
+                scores of the delta rows with BM25 ranking, else None)
+        """
+        engine = self.boost_engine
+        feature_weights, job_term_sets, penalized = engine.query_features(job_descriptions)
+        size = self.catalog_postings.shape[1]
+        depth = self.candidate_depth
+        scores = np.zeros((len(job_descriptions), size))
+        lexical = None
+        stale = None
+        if self.delta is not None:
+            stale = self.delta.stale_rows
+            if ranking == 'bm25':
+                lexical = self.delta.bm25.scores(job_descriptions)
+        
+        for j, job_description in enumerate(job_descriptions):
+            index, terms, weights, norm = self._lexical_query(
+                job_description, processed_job_descriptions[j], ranking)
+            top, _ = index.top_k(terms, weights, depth, stale)
+            top = top[top < size]
+            rows = np.union1d(top, engine.rule_hits(feature_weights[:, j], depth, stale))
+            if len(rows):
+                boosts = engine.compute_boosts_batch(
+                    [job_description], rows,
+                    (feature_weights[:, j:j + 1], job_term_sets[j:j + 1], penalized[j:j + 1]))
+                scores[j, rows] = index.scores_for(terms, weights, rows) / norm + boosts[:, 0]
+        return scores, lexical
+    
+    def score_query(self, job_description, ranking=None):
+        """
+        Get the boosted relevance score of every assessment for a query.
+        
+        The full score vector is cached per catalog version, ranking and
+        normalized query, independently of filters and top_k, so every slice
+        of the same query reuses one scoring pass.
+        
+        Args:
+            job_description (str): The job description text
+            ranking (str, optional): Lexical scoring, the processor default when not given
             
-            # Identify categories present in the job description
-            job_categories = {}
-            for category, keywords in skill_categories.items():
-                category_match_count = 0
-                for keyword in keywords:
-                    if keyword in job_description_lower:
-                        category_match_count += 1
-                if category_match_count > 0:
-                    job_categories[category] = category_match_count
+        Returns:
+            numpy.ndarray: Read-only score per assessment
+        """
+        return self.score_queries([job_description], ranking)[0]
+    
+    def score_queries(self, job_descriptions, ranking=None):
+        """
+        Get the boosted relevance scores of every assessment for several queries.
+        
+        Cached queries are reused; the remaining distinct queries are scored
+        together in one batch.
+        
+        Args:
+            job_descriptions (list): Job description texts
+            ranking (str, optional): Lexical scoring, the processor default when not given
             
-            # Extract basic job terms (words) for simple matching
-            job_terms = set(job_description_lower.split())
+        Returns:
+            list: Read-only score vector per query, in input order
+        """
+        ranking = ranking or self.ranking
+        self._check_available(ranking)
+        normalized = [self.normalize_query(text) for text in job_descriptions]
+        scores = [None] * len(normalized)
+        
+        # Look up the cache and group the misses by distinct query
+        missing = {}
+        for i, text in enumerate(normalized):
+            cached = self.cache.get((self.catalog_version, ranking, text)) if self.cache is not None else None
+            if cached is not None:
+                scores[i] = cached
+            else:
+                missing.setdefault(text, []).append(i)
+        
+        if missing:
+            computed = self._compute_scores(list(missing), ranking)
+            for row, (text, positions) in zip(computed, missing.items()):
+                row = row.copy()
+                row.setflags(write=False)
+                if self.cache is not None:
+                    self.cache.put((self.catalog_version, ranking, text), row)
+                for i in positions:
+                    scores[i] = row
+        
+        return scores
+    
+    @staticmethod
+    def _facet_filters(test_type=None, remote_available=None, adaptive_testing=None,
+                       duration=None):
+        """
+        Map filter arguments to facet fields; None marks an inactive filter.
+        """
+        return {
+            'type': test_type or None,
+            'remote_available': remote_available,
+            'adaptive_testing': adaptive_testing,
+            'duration': duration or None,
+        }
+    
+    def get_facet_counts(self, test_type=None, remote_available=None, adaptive_testing=None,
+                         duration=None):
+        """
+        Count how many assessments each filter value would leave.
+        
+        Every facet is counted under the other active filters, so the UI can
+        show the effect of changing one filter without another query.
+        
+        Args:
+            test_type (str, optional): Active test type filter
+            remote_available (bool, optional): Active remote availability filter
+            adaptive_testing (bool, optional): Active adaptive testing filter
+            duration (str, optional): Active duration bucket filter
             
-            # Boost assessments that match key skills or terms in the job description
-            for i, (idx, score) in enumerate(similarities):
-                assessment = self.assessments[idx]
-                boost = 0
-                
-                # Get assessment text fields for matching
-                skills = assessment.get('skills', '').lower()
-                name = assessment.get('name', '').lower()
-                description = assessment.get('description', '').lower()
-                assessment_text = f"{name} {description} {skills}"
-                
-                # Basic term matching (small boost)
-                term_matches = sum(1 for term in job_terms if len(term) > 3 and term in assessment_text)
-                boost += term_matches * 0.02  # Small boost per term match
-                
-                # Category matching (larger boost based on relevance)
-                for category, count in job_categories.items():
-                    category_match_score = 0
-                    for keyword in skill_categories[category]:
-                        if keyword in assessment_text:
-                            category_match_score += 0.05  # Boost for each keyword match in important categories
-                    
-                    # Scale the boost based on category relevance in job description
-                    boost += category_match_score * (count / len(skill_categories[category]))
-                
-                # Extra boost for exact category matches
-                for category in job_categories:
-                    if category.lower() in assessment_text:
-                        boost += 0.3  # Strong boost for direct category mention
-                
-                # Special cases - highly specific term matching for key terms
-                # These are direct matches that should strongly influence results
-                key_exact_matches = {
-                    'java developer': ['java', 'core java'],
-                    'python developer': ['python', 'coding assessment for python'],
-                    'data scientist': ['data science', 'machine learning', 'analytics'],
-                    'sales representative': ['sales aptitude', 'sales'],
-                    'project manager': ['project management', 'leadership'],
-                    'business analyst': ['business analyst', 'requirements analysis'],
-                    'ux designer': ['ux design', 'user experience'],
-                    'database administrator': ['database', 'sql'],
-                    'front end developer': ['front-end', 'html', 'css', 'javascript'],
-                    'mobile developer': ['mobile', 'ios', 'android', 'react native', 'flutter'],
-                    
-                    # Banking and administrative role matches
-                    'bank assistant': ['banking operations', 'administrative assistant', 'clerical ability', 'excel skills', 'attention to detail', 'data entry'],
-                    'administrative assistant': ['administrative assistant skills', 'clerical ability', 'office management', 'word processing', 'business correspondence'],
-                    'bank clerk': ['banking operations', 'clerical ability', 'attention to detail', 'financial literacy', 'data entry'],
-                    'bank teller': ['bank teller assessment', 'banking operations', 'cash handling', 'attention to detail'],
-                    'icici bank': ['banking operations', 'financial services aptitude', 'excel skills', 'administrative assistant', 'ethics and compliance'],
-                    
-                    # Additional banking role matches
-                    'bank administrative': ['banking operations', 'administrative assistant skills', 'clerical ability', 'basic computer skills'],
-                    'financial services': ['financial services aptitude', 'banking operations', 'accounting principles', 'financial literacy'],
-                    'customer service representative': ['customer service assessment', 'call center assessment', 'communication skills'],
-                    'admin': ['administrative assistant skills', 'clerical ability', 'attention to detail', 'filing and records management'],
-                    'assistant': ['administrative assistant skills', 'administrative multitasking', 'word processing', 'basic computer skills'],
-                    'bank operations': ['banking operations', 'financial services aptitude', 'ethics and compliance'],
-                    
-                    # Leadership and management roles
-                    'manager': ['leadership competency', 'project management', 'situational judgement', 'personality assessment'],
-                    'team lead': ['leadership competency', 'situational judgement', 'personality assessment'],
-                    'lead': ['leadership competency', 'project management', 'situational judgement'],
-                    'sales manager': ['sales aptitude', 'leadership competency', 'project management'],
-                    'sales lead': ['sales aptitude', 'leadership competency', 'situational judgement'],
-                    'management': ['leadership competency', 'project management', 'situational judgement']
-                }
-                
-                for role, match_terms in key_exact_matches.items():
-                    if role in job_description_lower:
-                        for term in match_terms:
-                            if term in assessment_text:
-                                boost += 0.5  # Very strong boost for direct role-specific matches
-                
-                # Apply domain-specific penalties
-                # For banking and administrative roles, penalize programming assessments
-                if ('bank' in job_description_lower or 'administrative' in job_description_lower or 
-                    'admin' in job_description_lower or 'assistant' in job_description_lower or
-                    'clerk' in job_description_lower):
-                    if ('python' in name or 'java' in name or 'coding' in name or 
-                        'programming' in name or 'developer' in name):
-                        boost -= 2.0  # Strong penalty for programming assessments
-                
-                # Apply the boost
-                similarities[i] = (idx, score + boost)
+        Returns:
+            dict: Facet field -> list of {"value", "count"} entries
+        """
+        return self.facet_index.counts(
+            self._facet_filters(test_type, remote_available, adaptive_testing, duration))
+    
+    @staticmethod
+    def _select_top_k(scores, top_k, mask=None):
+        """
+        Select the indices of the highest scores without sorting the whole catalog.
+        
+        Uses partial selection (np.partition) and only sorts the selected
+        items. Ties are broken by catalog order, so results are deterministic
+        and identical to a stable full sort.
+        
+        Args:
+            scores (numpy.ndarray): Score per assessment
+            top_k (int): Number of indices to return (at least one is returned)
+            mask (numpy.ndarray, optional): Assessments eligible for selection
             
-            # Sort by adjusted scores
-            similarities.sort(key=lambda x: x[1], reverse=True)
+        Returns:
+            numpy.ndarray: Selected indices, best first
+        """
+        candidates = np.flatnonzero(mask) if mask is not None else np.arange(len(scores))
+        candidate_scores = scores[candidates]
+        k = max(int(top_k), 1)
+        
+        if k < len(candidates):
+            # k-th best score; everything above it is in, ties fill the rest by index
+            threshold = -np.partition(-candidate_scores, k - 1)[k - 1]
+            above = np.flatnonzero(candidate_scores > threshold)
+            ties = np.flatnonzero(candidate_scores == threshold)[:k - len(above)]
+            selected = np.concatenate([above, ties])
+            candidates = candidates[selected]
+            candidate_scores = candidate_scores[selected]
+        
+        order = np.lexsort((candidates, -candidate_scores))
+        return candidates[order]
+    
+    def _build_recommendations(self, scores, top_k=10, test_type=None, remote_available=None,
+                               adaptive_testing=None, duration=None):
+        """
+        Turn a catalog score vector into a filtered, ranked recommendation list.
+        
+        Args:
+            scores (numpy.ndarray): Score per assessment
+            top_k (int): Number of recommendations to return
+            test_type (str, optional): Filter by test type
+            remote_available (bool, optional): Filter by remote availability
+            adaptive_testing (bool, optional): Filter by adaptive testing feature
+            duration (str, optional): Filter by duration bucket
             
-            # Filter and prepare results
-            recommendations = []
-            max_score = max([score for _, score in similarities]) if similarities else 1
+        Returns:
+            list: Recommended assessments with similarity scores
+        """
+        # Apply filters as a mask before selection, then pick the top-k
+        filter_mask = self.facet_index.mask(self._facet_filters(
+            test_type, remote_available, adaptive_testing, duration))
+        live = self.delta.live if self.delta is not None else None
+        if live is not None:
+            filter_mask = live if filter_mask is None else filter_mask & live
+        top_indices = self._select_top_k(scores, top_k, filter_mask)
+        
+        # Prepare results
+        recommendations = []
+        max_score = float(scores.max()) if len(scores) else 1
+        
+        for i in top_indices:
+            # Add similarity score to assessment (normalize to 0-1 range)
+            assessment_copy = self.assessments[i].copy()
+            normalized_score = float(scores[i]) / max_score if max_score > 0 else 0
+            assessment_copy['similarity_score'] = normalized_score
+            assessment_copy['similarity'] = normalized_score  # For v1/recommend endpoint
+            recommendations.append(assessment_copy)
+        
+        # Ensure at least one recommendation if available
+        if not recommendations and self.catalog_size:
+            # If no matches found but we have assessments, return the first one
+            first = int(np.argmax(live)) if live is not None else 0
+            assessment_copy = self.assessments[first].copy()
+            assessment_copy['similarity_score'] = 0.0
+            assessment_copy['similarity'] = 0.0
+            recommendations.append(assessment_copy)
+        
+        return recommendations
+    
+    def get_recommendations(self, job_description, top_k=10, test_type=None, 
+                           remote_available=None, adaptive_testing=None, duration=None,
+                           ranking=None):
+        """
+        Get recommended assessments for a job description.
+        
+        Args:
+            job_description (str): The job description text
+            top_k (int): Number of recommendations to return
+            test_type (str, optional): Filter by test type
+            remote_available (bool, optional): Filter by remote availability
+            adaptive_testing (bool, optional): Filter by adaptive testing feature
+            duration (str, optional): Filter by duration bucket (e.g. '21-30')
+            ranking (str, optional): Lexical scoring ('cosine', 'bm25' or 'lsa'), the
+                processor default when not given
             
-            for i, similarity in similarities:
-                assessment = self.assessments[i]
-                
-                # Apply filters if specified
-                if test_type and assessment.get('type') != test_type:
-                    continue
-                if remote_available is not None and assessment.get('remote_available') != remote_available:
-                    continue
-                if adaptive_testing is not None and assessment.get('adaptive_testing') != adaptive_testing:
-                    continue
-                
-                # Add similarity score to assessment (normalize to 0-1 range)
-                assessment_copy = assessment.copy()
-                normalized_score = float(similarity) / max_score if max_score > 0 else 0
-                assessment_copy['similarity_score'] = normalized_score
-                assessment_copy['similarity'] = normalized_score  # For v1/recommend endpoint
-                recommendations.append(assessment_copy)
-                
-                # Break when we have enough recommendations
-                if len(recommendations) >= top_k:
-                    break
+        Returns:
+            list: Recommended assessments with similarity scores
+        """
+        try:
+            # Score the whole catalog (or reuse a cached scoring pass)
+            adjusted_scores = self.score_query(job_description, ranking)
             
-            # Ensure at least one recommendation if available
-            if not recommendations and self.assessments:
-                # If no matches found but we have assessments, return the first one
-                assessment_copy = self.assessments[0].copy()
-                assessment_copy['similarity_score'] = 0.0
-                assessment_copy['similarity'] = 0.0
-                recommendations.append(assessment_copy)
+            recommendations = self._build_recommendations(
+                adjusted_scores, top_k, test_type, remote_available, adaptive_testing, duration)
             
             self.logger.info(f"Found {len(recommendations)} recommendations for job description")
             return recommendations
@@ -323,3 +859,60 @@ class NLPProcessor:
         except Exception as e:
             self.logger.error(f"Error getting recommendations: {e}")
             raise
+    
+    def get_recommendations_batch(self, queries, batch_size=64):
+        """
+        Get recommendations for many job descriptions at once.
+        
+        Queries are scored in micro-batches of ``batch_size`` with one sparse
+        product per batch. A failure only affects its own item: if a batch
+        cannot be scored together its items are retried one by one.
+        
+        Args:
+            queries (list): Dictionaries with a 'job_description' and any of
+                the get_recommendations keyword arguments (top_k, test_type,
+                remote_available, adaptive_testing, duration, ranking)
+            batch_size (int): Number of queries scored together
+            
+        Returns:
+            list: Per query, in input order, either {"recommendations": [...]}
+                or {"error": "..."}
+        """
+        results = [None] * len(queries)
+        pending = []
+        for i, query in enumerate(queries):
+            job_description = query.get('job_description')
+            if not isinstance(job_description, str) or not job_description.strip():
+                results[i] = {"error": "Job description is required"}
+            else:
+                pending.append(i)
+        
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            
+            # Items asking for the same ranking are scored together
+            groups = {}
+            for i in batch:
+                groups.setdefault(queries[i].get('ranking'), []).append(i)
+            batch_scores = {}
+            for ranking, items in groups.items():
+                try:
+                    texts = [queries[i]['job_description'] for i in items]
+                    batch_scores.update(zip(items, self.score_queries(texts, ranking)))
+                except Exception as e:
+                    self.logger.warning(f"Batch scoring failed, retrying items one by one: {e}")
+            
+            for i in batch:
+                options = {key: value for key, value in queries[i].items()
+                           if key not in ('job_description', 'ranking')}
+                try:
+                    scores = batch_scores.get(i)
+                    if scores is None:
+                        scores = self.score_query(queries[i]['job_description'], queries[i].get('ranking'))
+                    results[i] = {"recommendations": self._build_recommendations(scores, **options)}
+                except Exception as e:
+                    self.logger.error(f"Error getting recommendations for batch item {i}: {e}")
+                    results[i] = {"error": str(e)}
+        
+        self.logger.info(f"Processed batch of {len(queries)} job descriptions")
+        return results
@@ -0,0 +1,183 @@
+import bisect
+import json
+import os
+import zlib
+import numpy as np
+
+
+def save_packed_strings(directory, name, strings):
+    """
+    Write strings as one UTF-8 blob plus an offsets array.
+
+    Creates ``{name}_blob.npy`` (uint8) and ``{name}_offsets.npy`` (int64,
+    one more entry than there are strings).
+
+    Args:
+        directory (str): Target directory
+        name (str): File name prefix
+        strings (iterable): Strings to store, in order
+    """
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    np.save(os.path.join(directory, f"{name}_blob.npy"), blob)
+    np.save(os.path.join(directory, f"{name}_offsets.npy"), offsets)
+
+
+class PackedStrings:
+    """
+    Read-only sequence of strings backed by a memory-mapped UTF-8 blob.
+
+    Strings are decoded on access, so every process mapping the same files
+    shares one physical copy of the table instead of holding its own
+    Python string objects.
+    """
+
+    def __init__(self, directory, name, mmap_mode='r'):
+        """
+        Open a table written by ``save_packed_strings``.
+
+        Args:
+            directory (str): Directory holding the table
+            name (str): File name prefix
+            mmap_mode (str, optional): ``numpy.load`` mmap mode, None reads into memory
+        """
+        self.blob = np.load(os.path.join(directory, f"{name}_blob.npy"), mmap_mode=mmap_mode)
+        self.offsets = np.load(os.path.join(directory, f"{name}_offsets.npy"), mmap_mode=mmap_mode)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("packed string index out of range")
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        return self.blob[start:end].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def find(self, value):
+        """
+        Position of a string in a table stored in sorted order.
+
+        Args:
+            value (str): String to look up
+
+        Returns:
+            int: Index of the string, or -1 when it is not in the table
+        """
+        position = bisect.bisect_left(self, value)
+        if position < len(self) and self[position] == value:
+            return position
+        return -1
+
+
+def save_packed_vocabulary(directory, name, terms):
+    """
+    Write a term table with a hash index, for ``PackedVocabulary``.
+
+    Creates the packed strings of ``save_packed_strings`` plus
+    ``{name}_slots.npy``: an open-addressing table (linear probing, at
+    least twice as many slots as terms) holding the position of each term
+    at the slot of its CRC32 hash, -1 for empty slots.
+
+    Args:
+        directory (str): Target directory
+        name (str): File name prefix
+        terms (list): Distinct terms; a term's position is its id
+    """
+    save_packed_strings(directory, name, terms)
+    n_slots = 1
+    while n_slots < 2 * len(terms):
+        n_slots *= 2
+    slots = np.full(n_slots, -1, dtype=np.int64)
+    mask = n_slots - 1
+    for i, term in enumerate(terms):
+        slot = zlib.crc32(term.encode('utf-8')) & mask
+        while slots[slot] != -1:
+            slot = (slot + 1) & mask
+        slots[slot] = i
+    np.save(os.path.join(directory, f"{name}_slots.npy"), slots)
+
+
+class PackedVocabulary(PackedStrings):
+    """
+    Read-only term -> id mapping backed by memory-mapped files.
+
+    Stands in for a ``{term: id}`` dictionary (``get``, ``in``, ``len`` and
+    iteration over the terms in id order) without building one per process:
+    a lookup hashes the term and compares the UTF-8 bytes of the few terms
+    on its probe sequence.
+    """
+
+    def __init__(self, directory, name, mmap_mode='r'):
+        """
+        Open a table written by ``save_packed_vocabulary``.
+
+        Args:
+            directory (str): Directory holding the table
+            name (str): File name prefix
+            mmap_mode (str, optional): ``numpy.load`` mmap mode, None reads into memory
+        """
+        super().__init__(directory, name, mmap_mode)
+        self.slots = np.load(os.path.join(directory, f"{name}_slots.npy"), mmap_mode=mmap_mode)
+        self._mask = len(self.slots) - 1
+
+    def get(self, term, default=None):
+        """
+        Id of a term.
+
+        Args:
+            term (str): Term to look up
+            default: Value returned for an unknown term
+
+        Returns:
+            int: Position of the term in the table, or ``default``
+        """
+        encoded = term.encode('utf-8')
+        slots, offsets, blob = self.slots, self.offsets, self.blob
+        slot = zlib.crc32(encoded) & self._mask
+        while True:
+            index = int(slots[slot])
+            if index == -1:
+                return default
+            start, end = int(offsets[index]), int(offsets[index + 1])
+            if end - start == len(encoded) and blob[start:end].tobytes() == encoded:
+                return index
+            slot = (slot + 1) & self._mask
+
+    def __contains__(self, term):
+        return self.get(term) is not None
+
+
+class PackedCatalog(PackedStrings):
+    """
+    Read-only assessment list stored as one JSON document per entry.
+
+    Indexing decodes a fresh dictionary, so callers may modify what they
+    get without affecting the shared table.
+    """
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return json.loads(super().__getitem__(index))
+
+    @staticmethod
+    def save(directory, name, assessments):
+        """
+        Write an assessment list as a packed JSON table.
+
+        Args:
+            directory (str): Target directory
+            name (str): File name prefix
+            assessments (iterable): Assessment dictionaries
+        """
+        save_packed_strings(directory, name, (json.dumps(a) for a in assessments))
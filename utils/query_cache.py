@@ -0,0 +1,142 @@
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache with a memory budget and a time-to-live.
+
+    Entries are evicted least-recently-used first whenever the total size
+    of the cached values goes over ``max_bytes``, and are dropped on access
+    once they are older than ``ttl`` seconds. Hit, miss, eviction and
+    expiration counters are kept for monitoring.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=600):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes (int): Memory budget for cached values; 0 disables caching
+            ttl (float): Seconds an entry stays valid; 0 or None means no expiry
+        """
+        self.logger = logging.getLogger(__name__)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def entry_size(key, value):
+        """
+        Approximate memory footprint of a cache entry in bytes.
+        """
+        size = sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key)
+        return size + getattr(value, 'nbytes', sys.getsizeof(value))
+
+    def get(self, key):
+        """
+        Look up a cached value.
+
+        Args:
+            key (tuple): Cache key
+
+        Returns:
+            The cached value, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, created = entry
+            if self.ttl and time.monotonic() - created > self.ttl:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Store a value, evicting least-recently-used entries to fit the budget.
+
+        Args:
+            key (tuple): Cache key
+            value: Value to cache; should not be mutated afterwards
+        """
+        size = self.entry_size(key, value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        """
+        Drop an entry; the caller must hold the lock.
+        """
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self, keep_version=None):
+        """
+        Drop cached entries, e.g. after the catalog was reloaded.
+
+        Args:
+            keep_version (str, optional): Keep entries whose key starts with
+                this catalog version; everything is dropped when not given
+        """
+        with self._lock:
+            stale = [key for key in self._entries
+                     if keep_version is None or key[0] != keep_version]
+            for key in stale:
+                self._remove(key)
+        if stale:
+            self.logger.info(f"Invalidated {len(stale)} cached queries")
+
+    def clear(self):
+        """
+        Drop every cached entry.
+        """
+        self.invalidate()
+
+    def stats(self):
+        """
+        Get cache counters.
+
+        Returns:
+            dict: Entry count, size, budget, TTL and hit/miss counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,382 @@
+import math
+import re
+import zlib
+import numpy as np
+import scipy.sparse as sp
+
+DEFAULT_TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+
+
+def _l2_normalize(values):
+    """
+    Divide a vector by its L2 norm in place.
+
+    The squares are summed left to right, exactly like scikit-learn's sparse
+    row normalization, so the result is bit-for-bit the same.
+    """
+    total = 0.0
+    for value in values:
+        total += value * value
+    if total != 0.0:
+        values /= math.sqrt(total)
+    return values
+
+
+def cosine_postings(assessment_vectors):
+    """
+    Turn the fitted assessment matrix into term-major cosine postings.
+
+    ``cosine_similarity`` re-normalizes both of its inputs on every call;
+    doing it once for the catalog and transposing gives a term -> assessment
+    matrix that a query can be scored against directly.
+
+    Args:
+        assessment_vectors (scipy.sparse.csr_matrix): TF-IDF assessment matrix,
+            float64 or float32; the postings keep its dtype
+
+    Returns:
+        scipy.sparse.csr_matrix: Normalized weights with one row per term
+    """
+    matrix = sp.csr_matrix(assessment_vectors, copy=True)
+    for i in range(matrix.shape[0]):
+        _l2_normalize(matrix.data[matrix.indptr[i]:matrix.indptr[i + 1]])
+    return matrix.T.tocsr()
+
+
+class QueryVectorizer:
+    """
+    Serving-path TF-IDF transform and cosine scoring for short queries.
+
+    Uses the fitted vocabulary and IDF weights directly: a query is
+    tokenized with the vectorizer's token pattern and stop words, its terms
+    are looked up in a dict and weighted, and the resulting sparse vector is
+    dotted against the catalog postings. Every floating point operation is
+    done in the same order as ``TfidfVectorizer.transform`` followed by
+    ``cosine_similarity``, so the scores are identical, without the input
+    validation and sparse matrix construction of the scikit-learn calls.
+    """
+
+    def __init__(self, vocabulary, idf, stop_words=(), token_pattern=DEFAULT_TOKEN_PATTERN,
+                 lowercase=True, sublinear_tf=False):
+        """
+        Initialize the transformer.
+
+        Args:
+            vocabulary (dict): Term -> column index
+            idf (numpy.ndarray): IDF weight per column; a float array (e.g. a
+                memory-mapped one) is used as is, without a private copy
+            stop_words (iterable): Terms dropped before the lookup
+            token_pattern (str): Regular expression selecting tokens
+            lowercase (bool): Lowercase queries before tokenizing
+            sublinear_tf (bool): Use 1 + log(tf) instead of raw term counts
+        """
+        self.vocabulary = vocabulary
+        idf = np.asarray(idf)
+        self.idf = idf if idf.dtype.kind == 'f' else idf.astype(np.float64)
+        self.stop_words = frozenset(stop_words)
+        self.token_pattern = token_pattern
+        self.lowercase = lowercase
+        self.sublinear_tf = sublinear_tf
+        self._token_re = re.compile(token_pattern)
+
+    @classmethod
+    def from_sklearn(cls, vectorizer):
+        """
+        Create a transformer from a fitted TfidfVectorizer.
+
+        Args:
+            vectorizer (TfidfVectorizer): Fitted vectorizer
+
+        Returns:
+            QueryVectorizer: Equivalent serving transformer
+        """
+        return cls(vectorizer.vocabulary_, vectorizer.idf_,
+                   stop_words=vectorizer.get_stop_words() or (),
+                   token_pattern=vectorizer.token_pattern,
+                   lowercase=vectorizer.lowercase,
+                   sublinear_tf=vectorizer.sublinear_tf)
+
+    @property
+    def config(self):
+        """
+        Tokenization settings, as stored next to a persisted index.
+        """
+        return {"token_pattern": self.token_pattern, "lowercase": self.lowercase,
+                "sublinear_tf": self.sublinear_tf}
+
+    def tokenize(self, text):
+        """
+        Split a text into the tokens the vectorizer would count.
+        """
+        if self.lowercase:
+            text = text.lower()
+        return [token for token in self._token_re.findall(text) if token not in self.stop_words]
+
+    def _term_counts(self, tokens):
+        """
+        Count the known tokens of a text per column.
+        """
+        counts = {}
+        vocabulary = self.vocabulary
+        for token in tokens:
+            column = vocabulary.get(token)
+            if column is not None:
+                counts[column] = counts.get(column, 0) + 1
+        return counts
+
+    def known(self, token):
+        """
+        Whether a token has a column in the fitted index.
+        """
+        return token in self.vocabulary
+
+    def transform_one(self, text):
+        """
+        TF-IDF vector of one text.
+
+        Args:
+            text (str): Preprocessed query text
+
+        Returns:
+            tuple: (column indices, L2-normalized weights), indices ascending
+        """
+        counts = self._term_counts(self.tokenize(text))
+        indices = np.array(sorted(counts), dtype=np.int64)
+        values = np.array([counts[column] for column in indices], dtype=np.float64)
+        if self.sublinear_tf:
+            np.log(values, values)
+            values += 1.0
+        values *= self.idf[indices]
+        return indices, _l2_normalize(values)
+
+    def cosine_query(self, text):
+        """
+        Query vector with the weights ``cosine_scores`` multiplies the postings by.
+
+        Args:
+            text (str): Preprocessed query text
+
+        Returns:
+            tuple: (column indices, weights), indices ascending
+        """
+        indices, values = self.transform_one(text)
+        return indices, _l2_normalize(values)
+
+    def transform(self, texts):
+        """
+        TF-IDF matrix of several texts.
+
+        Args:
+            texts (list): Preprocessed query texts
+
+        Returns:
+            scipy.sparse.csr_matrix: One L2-normalized row per text
+        """
+        rows = [self.transform_one(text) for text in texts]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(indices) for indices, _ in rows])
+        indices = np.concatenate([indices for indices, _ in rows]) if rows else np.zeros(0, np.int64)
+        data = np.concatenate([values for _, values in rows]) if rows else np.zeros(0)
+        return sp.csr_matrix((data, indices, indptr), shape=(len(rows), len(self.idf)))
+
+    @staticmethod
+    def cosine_scores(indices, values, postings):
+        """
+        Cosine similarity of one query vector with every assessment.
+
+        Args:
+            indices (numpy.ndarray): Query column indices, ascending
+            values (numpy.ndarray): Query weights
+            postings (scipy.sparse.csr_matrix): Output of ``cosine_postings``
+
+        Returns:
+            numpy.ndarray: Similarity per assessment
+        """
+        # Normalizing an already normalized vector can still move the last
+        # bit, and cosine_similarity does it, so do it here as well
+        values = _l2_normalize(values.copy())
+        scores = np.zeros(postings.shape[1])
+        indptr, docs, weights = postings.indptr, postings.indices, postings.data
+        for column, value in zip(indices, values):
+            start, end = indptr[column], indptr[column + 1]
+            scores[docs[start:end]] += value * weights[start:end]
+        return scores
+
+    def similarity(self, texts, postings):
+        """
+        Cosine similarity of several texts with every assessment.
+
+        Args:
+            texts (list): Preprocessed query texts
+            postings (scipy.sparse.csr_matrix): Output of ``cosine_postings``
+
+        Returns:
+            numpy.ndarray: Similarities of shape (texts, assessments)
+        """
+        if len(texts) == 1:
+            indices, values = self.transform_one(texts[0])
+            return self.cosine_scores(indices, values, postings)[np.newaxis, :]
+
+        # One sparse product for a batch; it accumulates in the same order
+        queries = self.transform(texts)
+        for i in range(len(texts)):
+            _l2_normalize(queries.data[queries.indptr[i]:queries.indptr[i + 1]])
+        return (queries @ postings).toarray()
+
+
+# Hash columns per distinct token when ``n_features`` is not given: about
+# 1/16 of the tokens then share their column with another one
+AUTO_FEATURES_PER_TOKEN = 16
+MIN_HASH_FEATURES = 2 ** 10
+
+
+class HashingQueryVectorizer(QueryVectorizer):
+    """
+    TF-IDF over hashed features instead of a fitted vocabulary.
+
+    Tokens are mapped to one of ``n_features`` columns by CRC32, so there is
+    no term dictionary to build, store or keep in memory. Only the float32
+    IDF of every column (with scikit-learn's smoothing) and the document
+    count are kept; a column no indexed document uses has an IDF of 0.
+    Vectorizers fitted on separate shards with the same ``n_features`` are
+    combined by summing their document frequencies (``merge``), which are
+    recovered from the IDF.
+
+    Tokens that land in a column no indexed document uses are dropped, like
+    unknown terms in the vocabulary mode.
+    """
+
+    def __init__(self, n_features, idf, n_documents, stop_words=(),
+                 token_pattern=DEFAULT_TOKEN_PATTERN, lowercase=True, sublinear_tf=False):
+        """
+        Initialize the transformer.
+
+        Args:
+            n_features (int): Number of hash columns
+            idf (numpy.ndarray): float32 IDF per column, 0 for unused columns
+            n_documents (int): Number of indexed documents
+            stop_words (iterable): Terms dropped before hashing
+            token_pattern (str): Regular expression selecting tokens
+            lowercase (bool): Lowercase texts before tokenizing
+            sublinear_tf (bool): Use 1 + log(tf) instead of raw term counts
+        """
+        self.n_features = int(n_features)
+        self.n_documents = int(n_documents)
+        super().__init__(None, idf, stop_words, token_pattern, lowercase, sublinear_tf)
+
+    @classmethod
+    def from_counts(cls, n_features, document_frequency, n_documents, **kwargs):
+        """
+        Create a vectorizer from per-column document frequencies.
+
+        Args:
+            n_features (int): Number of hash columns
+            document_frequency (numpy.ndarray): Documents containing each column
+            n_documents (int): Number of indexed documents
+            **kwargs: Tokenization settings passed to the constructor
+
+        Returns:
+            HashingQueryVectorizer: The vectorizer
+        """
+        document_frequency = np.asarray(document_frequency)
+        idf = np.zeros(n_features, dtype=np.float32)
+        used = document_frequency > 0
+        idf[used] = np.log((1 + n_documents) / (1 + document_frequency[used])) + 1
+        return cls(n_features, idf, n_documents, **kwargs)
+
+    @property
+    def document_frequency(self):
+        """
+        Documents containing each column, recovered from the IDF.
+
+        Exact while float32 resolves the IDF, i.e. for up to a few hundred
+        thousand documents per column.
+        """
+        document_frequency = np.zeros(self.n_features, dtype=np.int64)
+        used = self.idf > 0
+        document_frequency[used] = np.rint(
+            (1 + self.n_documents) / np.exp(self.idf[used].astype(np.float64) - 1) - 1)
+        return document_frequency
+
+    @staticmethod
+    def column(token, n_features):
+        """
+        Hash column of a token; stable across processes and platforms.
+        """
+        return zlib.crc32(token.encode('utf-8')) % n_features
+
+    @staticmethod
+    def auto_features(distinct_tokens):
+        """
+        Default number of hash columns for a number of distinct tokens.
+
+        The next power of two of ``AUTO_FEATURES_PER_TOKEN`` columns per
+        token, at least ``MIN_HASH_FEATURES``. With V distinct tokens and n
+        columns about V/n of the tokens collide with another one, and
+        collisions merge their IDF and change rankings; fewer columns only
+        save 4 bytes of IDF each.
+        """
+        n_features = MIN_HASH_FEATURES
+        while n_features < AUTO_FEATURES_PER_TOKEN * distinct_tokens:
+            n_features *= 2
+        return n_features
+
+    @classmethod
+    def fit(cls, texts, n_features=None, **kwargs):
+        """
+        Count document frequencies over texts.
+
+        Args:
+            texts (list): Preprocessed document texts
+            n_features (int, optional): Number of hash columns; sized to the
+                distinct tokens of the texts with ``auto_features`` when not
+                given. Shards that are to be merged need the same explicit value.
+            **kwargs: Tokenization settings passed to the constructor
+
+        Returns:
+            HashingQueryVectorizer: Vectorizer for the texts
+        """
+        tokenizer = cls(1, np.zeros(1, dtype=np.float32), 0, **kwargs)
+        token_sets = [set(tokenizer.tokenize(text)) for text in texts]
+        if n_features is None:
+            n_features = cls.auto_features(len(set().union(*token_sets)))
+        document_frequency = np.zeros(n_features, dtype=np.int64)
+        for tokens in token_sets:
+            columns = {cls.column(token, n_features) for token in tokens}
+            document_frequency[list(columns)] += 1
+        return cls.from_counts(n_features, document_frequency, len(texts), **kwargs)
+
+    def merge(self, other):
+        """
+        Combine with a vectorizer fitted on another shard of documents.
+
+        Args:
+            other (HashingQueryVectorizer): Vectorizer with the same settings
+
+        Returns:
+            HashingQueryVectorizer: Vectorizer for both sets of documents
+        """
+        if other.n_features != self.n_features or other.config != self.config:
+            raise ValueError("Only vectorizers with the same settings can be merged")
+        return HashingQueryVectorizer.from_counts(
+            self.n_features, self.document_frequency + other.document_frequency,
+            self.n_documents + other.n_documents, stop_words=self.stop_words, **self.config)
+
+    def _term_counts(self, tokens):
+        """
+        Count the tokens of a text per hash column, skipping unused columns.
+        """
+        counts = {}
+        n_features = self.n_features
+        idf = self.idf
+        for token in tokens:
+            column = zlib.crc32(token.encode('utf-8')) % n_features
+            if idf[column]:
+                counts[column] = counts.get(column, 0) + 1
+        return counts
+
+    def known(self, token):
+        """
+        Whether any indexed document uses the token's hash column.
+        """
+        return bool(self.idf[self.column(token, self.n_features)])
@@ -0,0 +1,248 @@
+import json
+import logging
+import os
+from types import MappingProxyType
+import numpy as np
+from utils.keyword_matcher import KeywordMatcher
+
+logger = logging.getLogger(__name__)
+
+RULES_VERSION = 1
+DEFAULT_RULES_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "boost_rules.json")
+REQUIRED_WEIGHTS = ('term_match', 'category_keyword', 'category_name',
+                    'role_match', 'programming_penalty')
+
+
+class RuleConfigError(ValueError):
+    """Raised when the boost rule configuration cannot be compiled."""
+
+
+class CompiledRules:
+    """
+    Immutable, pre-compiled view of the boost rule tables.
+
+    Built once at startup by ``compile_rules``. Holds the category keyword
+    table, the role term table, the penalty terms and the boost weights as
+    tuples and read-only arrays so a single instance can be shared by every
+    request (and every thread) without copying. Two keyword matchers are
+    compiled as well: one that finds every category keyword, role and
+    penalty trigger of a query in a single scan, and one that finds the
+    boost feature columns in assessment texts.
+    """
+
+    def __init__(self, version, weights, skill_categories, key_exact_matches,
+                 penalty_query_terms, penalty_name_terms, issues,
+                 word_boundary_max_length=0):
+        set_attr = object.__setattr__
+        set_attr(self, 'version', version)
+        set_attr(self, 'word_boundary_max_length', word_boundary_max_length)
+        set_attr(self, 'weights', MappingProxyType(dict(weights)))
+        set_attr(self, 'skill_categories', MappingProxyType(
+            {category: tuple(keywords) for category, keywords in skill_categories.items()}))
+        set_attr(self, 'key_exact_matches', MappingProxyType(
+            {role: tuple(terms) for role, terms in key_exact_matches.items()}))
+        set_attr(self, 'penalty_query_terms', tuple(penalty_query_terms))
+        set_attr(self, 'penalty_name_terms', tuple(penalty_name_terms))
+        set_attr(self, 'issues', tuple(issues))
+
+        categories = tuple(self.skill_categories)
+        roles = tuple(self.key_exact_matches)
+        keywords = tuple(dict.fromkeys(
+            keyword for words in self.skill_categories.values() for keyword in words))
+        role_terms = tuple(dict.fromkeys(
+            term for terms in self.key_exact_matches.values() for term in terms))
+
+        # Keyword multiplicity per category and role term multiplicity per role
+        keyword_ids = {keyword: i for i, keyword in enumerate(keywords)}
+        category_keywords = np.zeros((len(keywords), len(categories)))
+        for j, category in enumerate(categories):
+            for keyword in self.skill_categories[category]:
+                category_keywords[keyword_ids[keyword], j] += 1
+        category_sizes = np.array(
+            [len(self.skill_categories[category]) for category in categories], dtype=float)
+
+        role_term_ids = {term: i for i, term in enumerate(role_terms)}
+        role_term_matrix = np.zeros((len(roles), len(role_terms)))
+        for i, role in enumerate(roles):
+            for term in self.key_exact_matches[role]:
+                role_term_matrix[i, role_term_ids[term]] += 1
+
+        for array in (category_keywords, category_sizes, role_term_matrix):
+            array.setflags(write=False)
+
+        set_attr(self, 'categories', categories)
+        set_attr(self, 'roles', roles)
+        set_attr(self, 'keywords', keywords)
+        set_attr(self, 'role_terms', role_terms)
+        set_attr(self, 'category_keywords', category_keywords)
+        set_attr(self, 'category_sizes', category_sizes)
+        set_attr(self, 'role_term_matrix', role_term_matrix)
+
+        # Single-pass matcher over every query-side pattern. Pattern ids are
+        # laid out as [keywords | roles | penalty triggers].
+        query_patterns = keywords + roles + self.penalty_query_terms
+        set_attr(self, 'query_matcher', KeywordMatcher(query_patterns, word_boundary_max_length))
+        set_attr(self, 'feature_matcher',
+                 KeywordMatcher(self.feature_columns, word_boundary_max_length))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledRules is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("CompiledRules is immutable")
+
+    @property
+    def feature_columns(self):
+        """
+        Assessment-side feature strings in boost matrix column order:
+        category keywords, then category names, then role terms.
+        """
+        return self.keywords + tuple(c.lower() for c in self.categories) + self.role_terms
+
+    def match_query(self, text):
+        """
+        Find the categories, roles and penalty triggers present in a query.
+
+        Args:
+            text (str): Lowercased job description
+
+        Returns:
+            tuple: (keyword hit vector, role hit vector, penalty triggered)
+        """
+        n_keywords = len(self.keywords)
+        n_roles = len(self.roles)
+        hits = np.zeros(n_keywords + n_roles + len(self.penalty_query_terms))
+        found = self.query_matcher.find(text)
+        if found:
+            hits[list(found)] = 1
+        return (hits[:n_keywords], hits[n_keywords:n_keywords + n_roles],
+                bool(hits[n_keywords + n_roles:].any()))
+
+    def match_features(self, text):
+        """
+        Find the boost feature columns present in an assessment text.
+
+        Args:
+            text (str): Lowercased assessment text
+
+        Returns:
+            list: Sorted feature column indices
+        """
+        return sorted(self.feature_matcher.find(text))
+
+
+def _pairs_hook(issues, path):
+    """
+    Build a json ``object_pairs_hook`` that records duplicate keys instead of
+    silently letting the last one win.
+    """
+    def hook(pairs):
+        result = {}
+        for key, value in pairs:
+            if key in result:
+                kind = "duplicate" if result[key] == value else "conflicting"
+                issues.append(f"{path}: {kind} definition of '{key}', the last one wins")
+            result[key] = value
+        return result
+    return hook
+
+
+def _clean_terms(terms, where, issues):
+    """
+    Validate a keyword list, lowercasing it and dropping repeated entries.
+
+    Args:
+        terms (list): Keywords from the config
+        where (str): Location used in issue messages
+        issues (list): Collected issues, appended to in place
+
+    Returns:
+        list: Cleaned keywords in their original order
+    """
+    if not isinstance(terms, list) or not terms:
+        raise RuleConfigError(f"{where} must be a non-empty list of strings")
+
+    cleaned = []
+    for term in terms:
+        if not isinstance(term, str) or not term.strip():
+            raise RuleConfigError(f"{where} contains an invalid keyword: {term!r}")
+        term = term.lower()
+        if term in cleaned:
+            issues.append(f"{where}: keyword '{term}' listed more than once")
+            continue
+        cleaned.append(term)
+    return cleaned
+
+
+def compile_rules(config, issues=None):
+    """
+    Validate a rule configuration and compile it into a ``CompiledRules``.
+
+    Args:
+        config (dict): Parsed rule configuration
+        issues (list, optional): Issues already found while parsing
+
+    Returns:
+        CompiledRules: The compiled, immutable rule set
+    """
+    issues = list(issues or [])
+
+    version = config.get('version')
+    if version != RULES_VERSION:
+        raise RuleConfigError(
+            f"Unsupported rules version {version!r}, expected {RULES_VERSION}")
+
+    weights = config.get('weights', {})
+    missing = [name for name in REQUIRED_WEIGHTS if name not in weights]
+    if missing:
+        raise RuleConfigError(f"Missing boost weights: {', '.join(missing)}")
+
+    skill_categories = {
+        category: _clean_terms(keywords, f"skill_categories.{category}", issues)
+        for category, keywords in config.get('skill_categories', {}).items()
+    }
+    key_exact_matches = {
+        role.lower(): _clean_terms(terms, f"key_exact_matches.{role}", issues)
+        for role, terms in config.get('key_exact_matches', {}).items()
+    }
+    penalty = config.get('penalty', {})
+    penalty_query_terms = _clean_terms(penalty.get('query_terms'), "penalty.query_terms", issues)
+    penalty_name_terms = _clean_terms(penalty.get('name_terms'), "penalty.name_terms", issues)
+
+    word_boundary_max_length = config.get('word_boundary_max_length', 0)
+    if not isinstance(word_boundary_max_length, int) or word_boundary_max_length < 0:
+        raise RuleConfigError("word_boundary_max_length must be a non-negative integer")
+
+    for issue in issues:
+        logger.warning(f"Boost rules: {issue}")
+
+    return CompiledRules(version, weights, skill_categories, key_exact_matches,
+                         penalty_query_terms, penalty_name_terms, issues,
+                         word_boundary_max_length)
+
+
+def load_rules(file_path=DEFAULT_RULES_PATH):
+    """
+    Load and compile the boost rule configuration file.
+
+    Duplicate or conflicting keys are logged as warnings (the last
+    definition wins, matching plain JSON semantics); structural problems
+    raise ``RuleConfigError``.
+
+    Args:
+        file_path (str): Path to the rules JSON file
+
+    Returns:
+        CompiledRules: The compiled rule set
+    """
+    issues = []
+    with open(file_path, 'r') as f:
+        config = json.load(f, object_pairs_hook=_pairs_hook(issues, file_path))
+
+    rules = compile_rules(config, issues)
+    logger.info(
+        f"Compiled boost rules v{rules.version} from {file_path}: "
+        f"{len(rules.categories)} categories, {len(rules.keywords)} keywords, "
+        f"{len(rules.roles)} roles")
+    return rules